@@ -0,0 +1,67 @@
+import sys
+import time
+import numpy as np
+from pydub import AudioSegment
+
+from music_light_advanced import CHUNK_MS, freq_ranges
+from utils.audio_analysis import (
+    song_to_mono_samples,
+    analyze_band_power,
+    compute_thresholds,
+    power_matrix_to_mapping,
+)
+from utils.analysis_reference import legacy_power_mapping, synthetic_song
+
+REPETITIONS = 3
+SYNTHETIC_SECONDS = 300  # length of the generated test track when no file is given
+
+
+def legacy_chunk_loop(song):
+    return legacy_power_mapping(song, CHUNK_MS, freq_ranges)
+
+
+def vectorized_power_mapping(song):
+    samples = song_to_mono_samples(song)
+    power_matrix = analyze_band_power(samples, song.frame_rate, CHUNK_MS, freq_ranges)
+    upper_threshold, lower_threshold = compute_thresholds(power_matrix, 0.30, 0.70)
+    return power_matrix_to_mapping(power_matrix, freq_ranges), upper_threshold, lower_threshold
+
+
+def best_time(func, song):
+    durations = []
+    result = None
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        result = func(song)
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+def main():
+    if len(sys.argv) > 1:
+        print(f"Decoding {sys.argv[1]} ...")
+        song = AudioSegment.from_file(sys.argv[1])
+    else:
+        print(f"Generating {SYNTHETIC_SECONDS} s synthetic track ...")
+        song = synthetic_song(SYNTHETIC_SECONDS)
+
+    legacy_time, (legacy_mapping, legacy_upper, legacy_lower) = best_time(legacy_chunk_loop, song)
+    new_time, (new_mapping, new_upper, new_lower) = best_time(vectorized_power_mapping, song)
+
+    legacy_matrix = np.array([list(legacy_mapping[i].values()) for i in range(len(legacy_mapping))])
+    new_matrix = np.array([list(new_mapping[i].values()) for i in range(len(new_mapping))])
+    same = (
+        legacy_matrix.shape == new_matrix.shape
+        and np.allclose(legacy_matrix, new_matrix)
+        and np.isclose(legacy_upper, new_upper)
+        and np.isclose(legacy_lower, new_lower)
+    )
+
+    print(f"Chunks: {len(new_mapping)}, results match: {same}")
+    print(f"Legacy per-chunk loop: {legacy_time:.4f} seconds")
+    print(f"Vectorized engine:     {new_time:.4f} seconds")
+    print(f"Speedup: {legacy_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from pywizlight import wizlight, PilotBuilder
+
+from utils.bulb_simulator import BulbSimulator
+from utils.udp_transport import UdpTransport, send_frame_commands
+
+NUMBER_OF_SIMULATED_BULBS = 20
+FRAMES = 50
+
+
+def frame_pilots(frame_index, count):
+    colors = [(255, 0, 0), (255, 255, 0), (0, 255, 0), (0, 0, 255)]
+    return [
+        PilotBuilder(rgb=colors[(frame_index + i) % len(colors)]) if (frame_index + i) % 5 else None
+        for i in range(count)
+    ]
+
+
+async def benchmark_gather(ips):
+    count = len(ips)
+    bulbs = [wizlight(ip) for ip in ips]
+    durations = []
+    for frame_index in range(FRAMES):
+        pilots = frame_pilots(frame_index, count)
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            bulb.turn_off() if pilot is None else bulb.turn_on(pilot)
+            for bulb, pilot in zip(bulbs, pilots)
+        ])
+        durations.append(time.perf_counter() - start)
+    for bulb in bulbs:
+        await bulb.async_close()
+    return durations
+
+
+async def benchmark_raw(ips):
+    count = len(ips)
+    transport = await UdpTransport().open()
+    bulbs = transport.wrap([wizlight(ip) for ip in ips])
+    dispatch, complete = [], []
+    for frame_index in range(FRAMES):
+        commands = list(zip(bulbs, frame_pilots(frame_index, count)))
+        start = time.perf_counter()
+        pending = asyncio.ensure_future(send_frame_commands(transport, commands))
+        await asyncio.sleep(0)  # the coroutine has sent every datagram by its first await
+        dispatch.append(time.perf_counter() - start)
+        await pending
+        complete.append(time.perf_counter() - start)
+    print(f"Raw transport counters: {transport.counters()}")
+    transport.close()
+    return dispatch, complete
+
+
+def summary(durations):
+    durations = sorted(durations)
+    return f"mean {sum(durations) / len(durations) * 1000:.2f} ms, p95 {durations[int(len(durations) * 0.95)] * 1000:.2f} ms"
+
+
+async def main():
+    simulator = await BulbSimulator(NUMBER_OF_SIMULATED_BULBS, latency=0, jitter=0).start()
+    print(f"Benchmarking {FRAMES} frames to {NUMBER_OF_SIMULATED_BULBS} loopback bulbs...")
+
+    gather_durations = await benchmark_gather(simulator.ips)
+    raw_dispatch, raw_complete = await benchmark_raw(simulator.ips)
+
+    print(f"pywizlight gather, frame until all acked: {summary(gather_durations)}")
+    print(f"Raw transport, frame dispatch:           {summary(raw_dispatch)}")
+    print(f"Raw transport, frame until all acked:    {summary(raw_complete)}")
+
+    simulator.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+import json
+import sys
+
+import numpy as np
+
+from utils.traffic_log import load_traffic
+
+REGRESSION_TOLERANCE = 0.10  # relative slowdown of a p95 (or drop in throughput) reported as a regression
+MIN_REGRESSION = 0.001  # seconds; smaller differences are noise whatever the ratio
+TRACE_FIELDS = ("analysis", "dispatch", "ack", "overshoot")
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {"count": len(values), "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)), "max": float(values.max())}
+
+
+def traffic_summary(records):
+    sent = records["sent"]
+    duration = float(sent[-1] - sent[0]) if len(sent) > 1 else 0.0
+    rtt = _percentiles(records["rtt"].astype(np.float64))
+    return {
+        "commands": len(records),
+        "acked": rtt["count"],
+        "commands_per_sec": len(records) / duration if duration else 0.0,
+        "rtt": rtt,
+    }
+
+
+def compare_traffic(base_path, other_path):
+    """
+    Match the two logs command by command: the k-th command to a bulb in one run against
+    the k-th command to the same bulb in the other. Reports payload differences and how far
+    each command's send time (relative to the first command of its run) moved.
+    """
+    base, base_meta = load_traffic(base_path)
+    other, other_meta = load_traffic(other_path)
+    other_index = {ip: index for index, ip in enumerate(other_meta["ips"])}
+    base_start = base["sent"][0] if len(base) else 0.0
+    other_start = other["sent"][0] if len(other) else 0.0
+
+    drifts = []
+    matched = mismatched = unmatched = 0
+    first_mismatch = None
+    for index, ip in enumerate(base_meta["ips"]):
+        mine = base[base["bulb"] == index]
+        theirs = other[other["bulb"] == other_index[ip]] if ip in other_index else other[:0]
+        n = min(len(mine), len(theirs))
+        unmatched += abs(len(mine) - len(theirs))
+        matched += n
+        drifts.append((theirs["sent"][:n] - other_start) - (mine["sent"][:n] - base_start))
+        base_payloads = [base_meta["payloads"][payload] for payload in mine["payload"][:n]]
+        other_payloads = [other_meta["payloads"][payload] for payload in theirs["payload"][:n]]
+        for k, (a, b) in enumerate(zip(base_payloads, other_payloads)):
+            if a != b:
+                mismatched += 1
+                if first_mismatch is None:
+                    first_mismatch = (ip, k, a, b)
+    unmatched += sum(int((other["bulb"] == other_index[ip]).sum())
+                     for ip in other_meta["ips"] if ip not in base_meta["ips"])
+
+    return {
+        "base": traffic_summary(base),
+        "other": traffic_summary(other),
+        "matched": matched,
+        "unmatched": unmatched,
+        "payload_mismatches": mismatched,
+        "first_mismatch": first_mismatch,
+        "drift": _percentiles(np.abs(np.concatenate(drifts))) if drifts else _percentiles(np.zeros(0)),
+    }
+
+
+def load_trace(path):
+    """Per-frame records of a telemetry JSON trace, as {field: array}."""
+    with open(path) as f:
+        frames = json.load(f)["frames"]
+    return {field: np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            for field, values in frames.items()}
+
+
+def compare_traces(base_path, other_path):
+    """
+    Match two telemetry traces frame by frame (by frame number) and compare each timing field:
+    the percentiles of both runs and of the per-frame difference.
+    """
+    base, other = load_trace(base_path), load_trace(other_path)
+    common, base_rows, other_rows = np.intersect1d(base["frame"], other["frame"], return_indices=True)
+    result = {"frames": (len(base["frame"]), len(other["frame"]), len(common))}
+    for field in TRACE_FIELDS:
+        result[field] = {
+            "base": _percentiles(base[field]),
+            "other": _percentiles(other[field]),
+            "delta": _percentiles(other[field][other_rows] - base[field][base_rows]),
+        }
+    return result
+
+
+def _regressed(base, other, higher_is_worse=True):
+    if not higher_is_worse:
+        base, other = other, base
+    return other - base > max(MIN_REGRESSION, REGRESSION_TOLERANCE * base)
+
+
+def print_traffic_comparison(result):
+    regressions = []
+    for name in ("base", "other"):
+        summary = result[name]
+        print(f"{name:>5}: {summary['commands']} commands ({summary['acked']} acked), "
+              f"{summary['commands_per_sec']:.1f} commands/s, rtt p50 {summary['rtt']['p50'] * 1000:.2f} ms / "
+              f"p95 {summary['rtt']['p95'] * 1000:.2f} ms")
+    drift = result["drift"]
+    print(f"Matched {result['matched']} commands ({result['unmatched']} without a counterpart), "
+          f"{result['payload_mismatches']} with a different payload; send time drift "
+          f"p50 {drift['p50'] * 1000:.2f} ms / p95 {drift['p95'] * 1000:.2f} ms / max {drift['max'] * 1000:.2f} ms")
+    if result["first_mismatch"] is not None:
+        ip, k, a, b = result["first_mismatch"]
+        print(f"First difference: command {k} to {ip}: {a} != {b}")
+    base, other = result["base"], result["other"]
+    if base["commands_per_sec"] - other["commands_per_sec"] > REGRESSION_TOLERANCE * base["commands_per_sec"]:
+        regressions.append("commands/s")
+    if _regressed(base["rtt"]["p95"], other["rtt"]["p95"]):
+        regressions.append("rtt p95")
+    return regressions
+
+
+def print_trace_comparison(result):
+    regressions = []
+    base_frames, other_frames, common = result["frames"]
+    print(f"Frames: {base_frames} vs {other_frames}, {common} matched by frame number")
+    for field in TRACE_FIELDS:
+        stats = result[field]
+        if not stats["base"]["count"] and not stats["other"]["count"]:
+            continue
+        print(f"{field:>9}: p50 {stats['base']['p50'] * 1000:.2f} -> {stats['other']['p50'] * 1000:.2f} ms, "
+              f"p95 {stats['base']['p95'] * 1000:.2f} -> {stats['other']['p95'] * 1000:.2f} ms, "
+              f"per-frame change p95 {stats['delta']['p95'] * 1000:+.2f} ms")
+        if _regressed(stats["base"]["p95"], stats["other"]["p95"]):
+            regressions.append(f"{field} p95")
+    return regressions
+
+
+def main(base_path, other_path):
+    if base_path.endswith(".json") and not base_path.endswith(".npy.json"):
+        regressions = print_trace_comparison(compare_traces(base_path, other_path))
+    else:
+        regressions = print_traffic_comparison(compare_traffic(base_path, other_path))
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    # python compare_runs.py base.npy other.npy                 - two traffic logs (light_wiz --record)
+    # python compare_runs.py base-trace.json other-trace.json   - two telemetry traces
+    if len(sys.argv) != 3:
+        print("Usage: python compare_runs.py <base> <other>")
+        sys.exit(2)
+    sys.exit(main(sys.argv[1], sys.argv[2]))
@@ -2,26 +2,58 @@ import asyncio
 
 from pywizlight import wizlight, PilotBuilder, discovery
 from utils.network_utils import find_light_bulbs
-import time
+from utils.bulb_registry import BulbRegistry
+from utils.bulb_state import BulbStateCache
+from utils.bulb_mailbox import BulbMailboxes, print_mailbox_counters
+from utils.gradient_engine import GradientAnimator
+from utils.telemetry import Telemetry
+from utils.startup import STARTUP
+
+GRADIENT_FPS = 10  # target update rate per bulb
+COLOR_CHANGE = 5  # hue step between frames
+SPREAD = 1.0  # 1.0 spreads one full rainbow across all bulbs, 0 keeps them in phase
 
 async def main():
     print("Starting program...")
     init_color = (255, 0, 0)  # Start with red color
     
     light_bulbs = await find_light_bulbs()
-    bulb = light_bulbs[0]  # Select the first bulb for demonstration
+    if not light_bulbs:
+        print("No light bulbs found.")
+        return
+
+    # Rainbow across the whole rig, in bulb number order
+    registry = BulbRegistry(light_bulbs)
+    ordered = [bulb for _, bulb in registry.numbered] or list(registry)
+    # Wrap so unchanged colors (e.g. while a channel is clamped) are not re-sent,
+    # and so a slow bulb only ever gets the latest color at a rate it can keep up with
+    mailboxes = BulbMailboxes(max_rate=GRADIENT_FPS)
+    bulbs = mailboxes.wrap(BulbStateCache().wrap(ordered))
 
-    print(f"Controlling bulb at {bulb.ip}")
-    await run_animation(bulb, init_color, color_change = 5)
+    print(f"Controlling {len(bulbs)} bulbs at {GRADIENT_FPS} fps")
+    telemetry = await Telemetry("gradient_one").start()
+    STARTUP.ready()
+    try:
+        await run_animation(bulbs, init_color, color_change=COLOR_CHANGE, telemetry=telemetry)
+    finally:
+        print_mailbox_counters(mailboxes.counters())
+        mailboxes.close()
+        telemetry.finish()
 
-async def run_animation(bulb, init_color, color_change):
-    color = init_color
-    await bulb.turn_on(PilotBuilder(rgb=init_color))
-    while True:
-        color = updatelightColorByHue(color, color_change)
-        await bulb.turn_on(PilotBuilder(rgb=color))
+async def run_animation(bulbs, init_color, color_change, fps=GRADIENT_FPS, spread=SPREAD, duration=None, telemetry=None):
+    animator = GradientAnimator(bulbs, step=color_change, fps=fps, spread=spread, start_color=init_color,
+                                telemetry=telemetry)
+    try:
+        await animator.run(duration)
+    finally:
+        stats = animator.stats
+        print(f"Gradient: {stats['frames']} frames at {stats.get('achieved_fps', 0):.1f} fps "
+              f"(target {fps}), {stats['dropped_frames']} dropped frames, "
+              f"{stats['skipped_commands']} commands skipped for busy bulbs")
+    return animator.stats
 
 def updatelightColorByHue(color, color_change):
+    # Single-step reference walk; utils.gradient_engine.hue_wheel precomputes the same cycle
     # increase green value first
     r = color[0]
     g = color[1]
@@ -53,5 +85,6 @@ def updatelightColorByHue(color, color_change):
             b = 0
     return (r, g, b)
     
-loop = asyncio.get_event_loop()
-loop.run_until_complete(main())
\ No newline at end of file
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
@@ -0,0 +1,97 @@
+"""
+Single entry point for every show:
+
+    python -m light_wiz <show> [show arguments]
+    python -m light_wiz --rediscover <show> ...   full discovery, with the identify blink
+    python -m light_wiz --record <log> <show> ... write every bulb command and its ack time to a traffic log
+    python -m light_wiz --replay <log> <show> ... run headless against the bulbs of a recorded traffic log
+
+Only this file is imported up front; the show's module is imported when that show is
+started, and numpy and pydub only by the modules that compute with them. Shows reuse
+the bulb registry cached by the last discovery after one quick unicast check that every
+cached bulb still answers at its IP, and the time of each startup phase is printed when
+the show has finished its setup, before the first light frame.
+
+A replay serves the recorded bulbs from loopback endpoints with their recorded
+acknowledgement times and plays the audio to a null output; recording the replayed run
+as well gives two logs that `python -m light_wiz compare` checks frame by frame.
+"""
+import time
+
+STARTED = time.perf_counter()  # taken before anything else is imported
+
+import runpy
+import sys
+
+SHOWS = {
+    "gradient": ("gradient_one", "rainbow gradient across the rig"),
+    "running": ("running_light", "running light chase"),
+    "music": ("music_light", "lamp group following the music's loudness [--stream source]"),
+    "advanced": ("music_light_advanced", "frequency band show on the grid [--stream source]"),
+    "render": ("render_show", "render or play precompiled cue files: render|play|shard [songs...]"),
+    "daemon": ("show_daemon", "long-running show daemon with the local control API"),
+    "cli": ("simple_cli_control", "control client for the daemon"),
+    "timing": ("timing", "bulb timing benchmarks"),
+    "compare": ("compare_runs", "compare two traffic logs or telemetry traces: <base> <other>"),
+}
+OPTIONS = {"--rediscover": False, "--record": True, "--replay": True}  # option -> takes a value
+
+
+def usage():
+    print("Usage: python -m light_wiz [--rediscover] [--record log] [--replay log] <show> [arguments]")
+    for name, (_, description) in SHOWS.items():
+        print(f"  {name:<9} {description}")
+
+
+def parse_options(argv):
+    """Split the light_wiz options off the front of argv; returns (options, the rest) or None if malformed."""
+    options = {}
+    while argv and argv[0] in OPTIONS:
+        if OPTIONS[argv[0]]:
+            if len(argv) < 2:
+                return None
+            options[argv[0]] = argv[1]
+            argv = argv[2:]
+        else:
+            options[argv[0]] = True
+            argv = argv[1:]
+    return options, argv
+
+
+def main(argv):
+    parsed = parse_options(argv)
+    if parsed is None or not parsed[1] or parsed[1][0] not in SHOWS:
+        usage()
+        return 2
+    options, argv = parsed
+
+    from utils import network_utils
+    from utils.startup import STARTUP
+    from utils.traffic_log import RECORDER
+
+    STARTUP.start(STARTED)
+    network_utils.TRUST_REGISTRY = "--rediscover" not in options
+    if "--replay" in options:
+        from utils import audio_playback
+        from utils.traffic_replay import ReplayRig
+
+        network_utils.REPLAY_RIG = ReplayRig(options["--replay"])
+        audio_playback.AUDIO_OUTPUT = "null"
+    if "--record" in options:
+        RECORDER.start(options["--record"])
+    module, _ = SHOWS[argv[0]]
+    # Run the show exactly as `python <module>.py args` would, with its own argument handling
+    sys.argv = [f"{module}.py"] + argv[1:]
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        if RECORDER.active:
+            RECORDER.save()
+    STARTUP.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
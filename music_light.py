@@ -1,51 +1,185 @@
 import asyncio
+import sys
+import time
+import numpy as np
 from pydub import AudioSegment
-from pydub.playback import play
-import simpleaudio
-from pywizlight import wizlight, PilotBuilder
+from pywizlight import PilotBuilder
+from utils.audio_analysis import EnvelopeFollower, rms_envelope, smooth_envelope
+from utils.audio_playback import AudioPlayback
+from utils.audio_stream import file_playback, open_pcm_source
+from utils.bulb_registry import BulbRegistry
+from utils.bulb_state import BulbStateCache, print_state_counters
+from utils.network_utils import find_light_bulbs
+from utils.telemetry import Telemetry
+from utils.startup import STARTUP
 
 SONG_PATH = "./music/Nirvana.mp3"
-LAMP_IP = "192.168.8.157"
+LAMP_GROUP = "13"  # bulbs following the music: "all", "rowN" or bulb numbers such as "13" (192.168.8.157) or "1,5,9"
+BULB_GAINS = {}  # bulb number -> gain on its brightness level, 1.0 for bulbs not listed
 CHUNK_MS = 100
 MIN_BRIGHTNESS = 10  
 MAX_BRIGHTNESS = 255
+ATTACK = 0.03  # seconds for the brightness to follow the music up
+RELEASE = 0.4  # seconds for it to fall back, so it swells and fades instead of flickering
+DYNAMIC_RANGE_DB = 30.0  # loudness below the peak that is spread over MIN..MAX_BRIGHTNESS
+STREAM_PEAK_DBFS = -18.0  # RMS a stream's running peak starts from, the usual alignment level of program audio
+
+BRIGHTNESS_PILOTS = tuple(PilotBuilder(brightness=level) for level in range(256))  # indexed by brightness
+
+def loudness(rms, max_rms):
+    """Perceptual level 0..1 of RMS values: their dB below max_rms over DYNAMIC_RANGE_DB."""
+    rms = np.asarray(rms, dtype=np.float64)
+    if not max_rms:
+        return np.zeros_like(rms)
+    db = 20 * np.log10(np.maximum(rms, 1e-9) / max_rms)
+    return np.clip(1.0 + db / DYNAMIC_RANGE_DB, 0.0, 1.0)
+
+def brightness_levels(levels, gains):
+    """Brightness of every (chunk, bulb): each chunk's level times each bulb's gain, on MIN..MAX_BRIGHTNESS."""
+    scaled = np.clip(np.multiply.outer(levels, gains), 0.0, 1.0)
+    return np.rint(MIN_BRIGHTNESS + (MAX_BRIGHTNESS - MIN_BRIGHTNESS) * scaled).astype(np.uint8)
 
 def rms_to_brightness(rms, max_rms):
-    # Normalize RMS to brightness range
-    norm = rms / max_rms if max_rms else 0
-    brightness = int(MIN_BRIGHTNESS + (MAX_BRIGHTNESS - MIN_BRIGHTNESS) * norm)
-    return min(max(brightness, MIN_BRIGHTNESS), MAX_BRIGHTNESS)
+    return int(brightness_levels(loudness(rms, max_rms), 1.0))
+
+def song_brightness(song, gains):
+    """
+    The whole show in one pass: (chunks, bulbs) brightness for the chunks of song[::CHUNK_MS],
+    from the smoothed RMS envelope normalized to its loudest chunk.
+    """
+    raw = song.get_array_of_samples()
+    envelope = rms_envelope(np.frombuffer(raw, dtype=raw.typecode), song.frame_rate, CHUNK_MS, song.channels)
+    smoothed = smooth_envelope(envelope, CHUNK_MS / 1000.0, ATTACK, RELEASE)
+    return brightness_levels(loudness(smoothed, smoothed.max(initial=0.0)), gains)
+
+async def lamp_group(group=LAMP_GROUP, gains=BULB_GAINS):
+    """The show's bulbs from the registry and their gains; no bulbs if the group was not found."""
+    registry = BulbRegistry(await find_light_bulbs())
+    try:
+        lamps = registry.group(group)
+    except KeyError as exc:
+        print(f"Bulb {exc.args[0]} of group {group} not found.")
+        return (), np.zeros(0)
+    numbers = {bulb.ip: number for number, bulb in registry.numbered}
+    return lamps, np.array([gains.get(numbers.get(lamp.ip), 1.0) for lamp in lamps], dtype=np.float64)
 
 async def set_brightness(lamp, brightness):
-    await lamp.turn_on(PilotBuilder(brightness=brightness))
+    await lamp.turn_on(BRIGHTNESS_PILOTS[brightness])
+
+async def set_group_brightness(lamps, levels):
+    """Set each lamp to its brightness in levels, all at once; a failing lamp does not hold up the rest."""
+    await asyncio.gather(*(lamp.turn_on(BRIGHTNESS_PILOTS[level]) for lamp, level in zip(lamps, levels)),
+                         return_exceptions=True)
 
-async def music_lamp_show():        
+async def music_lamp_show():
     song = AudioSegment.from_mp3(SONG_PATH)
-    chunks = list(song[::CHUNK_MS])
-    max_rms = max(chunk.rms for chunk in chunks)
+    lamps, gains = await lamp_group()
+    if not lamps:
+        print("No lamps found.")
+        return
+    # Every bulb's brightness for every chunk, so the loop below only indexes
+    frames = song_brightness(song, gains).tolist()
 
-    lamp = wizlight(LAMP_IP)
-    print(f"Connecting to lamp at {LAMP_IP} ...")
-    await lamp.turn_on(PilotBuilder(brightness=MIN_BRIGHTNESS))
+    state_cache = BulbStateCache()
+    lamps = state_cache.wrap(lamps)
+    print(f"Driving {len(lamps)} lamps from group {LAMP_GROUP} ...")
+    await set_group_brightness(lamps, [MIN_BRIGHTNESS] * len(lamps))
 
+    telemetry = await Telemetry("music_light").start()
+    STARTUP.ready()
     print("Starting music and lamp show!")
-    play_obj = simpleaudio.play_buffer(song.raw_data,
-                                       num_channels=song.channels,
-                                       bytes_per_sample=song.sample_width,
-                                       sample_rate=song.frame_rate)
-
-    # For each chunk, set lamp brightness
-    for i, chunk in enumerate(chunks):
-        brightness = rms_to_brightness(chunk.rms, max_rms)
-        print(f'Chunk {i}, RMS={chunk.rms}, Brightness={brightness}')
-        await set_brightness(lamp, brightness)
-        await asyncio.sleep(CHUNK_MS / 1000.0)
-
-        if not play_obj.is_playing():
+    playback = AudioPlayback(song).start()
+    loop = asyncio.get_running_loop()
+
+    # For each chunk, set the lamps' brightness when the audio reaches it
+    for i, levels in enumerate(frames):
+        due = playback.anchor() + i * CHUNK_MS / 1000.0
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif delay < -CHUNK_MS / 1000.0:
+            # A slow acknowledgement pushed us a whole chunk behind the audio, catch up
+            telemetry.count("skipped_frames")
+            continue
+        overshoot = loop.time() - due
+        ack_start = time.perf_counter()
+        await set_group_brightness(lamps, levels)
+        telemetry.count("frames")
+        telemetry.frame(i, ack=time.perf_counter() - ack_start, overshoot=overshoot)
+
+        if not playback.is_playing():
             break
-        
-    await lamp.turn_off()
+
+    playback.stop()
+    await asyncio.gather(*(lamp.turn_off() for lamp in lamps), return_exceptions=True)
+    print_state_counters(state_cache.counters())
+    telemetry.finish()
+    print("Show finished!")
+
+async def music_lamp_stream_show(source):
+    """
+    Same show driven from a PCM stream: RMS is computed per block as it arrives,
+    smoothed with the same attack/release and normalized against the loudest block seen so far,
+    starting from STREAM_PEAK_DBFS so the first blocks are not taken as full level.
+    A file source is also played, and the blocks follow its playback clock.
+    """
+    lamps, gains = await lamp_group()
+    if not lamps:
+        print("No lamps found.")
+        return
+    state_cache = BulbStateCache()
+    lamps = state_cache.wrap(lamps)
+    print(f"Driving {len(lamps)} lamps from group {LAMP_GROUP} ...")
+    await set_group_brightness(lamps, [MIN_BRIGHTNESS] * len(lamps))
+
+    playback = await file_playback(source)
+    blocks, _ = await open_pcm_source(source, CHUNK_MS)
+    telemetry = await Telemetry("music_light_stream").start()
+    STARTUP.ready()
+    print("Starting streaming lamp show!")
+    loop = asyncio.get_running_loop()
+    if playback is not None:
+        playback.start()
+    started = loop.time()
+    follower = EnvelopeFollower(CHUNK_MS / 1000.0, ATTACK, RELEASE)
+    max_rms = None
+    i = 0
+    try:
+        async for block in blocks:
+            analysis_start = time.perf_counter()
+            if max_rms is None:
+                max_rms = np.iinfo(block.dtype).max * 10 ** (STREAM_PEAK_DBFS / 20)
+            rms = follower.step(float(np.sqrt(np.mean(block.astype(np.float64) ** 2))))
+            max_rms = max(max_rms, rms)
+            levels = brightness_levels(loudness(rms, max_rms), gains).tolist()
+            if i == 0:
+                print(f"First block after {loop.time() - started:.3f} seconds")
+
+            ack_start = time.perf_counter()
+            await set_group_brightness(lamps, levels)
+            ack = time.perf_counter() - ack_start
+
+            # Pace file sources to their playback (loop.time() and its anchor share the monotonic
+            # clock); live sources arrive no faster than this anyway
+            origin = playback.anchor() if playback is not None else started
+            due = origin + (i + 1) * CHUNK_MS / 1000.0
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            telemetry.count("frames")
+            telemetry.frame(i, ack_start - analysis_start, ack=ack, overshoot=loop.time() - due)
+            i += 1
+    finally:
+        if playback is not None:
+            playback.stop()
+
+    await asyncio.gather(*(lamp.turn_off() for lamp in lamps), return_exceptions=True)
+    print_state_counters(state_cache.counters())
+    telemetry.finish()
     print("Show finished!")
 
 if __name__ == "__main__":
-    asyncio.run(music_lamp_show())
+    if len(sys.argv) > 2 and sys.argv[1] == "--stream":
+        asyncio.run(music_lamp_stream_show(sys.argv[2]))
+    else:
+        asyncio.run(music_lamp_show())
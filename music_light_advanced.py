@@ -1,14 +1,36 @@
 import asyncio
-from pydub import AudioSegment
-import simpleaudio
-from pywizlight import PilotBuilder
-from utils.constants import map_light_bulbs
+import sys
+from types import MappingProxyType
 import numpy as np
 from utils.network_utils import find_light_bulbs
+from utils.bulb_registry import ROW_SIZE, BulbRegistry
+from utils.audio_analysis import (
+    song_to_mono_samples,
+    analyze_band_power,
+    compute_thresholds,
+    power_matrix_to_mapping,
+)
+from utils.analysis_cache import AnalysisCache
+from utils.audio_playback import AudioPlayback
+from utils.band_normalizer import adaptive_thresholds
+from utils.beat_tracking import HOP_MS, analyze_beats, beat_power_matrix
+from utils.playlist_pool import PlaylistPreparer
+from utils.scene import BulbGroup, PilotTable, level_table
+from utils.scheduler import START_LEAD, FrameScheduler, LatencyEstimator, print_schedule_report
+from utils.udp_transport import UdpTransport
+from utils.bulb_state import BulbStateCache, print_state_counters
+from utils.bulb_mailbox import BulbMailboxes, print_mailbox_counters
+from utils.bulb_health import HealthMonitor, print_health_counters
+from utils.telemetry import Telemetry
+from utils.startup import STARTUP
+from utils.audio_stream import StreamingBandAnalyzer, file_playback, open_pcm_source, stream_band_power
 
 freq_ranges = [(0, 250), (251, 500), (501, 2000), (2001, 4000), (4001, 8000)]
+BAND_ROW_LIMITS = (250, 500, 2000, 4000, 8000)  # highest frequency served by each row of bulbs
 CHUNK_MS = 1000  # Music is still processed in 1-second chunks for analysis
-LIGHT_UPDATE_INTERVAL = 0.78  # Adjusted to account for 0.23s bulb delay (1s - 0.23s ≈ 0.77s, rounded to 0.75s)
+ADAPTIVE_NORMALIZATION = True  # per-band rolling thresholds instead of one global 30/70 percentile split
+BEAT_MODE = False  # analyze at ~23 ms hops and change the lights on detected beats instead of every chunk
+USE_RAW_UDP = True  # send through the shared raw UDP socket instead of pywizlight's per-bulb request/retry
 MUSIC_FILES = ["./music/test3.mp3"]
 # MUSIC_FILES = ["./music/test0.mp3", "./music/test1.mp3", "./music/test2.mp3"]
 
@@ -18,6 +40,10 @@ power_color_mapping = {
     "Green": (0, 255, 0),
     "Blue": (0, 0, 255),
 }
+# Power level k lights the first k bulbs of a row in these colors, the rest are off
+LEVEL_SCENES = level_table([power_color_mapping[name] for name in ("Red", "Yellow", "Green", "Blue")])
+LEVEL_PILOTS = PilotTable()
+_row_levels = {}
 
 def calculate_power_level(power_db: float, lower_threshold: float, upper_threshold: float) -> int:
     """
@@ -29,130 +55,237 @@ def calculate_power_level(power_db: float, lower_threshold: float, upper_thresho
     level = round(normalized * 4)
     return max(0, min(level, 4))
 
-async def set_light_by_power_and_range(bulbs, power_db, freq_range, upper_threshold, lower_threshold):
+def map_bands_to_rows(registry, freq_ranges):
     """
-    Select bulbs by frequency range and set them based on power_db.
+    Precompute {freq_range: row of bulbs} once at startup: each range goes to the
+    first row whose frequency limit covers its upper bound.
+    """
+    band_rows = {}
+    for freq_range in freq_ranges:
+        row_index = next(
+            (i for i, limit in enumerate(BAND_ROW_LIMITS) if freq_range[1] <= limit),
+            len(BAND_ROW_LIMITS) - 1,
+        )
+        band_rows[freq_range] = registry.row(row_index)
+    return MappingProxyType(band_rows)
+
+def row_level_commands(row_of_bulbs):
+    """
+    The (bulb, PilotBuilder) commands of every power level for one row, looked up per frame.
+    Built once per row from LEVEL_SCENES, so frames share the same interned pilots.
+    """
+    commands = _row_levels.get(row_of_bulbs)
+    if commands is None:
+        commands = BulbGroup(row_of_bulbs[:ROW_SIZE], LEVEL_PILOTS).level_commands(LEVEL_SCENES)
+        _row_levels[row_of_bulbs] = commands
+    return commands
+
+def light_commands_by_power_and_range(band_rows, power_db, freq_range, upper_threshold, lower_threshold):
+    """
+    Select bulbs by frequency range and return the (bulb, PilotBuilder) commands for power_db.
+    A PilotBuilder of None means the bulb is turned off.
     """
     if power_db <= 0:
-        # No power, turn off all in range
-        return
+        # No power, leave the range as it is
+        return ()
 
-    max_freq = freq_range[1]
+    row_of_bulbs = band_rows[freq_range]
+    if len(row_of_bulbs) < ROW_SIZE:
+        # Row is incomplete after a partial discovery
+        return ()
 
-    # Pre-sliced bulb groups for fixed indices (4 bulbs per range)
-    range_bulbs_map = {
-        250: bulbs[0:4],
-        500: bulbs[4:8],
-        2000: bulbs[8:12],
-        4000: bulbs[12:16],
-        8000: bulbs[16:20],
-    }
-    
-    group = next((group for freq, group in range_bulbs_map.items() if max_freq <= freq), bulbs[16:20])
-    # group is a list of tuples
-    # Extract wizlight instances from tuples
-    row_of_bulbs = [t[1] for t in group]
- 
-    # Collect all bulb commands in a list
-    tasks = []
-    power_lvl = calculate_power_level(power_db, lower_threshold, upper_threshold)
-
-    if power_lvl >= 4:
-        tasks.append(row_of_bulbs[0].turn_on(PilotBuilder(rgb=power_color_mapping["Red"])))
-        tasks.append(row_of_bulbs[1].turn_on(PilotBuilder(rgb=power_color_mapping["Yellow"])))
-        tasks.append(row_of_bulbs[2].turn_on(PilotBuilder(rgb=power_color_mapping["Green"])))
-        tasks.append(row_of_bulbs[3].turn_on(PilotBuilder(rgb=power_color_mapping["Blue"])))
-    elif power_lvl == 3:
-        tasks.append(row_of_bulbs[0].turn_on(PilotBuilder(rgb=power_color_mapping["Red"])))
-        tasks.append(row_of_bulbs[1].turn_on(PilotBuilder(rgb=power_color_mapping["Yellow"])))
-        tasks.append(row_of_bulbs[2].turn_on(PilotBuilder(rgb=power_color_mapping["Green"])))
-        tasks.append(row_of_bulbs[3].turn_off())
-    elif power_lvl == 2:
-        tasks.append(row_of_bulbs[0].turn_on(PilotBuilder(rgb=power_color_mapping["Red"])))
-        tasks.append(row_of_bulbs[1].turn_on(PilotBuilder(rgb=power_color_mapping["Yellow"])))
-        tasks.append(row_of_bulbs[2].turn_off())
-        tasks.append(row_of_bulbs[3].turn_off())
-    elif power_lvl == 1:
-        tasks.append(row_of_bulbs[0].turn_on(PilotBuilder(rgb=power_color_mapping["Red"])))
-        tasks.append(row_of_bulbs[1].turn_off())
-        tasks.append(row_of_bulbs[2].turn_off())
-        tasks.append(row_of_bulbs[3].turn_off())
-    else:
-        # All off
-        for light in row_of_bulbs:
-            tasks.append(light.turn_off())
+    return row_level_commands(row_of_bulbs)[calculate_power_level(power_db, lower_threshold, upper_threshold)]
 
-    # Send all commands in a batch
-    await asyncio.gather(*tasks)
+def power_levels(power_matrix, upper_matrix, lower_matrix):
+    """
+    calculate_power_level over a whole (frames, bands) matrix at once.
+    Bands with no power get -1, meaning leave the row as it is.
+    """
+    span = upper_matrix - lower_matrix
+    with np.errstate(divide="ignore", invalid="ignore"):
+        levels = np.clip(np.rint((power_matrix - lower_matrix) / span * 4), 0, 4)
+    levels = np.where(span == 0, np.where(power_matrix >= lower_matrix, 4, 0), levels).astype(np.int64)
+    levels[power_matrix <= 0] = -1
+    return levels
+
+def level_frames(band_rows, levels):
+    """
+    Iterator over each frame's (bulb, PilotBuilder) commands for a (frames, bands) level matrix.
+    The command tuple of every distinct combination of band levels is built here, up front,
+    from the precomputed per-row level commands, so each frame is one table lookup.
+    """
+    band_levels = [
+        row_level_commands(band_rows[freq_range]) if len(band_rows[freq_range]) >= ROW_SIZE else None
+        for freq_range in freq_ranges
+    ]
+    # Incomplete rows are left as they are, like bands without power
+    levels = np.where([level_commands is not None for level_commands in band_levels], levels, -1)
+    # One integer per frame, its band levels (-1 to 4) as the digits of a base-6 number
+    keys = (levels + 1) @ (6 ** np.arange(levels.shape[1]))
+    _, first_frames, frame_combinations = np.unique(keys, return_index=True, return_inverse=True)
+    table = [
+        tuple(command
+              for level_commands, level in zip(band_levels, combination) if level >= 0
+              for command in level_commands[level])
+        for combination in levels[first_frames].tolist()
+    ]
+    return (table[combination] for combination in frame_combinations.tolist())
+
+def threshold_matrices(power_matrix, upper_threshold, lower_threshold, frame_interval):
+    """
+    Per-frame, per-band (upper, lower) thresholds in the shape of power_matrix.
+    With ADAPTIVE_NORMALIZATION every band follows its own rolling statistics,
+    otherwise every band gets the global thresholds.
+    """
+    if ADAPTIVE_NORMALIZATION:
+        return adaptive_thresholds(power_matrix, frame_interval, 0.30, 0.70)
+    return np.full(power_matrix.shape, upper_threshold), np.full(power_matrix.shape, lower_threshold)
 
-def pre_calculate_power_mapping(audio_file):
+def print_thresholds(upper_matrix, lower_matrix, upper_threshold, lower_threshold):
+    """Print the thresholds the show actually uses: per-band medians in adaptive mode, else the global pair."""
+    if not ADAPTIVE_NORMALIZATION:
+        print(f"Upper Threshold (lowest of highest 30%): {upper_threshold:.2f} dB")
+        print(f"Lower Threshold (highest of lowest 30%): {lower_threshold:.2f} dB")
+        return
+    print("Adaptive thresholds per band (median lower / upper):")
+    for (low, high), lower, upper in zip(freq_ranges, np.median(lower_matrix, axis=0), np.median(upper_matrix, axis=0)):
+        print(f"  {low}-{high} Hz: {lower:.2f} / {upper:.2f} dB")
+
+async def set_light_by_power_and_range(band_rows, power_db, freq_range, upper_threshold, lower_threshold):
+    """
+    Select bulbs by frequency range and set them based on power_db.
+    """
+    commands = light_commands_by_power_and_range(band_rows, power_db, freq_range, upper_threshold, lower_threshold)
+    tasks = [bulb.turn_off() if pilot is None else bulb.turn_on(pilot) for bulb, pilot in commands]
+
+    # Send all commands in a batch; one failing bulb must not abort the others
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def pre_calculate_power_mapping(audio_file, cache=None):
     """
     Pre-calculate power in dB for each frequency range chunk by chunk.
+    When an AnalysisCache is given, the result is read from / stored to disk.
     Returns:
         power_mapping {chunk_index: {freq_range: power_db}}
         upper_threshold (float)
         lower_threshold (float)
     """
-    song = AudioSegment.from_mp3(audio_file)
-    chunks = list(song[::CHUNK_MS])  # split into 1 second chunks for analysis
-    power_mapping = {}
-    all_power_values = []
-
-    for i, chunk in enumerate(chunks):
-        samples = np.array(chunk.get_array_of_samples())
-
-        if chunk.channels == 2:
-            samples = samples[::2]  # simplify stereo to mono
-
-        fft_result = np.fft.fft(samples)
-        freqs = np.fft.fftfreq(len(fft_result), d=1/song.frame_rate)
-
-        power_values = {}
-        for freq_range in freq_ranges:
-            min_freq, max_freq = freq_range
-            indices = np.where((freqs >= min_freq) & (freqs < max_freq))
-            power = np.sum(np.abs(fft_result[indices]) ** 2)
-            power_db = 10 * np.log10(power) if power > 0 else 0
+    if cache is not None:
+        power_matrix, upper_threshold, lower_threshold = cache.load_analysis(
+            audio_file, CHUNK_MS, freq_ranges, 0.30, 0.70
+        )
+        return power_matrix_to_mapping(power_matrix, freq_ranges), upper_threshold, lower_threshold
 
-            power_values[freq_range] = power_db
-            all_power_values.append(power_db)
+    from pydub import AudioSegment
 
-        power_mapping[i] = power_values
-
-    all_power_values.sort()
-    n = len(all_power_values)
-
-    lower_index = max(0, int(n * 0.30) - 1)
-    upper_index = min(n - 1, int(n * 0.70))
+    song = AudioSegment.from_mp3(audio_file)
+    samples = song_to_mono_samples(song)
 
-    lower_threshold = all_power_values[lower_index] if n > 0 else 0
-    upper_threshold = all_power_values[upper_index] if n > 0 else 0
+    # One batched rfft over the whole track instead of one fft per chunk
+    power_matrix = analyze_band_power(samples, song.frame_rate, CHUNK_MS, freq_ranges)
+    power_mapping = power_matrix_to_mapping(power_matrix, freq_ranges)
+    upper_threshold, lower_threshold = compute_thresholds(power_matrix, 0.30, 0.70)
 
     return power_mapping, upper_threshold, lower_threshold
 
-async def play_song(song):
+def pre_calculate_beat_matrix(audio_file, cache):
     """
-    Play song asynchronously, non-blocking.
-    Returns the play object (simpleaudio.PlayObject).
+    Onset/tempo/beat analysis at HOP_MS resolution.
+    Returns:
+        power_matrix (hop frames, bands) dB, non-zero on beat frames only
+        upper_threshold, lower_threshold over the beat frames
+        hop_seconds (float)
+    """
+    samples, frame_rate, _ = cache.load_pcm(audio_file)
+    analysis = analyze_beats(samples[:, 0], frame_rate, freq_ranges, HOP_MS)
+    power_matrix = beat_power_matrix(analysis["band_db"], analysis["beats"])
+    upper_threshold, lower_threshold = compute_thresholds(power_matrix[analysis["beats"]], 0.30, 0.70)
+    print(f"Tempo {analysis['tempo']:.1f} BPM, {len(analysis['beats'])} beats, {len(analysis['onsets'])} onsets")
+    return power_matrix, upper_threshold, lower_threshold, analysis["hop_seconds"]
+
+async def prepare_show(preparer, song_path):
     """
+    Wait for song_path's analysis and return (frame_interval, power_matrix, upper, lower, song).
+    In BEAT_MODE the beat analysis also runs here, off the event loop.
+    """
+    power_matrix, upper_threshold, lower_threshold, song = await preparer.prepare(song_path)
+    if not BEAT_MODE:
+        return CHUNK_MS / 1000, power_matrix, upper_threshold, lower_threshold, song
 
-    play_obj = simpleaudio.play_buffer(
-        song.raw_data,
-        num_channels=song.channels,
-        bytes_per_sample=song.sample_width,
-        sample_rate=song.frame_rate
+    loop = asyncio.get_running_loop()
+    power_matrix, upper_threshold, lower_threshold, hop_seconds = await loop.run_in_executor(
+        None, pre_calculate_beat_matrix, song_path, preparer.cache
     )
-    return play_obj
+    return hop_seconds, power_matrix, upper_threshold, lower_threshold, song
 
-async def delayed_music_playback(song, delay_seconds):
+async def play_song(song):
     """
-    Play the song after a specified delay.
+    Play song asynchronously, non-blocking, on the AUDIO_OUTPUT sink.
+    Returns the AudioPlayback, whose position is the show's master clock.
     """
-    print(f"Waiting {delay_seconds} seconds before starting music...")
-    await asyncio.sleep(delay_seconds)
-    play_obj = await play_song(song)
+    return AudioPlayback(song).start()
+
+async def music_playback_at(song, start_time, scheduler=None):
+    """
+    Start the song at start_time (event loop clock) and lock the scheduler, if any,
+    to the audio position from then on.
+    """
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(max(0, start_time - loop.time()))
+    playback = await play_song(song)
+    if scheduler is not None:
+        scheduler.lock_to(playback)
     print("Music started.")
-    return play_obj
+    return playback
+
+async def play_playlist(registry, song_paths, cache, latency, telemetry=None):
+    """
+    Play song_paths one after another on the registry's bulbs. Used by main() and the show daemon.
+    latency is shared across songs so its estimates keep improving.
+    """
+    bulbs = list(registry)
+    band_rows = map_bands_to_rows(registry, freq_ranges)
+
+    # Decode and analyze the whole playlist across cores; song N+1 is prepared while song N plays
+    preparer = PlaylistPreparer(cache, CHUNK_MS, freq_ranges, 0.30, 0.70)
+    preparer.submit_all(song_paths)
+    next_song = asyncio.create_task(prepare_show(preparer, song_paths[0]))
+    music_task = None
+
+    try:
+        for song_index, song_path in enumerate(song_paths):
+            frame_interval, power_matrix, upper_threshold, lower_threshold, song = await next_song
+            upper_matrix, lower_matrix = threshold_matrices(power_matrix, upper_threshold, lower_threshold, frame_interval)
+            levels = power_levels(power_matrix, upper_matrix, lower_matrix)
+            frames = level_frames(band_rows, levels)  # before the anchor, the table takes a few ms
+            print(f"Pre-calculated power mapping for {len(power_matrix)} frames of {frame_interval * 1000:.0f} ms.")
+            print_thresholds(upper_matrix, lower_matrix, upper_threshold, lower_threshold)
+
+            # Anchor frame 0 to the playback start, far enough ahead that the slowest
+            # bulb's command for it can still be dispatched in time
+            loop = asyncio.get_running_loop()
+            start_time = loop.time() + latency.max_estimate(bulbs) + START_LEAD
+            scheduler = FrameScheduler(frame_interval, latency, telemetry)
+            scheduler.anchor_at(start_time)
+            music_task = asyncio.create_task(music_playback_at(song, start_time, scheduler))
+            if song_index + 1 < len(song_paths):
+                next_song = asyncio.create_task(prepare_show(preparer, song_paths[song_index + 1]))
+
+            report = await scheduler.run(frames)
+            print_schedule_report(report)
+
+            playback = await music_task
+            music_task = None
+            playback.stop()  # Stop playback explicitly when done
+    finally:
+        # Also reached when the show is cancelled, e.g. stopped from the daemon
+        if music_task is not None:
+            if music_task.done():
+                music_task.result().stop()
+            else:
+                music_task.cancel()
+        next_song.cancel()
+        preparer.close()
 
 async def main():
     bulbs = await find_light_bulbs()
@@ -160,43 +293,100 @@ async def main():
         print("No bulbs found.")
         return
     
-    mapped_bulbs = map_light_bulbs(bulbs)
+    transport = None
+    if USE_RAW_UDP:
+        transport = await UdpTransport().open()
+        bulbs = transport.wrap(bulbs)
+    state_cache = BulbStateCache()
+    mailboxes = BulbMailboxes()
+    health = HealthMonitor()
+    # Latest-only mailbox per bulb, rate limited, in front of the health monitor and state cache
+    bulbs = mailboxes.wrap(health.wrap(state_cache.wrap(bulbs)))
+    telemetry = await Telemetry("music_light_advanced").start()
+    STARTUP.ready()
+
+    await play_playlist(BulbRegistry(bulbs), MUSIC_FILES, AnalysisCache(), LatencyEstimator(), telemetry)
+    print_state_counters(state_cache.counters())
+    print_mailbox_counters(mailboxes.counters())
+    print_health_counters(health.counters())
 
-    for song_path in MUSIC_FILES:
-        power_mapping, upper_threshold, lower_threshold = pre_calculate_power_mapping(song_path)
-        print(f"Pre-calculated power mapping for {len(power_mapping)} chunks.")
-        print(f"Upper Threshold (lowest of highest 30%): {upper_threshold:.2f} dB")
-        print(f"Lower Threshold (highest of lowest 30%): {lower_threshold:.2f} dB")
-
-        song = AudioSegment.from_mp3(song_path)
-        
-        # Start the music playback with a 5-second delay as a separate task
-        music_task = asyncio.create_task(delayed_music_playback(song, 5))
-
-        # Process all light updates immediately with adjusted interval to account for bulb delay
-        for chunk_index in range(len(power_mapping)):
-            print(f"Processing chunk {chunk_index + 1}/{len(power_mapping)}")
+    # Turn all bulbs off at end
+    off_tasks = [bulb.turn_off() for bulb in bulbs]
+    await asyncio.gather(*off_tasks, return_exceptions=True)
+    mailboxes.close()
+    health.close()
+    if transport is not None:
+        print(f"UDP transport: {transport.counters()}")
+        transport.close()
+    telemetry.finish()
+    print("Show finished!")
 
-            power_values = power_mapping[chunk_index]
-            light_tasks = [
-                set_light_by_power_and_range(mapped_bulbs, power_db, freq_range, upper_threshold, lower_threshold)
-                for freq_range, power_db in power_values.items()
-            ]
-            # Run bulb updates concurrently per chunk
-            await asyncio.gather(*light_tasks)
-            await asyncio.sleep(LIGHT_UPDATE_INTERVAL)  # Adjusted interval for light updates (0.75s)
+async def streaming_show(band_rows, source, telemetry=None):
+    """
+    Analyze a live or file source block by block while it plays, instead of
+    precomputing the whole song. Memory for the analysis stays constant regardless of
+    track length; a file source is also played, and the lights follow its playback clock.
+    """
+    playback = await file_playback(source)
+    blocks, frame_rate = await open_pcm_source(source, CHUNK_MS)
+    analyzer = StreamingBandAnalyzer(frame_rate, int(frame_rate * CHUNK_MS / 1000), freq_ranges, 0.30, 0.70,
+                                     adaptive=ADAPTIVE_NORMALIZATION)
+
+    async def on_frame(chunk_index, power_values, upper_thresholds, lower_thresholds):
+        light_tasks = [
+            set_light_by_power_and_range(band_rows, power_db, freq_range,
+                                         upper_thresholds[freq_range], lower_thresholds[freq_range])
+            for freq_range, power_db in power_values.items()
+        ]
+        await asyncio.gather(*light_tasks)
+
+    if playback is not None:
+        playback.start()
+    try:
+        stats = await stream_band_power(blocks, analyzer, on_frame, CHUNK_MS, telemetry=telemetry, clock=playback)
+        if playback is not None:
+            await playback.wait_done()  # the last chunk is still being heard
+    finally:
+        if playback is not None:
+            playback.stop()
+    print(f"Streamed {stats['frames']} chunks, first frame after {stats['first_frame_latency']:.3f} seconds")
+
+async def stream_main(source):
+    bulbs = await find_light_bulbs()
+    if not bulbs:
+        print("No bulbs found.")
+        return
 
-        # Wait for the music task to complete if it hasn't already
-        play_obj = await music_task
-        play_obj.stop()  # Stop playback explicitly when done
+    transport = None
+    if USE_RAW_UDP:
+        transport = await UdpTransport().open()
+        bulbs = transport.wrap(bulbs)
+    state_cache = BulbStateCache()
+    mailboxes = BulbMailboxes()
+    health = HealthMonitor()
+    bulbs = mailboxes.wrap(health.wrap(state_cache.wrap(bulbs)))
+    telemetry = await Telemetry("music_light_advanced_stream").start()
+    STARTUP.ready()
+    await streaming_show(map_bands_to_rows(BulbRegistry(bulbs), freq_ranges), source, telemetry)
+    print_state_counters(state_cache.counters())
+    print_mailbox_counters(mailboxes.counters())
+    print_health_counters(health.counters())
 
-    # Turn all bulbs off at end
     off_tasks = [bulb.turn_off() for bulb in bulbs]
-    await asyncio.gather(*off_tasks)
+    await asyncio.gather(*off_tasks, return_exceptions=True)
+    mailboxes.close()
+    health.close()
+    if transport is not None:
+        transport.close()
+    telemetry.finish()
     print("Show finished!")
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    if len(sys.argv) > 2 and sys.argv[1] == "--stream":
+        # e.g. --stream ./music/test0.mp3, --stream live.wav, --stream raw:/tmp/audio.fifo
+        loop.run_until_complete(stream_main(sys.argv[2]))
+    else:
+        loop.run_until_complete(main())
 
 
@@ -0,0 +1,165 @@
+import asyncio
+import sys
+
+from music_light_advanced import (
+    CHUNK_MS,
+    MUSIC_FILES,
+    freq_ranges,
+    level_frames,
+    map_bands_to_rows,
+    music_playback_at,
+    power_levels,
+    threshold_matrices,
+)
+from utils.analysis_cache import AnalysisCache
+from utils.bulb_registry import BulbRegistry
+from utils.network_utils import find_light_bulbs
+from utils.playlist_pool import PlaylistPreparer
+from utils.scheduler import START_LEAD
+from utils.shard_pool import DEFAULT_SHARDS, SHARD_START_LEAD, ShardCoordinator, print_shard_report, shard_by_subnet
+from utils.show_timeline import (
+    CUE_LEAD,
+    TimelinePlayer,
+    cue_columns,
+    cue_path,
+    cue_slots,
+    load_timeline,
+    render_timeline,
+    save_timeline,
+)
+from utils.telemetry import Telemetry
+from utils.startup import STARTUP
+from utils.udp_transport import UdpTransport
+
+REFRESH_FRAMES = 5  # re-send held states every 5 frames in case a packet was lost
+
+
+def render_song(song_path, cache):
+    """
+    Run the advanced show's analysis and band logic offline and store the result as a cue file.
+    """
+    power_matrix, upper_threshold, lower_threshold = cache.load_analysis(song_path, CHUNK_MS, freq_ranges, 0.30, 0.70)
+    upper_matrix, lower_matrix = threshold_matrices(power_matrix, upper_threshold, lower_threshold, CHUNK_MS / 1000)
+    levels = power_levels(power_matrix, upper_matrix, lower_matrix)
+
+    slots = cue_slots()
+    band_rows = map_bands_to_rows(BulbRegistry(slots), freq_ranges)
+    cues = render_timeline(level_frames(band_rows, levels), len(slots), REFRESH_FRAMES)
+
+    path = cue_path(song_path)
+    save_timeline(path, cues, CHUNK_MS / 1000, cue_columns())
+    changed = int(cues["changed"].sum())
+    print(f"Rendered {song_path} -> {path}: {len(cues)} frames, {changed} packets")
+    return path
+
+
+async def render_playlist(song_paths):
+    """
+    Decode and analyze every song in parallel worker processes, then render each as it becomes ready.
+    """
+    cache = AnalysisCache()
+    preparer = PlaylistPreparer(cache, CHUNK_MS, freq_ranges, 0.30, 0.70)
+    preparer.submit_all(song_paths)
+    try:
+        for song_path in song_paths:
+            await preparer.wait_ready(song_path)
+            render_song(song_path, cache)
+    finally:
+        preparer.close()
+
+
+async def play_cues(transport, registry, song_paths, cache, telemetry=None):
+    """
+    Play precompiled cue files with their music on the registry's bulbs through transport.
+    Used by play_rendered() and the show daemon.
+    """
+    for song_path in song_paths:
+        cues, frame_interval, columns = load_timeline(cue_path(song_path))
+        player = TimelinePlayer(transport, cues, frame_interval, columns, registry, telemetry=telemetry).prepare()
+        song = cache.load_song(song_path)
+
+        loop = asyncio.get_running_loop()
+        start_time = loop.time() + CUE_LEAD + START_LEAD
+        player.anchor_at(start_time)
+        music_task = asyncio.create_task(music_playback_at(song, start_time, player))
+        try:
+            stats = await player.run()
+        except asyncio.CancelledError:
+            if music_task.done():
+                music_task.result().stop()
+            else:
+                music_task.cancel()
+            raise
+        print(f"Played {stats['frames']} frames ({stats['skipped_frames']} skipped), {stats['packets']} packets")
+
+        playback = await music_task
+        playback.stop()
+
+
+async def play_rendered(song_paths):
+    bulbs = await find_light_bulbs()
+    if not bulbs:
+        print("No bulbs found.")
+        return
+
+    transport = await UdpTransport().open()
+    registry = BulbRegistry(transport.wrap(bulbs))
+    telemetry = await Telemetry("render_show").start()
+    STARTUP.ready()
+
+    await play_cues(transport, registry, song_paths, AnalysisCache(), telemetry)
+
+    await asyncio.gather(*(bulb.turn_off() for bulb in registry), return_exceptions=True)
+    print(f"UDP transport: {transport.counters()}")
+    transport.close()
+    telemetry.finish()
+    print("Show finished!")
+
+async def play_sharded(song_paths, shards=DEFAULT_SHARDS):
+    """
+    Play precompiled cue files with the bulbs split by subnet across worker processes.
+    This process only plays the music and keeps the shared anchor on the audio clock.
+    """
+    bulbs = await find_light_bulbs()
+    if not bulbs:
+        print("No bulbs found.")
+        return
+
+    registry = BulbRegistry(bulbs)
+    coordinator = ShardCoordinator(shard_by_subnet([(number, bulb.ip) for number, bulb in registry.numbered], shards),
+                                   {bulb.ip: bulb.addr for bulb in registry if getattr(bulb, "addr", None)})
+    print(f"{len(registry.numbered)} bulbs in {len(coordinator.shards)} shards")
+    cache = AnalysisCache()
+    try:
+        for song_path in song_paths:
+            song = cache.load_song(song_path)
+            loop = asyncio.get_running_loop()
+            start_time = loop.time() + SHARD_START_LEAD + CUE_LEAD + START_LEAD
+            music_task = asyncio.create_task(music_playback_at(song, start_time))
+            try:
+                reports = await coordinator.play(cue_path(song_path), start_time, music_task)
+            except BaseException:
+                music_task.cancel()
+                raise
+            print_shard_report(reports)
+            playback = await music_task
+            playback.stop()
+    finally:
+        coordinator.close()
+        await asyncio.gather(*(bulb.turn_off() for bulb in registry), return_exceptions=True)
+    print("Show finished!")
+
+if __name__ == "__main__":
+    # python render_show.py render [songs...]   - precompile cue files
+    # python render_show.py play [songs...]     - play precompiled cue files with the music
+    # python render_show.py shard [songs...]    - the same, with the bulbs sharded across worker processes
+    command = sys.argv[1] if len(sys.argv) > 1 else "render"
+    songs = sys.argv[2:] or MUSIC_FILES
+    if command == "render":
+        asyncio.run(render_playlist(songs))
+    elif command == "play":
+        asyncio.run(play_rendered(songs))
+    elif command == "shard":
+        asyncio.run(play_sharded(songs))
+    else:
+        print(f"Unknown command {command}, use render, play or shard.")
@@ -1,6 +1,10 @@
 import asyncio
 from utils.network_utils import find_light_bulbs
-from pywizlight import PilotBuilder
+from utils.bulb_registry import BulbRegistry
+from utils.bulb_mailbox import BulbMailboxes, print_mailbox_counters
+from utils.chase_engine import ChaseAnimator
+from utils.telemetry import Telemetry
+from utils.startup import STARTUP
 
 # Desired bulb order, by IP
 lights_ip_arrangement = [
@@ -8,6 +12,12 @@ lights_ip_arrangement = [
     "192.168.8.126", "192.168.8.157", "192.168.8.131"
 ]
 
+HEADS = 1  # number of lit heads chasing around the chain
+TAIL = 0  # bulbs trailing each head, dimmer the further behind
+FALLOFF = 0.5  # brightness factor per tail bulb
+BOUNCE = False  # run back and forth instead of wrapping around
+BRIGHTNESS = 1
+
 async def main():
     print("Starting program...")
 
@@ -17,43 +27,43 @@ async def main():
         print("No light bulbs found.")
         return
 
-    bulb_by_ip = {str(bulb.ip): bulb for bulb in discovered_bulbs}
+    registry = BulbRegistry(discovered_bulbs)
 
-    ordered_bulbs = []
-    for ip in lights_ip_arrangement:
-        bulb = bulb_by_ip.get(ip)
-        if bulb is not None:
-            ordered_bulbs.append(bulb)
-        else:
-            print(f"Warning: Bulb with IP {ip} not found among discovered bulbs!")
+    for ip in registry.missing(lights_ip_arrangement):
+        print(f"Warning: Bulb with IP {ip} not found among discovered bulbs!")
+    ordered_bulbs = registry.chain(lights_ip_arrangement)
 
     if not ordered_bulbs:
         print("No bulbs matched the desired IP arrangement.")
         return
 
-    await run_animation(ordered_bulbs, init_color=(255, 0, 0), speed=0.1)
-
-async def run_animation(bulbs, init_color, speed=1):
-    num_bulbs = len(bulbs)
+    mailboxes = BulbMailboxes()
+    telemetry = await Telemetry("running_light").start()
+    STARTUP.ready()
+    try:
+        await run_animation(mailboxes.wrap(ordered_bulbs), init_color=(255, 0, 0), speed=0.1, telemetry=telemetry)
+    finally:
+        print_mailbox_counters(mailboxes.counters())
+        mailboxes.close()
+        telemetry.finish()
 
-    for bulb in bulbs:
-        await bulb.turn_off()
-        
-    await bulbs[0].turn_on(PilotBuilder(brightness=1, rgb=init_color))
+async def run_animation(bulbs, init_color, speed=1, heads=HEADS, tail=TAIL, falloff=FALLOFF, bounce=BOUNCE,
+                        brightness=BRIGHTNESS, duration=None, telemetry=None):
+    animator = ChaseAnimator(bulbs, color=init_color, speed=speed, heads=heads, tail=tail,
+                             falloff=falloff, bounce=bounce, brightness=brightness, telemetry=telemetry)
+    await animator.reset()
+    await animator.apply(animator.frames[0])
 
     print("Starting animation in 3 seconds...")
     await asyncio.sleep(3)
 
-    current = 0
-    while True:
-        await asyncio.sleep(speed)
-        await bulbs[current].turn_off()
-
-        next_bulb = (current + 1) % num_bulbs
-
-        await bulbs[next_bulb].turn_on(PilotBuilder(brightness=1, rgb=init_color))
-
-        current = next_bulb
+    try:
+        await animator.run(duration)
+    finally:
+        stats = animator.stats
+        print(f"Chase: {stats['steps']} steps, {stats['dropped_steps']} dropped, "
+              f"{stats['achieved_rate']:.2f} steps/sec achieved of {stats['requested_rate']:.2f} requested")
+    return animator.stats
 
 if __name__ == "__main__":
     asyncio.run(main())
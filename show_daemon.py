@@ -0,0 +1,254 @@
+import asyncio
+import time
+from collections import deque
+
+from utils.network_utils import find_light_bulbs
+from utils.bulb_registry import BulbRegistry
+from utils.bulb_state import BulbStateCache
+from utils.bulb_health import HealthMonitor
+from utils.bulb_mailbox import BulbMailboxes
+from utils.udp_transport import UdpTransport
+from utils.scheduler import LatencyEstimator
+from utils.telemetry import Telemetry
+from utils.scene import BulbGroup, PilotTable, scene_entry, scene_frame
+from utils.startup import STARTUP
+from utils.control_api import CONTROL_HOST, CONTROL_PORT, ControlError, serve_control_api
+
+USE_RAW_UDP = True
+SCENES = ("gradient", "chase")
+SCRIPTS = ("advanced", "rendered")
+
+
+def _byte(value, name):
+    value = int(value)
+    if not 0 <= value <= 255:
+        raise ControlError(f"{name} must be in 0..255, got {value}")
+    return value
+
+
+def _rgb(value):
+    if value is None:
+        return None
+    if len(value) != 3:
+        raise ControlError(f"rgb needs 3 values, got {len(value)}")
+    return tuple(_byte(v, "rgb") for v in value)
+
+
+class ShowDaemon:
+    """
+    Owns discovery and the bulb connections for as long as it runs, and serves a local
+    JSON control API so clients never rediscover bulbs:
+
+        GET  /bulbs                      numbered bulbs
+        GET  /status                     current activity, queue, last failure and counters
+        POST /set    {"group", "rgb", "brightness", "state"}
+                                         one batch command for a group
+        POST /scene/start {"scene", ...} start a looping scene, replacing the current activity
+        POST /stop   {"clear": false}    stop the current activity (and empty the queue)
+        POST /queue  {"script", "songs"} queue a show script, run after the current one
+        POST /shutdown
+
+    Groups are "all", "row1".."row5" (rows of utils.bulb_registry.ROW_SIZE) or bulb numbers like "1,2,7".
+    """
+
+    def __init__(self, host=CONTROL_HOST, port=CONTROL_PORT):
+        self.host = host
+        self.port = port
+        self.transport = None
+        self.state_cache = BulbStateCache()
+        self.health = HealthMonitor()
+        self.mailboxes = BulbMailboxes()
+        self.registry = None
+        self.cache = None  # created with the first queued show
+        self.latency = LatencyEstimator()
+        self.telemetry = Telemetry("show_daemon")
+        self.pilots = PilotTable()
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.current = None
+        self.current_name = None
+        self.last_error = None  # {"activity", "error"} of the last activity that raised
+        self.runner = None
+        self.server = None
+        self.stopped = asyncio.Event()
+
+    async def start(self, bulbs=None):
+        if bulbs is None:
+            bulbs = await find_light_bulbs()
+        if USE_RAW_UDP:
+            self.transport = await UdpTransport().open()
+            bulbs = self.transport.wrap(bulbs)
+        bulbs = self.mailboxes.wrap(self.health.wrap(self.state_cache.wrap(bulbs)))
+        self.registry = BulbRegistry(bulbs)
+        await self.telemetry.start()
+        self.runner = asyncio.create_task(self._run_queue())
+        self.server = await serve_control_api({
+            ("GET", "/bulbs"): self.list_bulbs,
+            ("GET", "/status"): self.status,
+            ("POST", "/set"): self.set_group,
+            ("POST", "/scene/start"): self.start_scene,
+            ("POST", "/stop"): self.stop,
+            ("POST", "/queue"): self.enqueue,
+            ("POST", "/shutdown"): self.shutdown,
+        }, self.host, self.port)
+        print(f"Show daemon controlling {len(self.registry)} bulbs on http://{self.host}:{self.port}")
+        STARTUP.ready()
+        return self
+
+    def group(self, spec):
+        try:
+            return self.registry.group(spec)
+        except KeyError:
+            raise ControlError(f"unknown bulb in group {spec}", 404)
+
+    async def list_bulbs(self, body):
+        return {"bulbs": [{"number": number, "ip": bulb.ip, "mac": bulb.mac} for number, bulb in self.registry.numbered]}
+
+    async def status(self, body):
+        activity = None
+        if self.current is not None and not self.current.done():
+            activity = self.current_name
+        return {
+            "activity": activity,
+            "queue": [name for name, _ in self.queue],
+            "last_error": self.last_error,
+            "state": self.state_cache.counters(),
+            "mailbox": self.mailboxes.counters(),
+            "health": self.health.counters(),
+        }
+
+    async def set_group(self, body):
+        group = BulbGroup(self.group(body.get("group")), self.pilots)
+        entry = scene_entry(_rgb(body.get("rgb")),
+                            None if body.get("brightness") is None else _byte(body["brightness"], "brightness"),
+                            bool(body.get("state", True)))
+        start = time.perf_counter()
+        results = await group.apply(scene_frame(len(group), entry))
+        elapsed = time.perf_counter() - start
+        self.telemetry.count("control_commands", len(group))
+        self.telemetry.observe("control_set", elapsed)
+        return {
+            "bulbs": len(group),
+            "failed": sum(1 for result in results if isinstance(result, BaseException)),
+            "seconds": elapsed,
+        }
+
+    def _start(self, name, coro):
+        self.current_name = name
+        self.current = asyncio.create_task(coro)
+        self.current.add_done_callback(lambda task: self._finished(name, task))
+
+    def _finished(self, name, task):
+        # Reading the exception here also keeps asyncio from logging it as never retrieved
+        if task.cancelled() or task.exception() is None:
+            return
+        exc = task.exception()
+        self.last_error = {"activity": name, "error": f"{type(exc).__name__}: {exc}"}
+        self.telemetry.count("failed_activities")
+        print(f"{name} failed: {type(exc).__name__}: {exc}")
+
+    def _replace_current(self, name, coro):
+        if self.current is not None and not self.current.done():
+            self.current.cancel()
+        self._start(name, coro)
+        self.wakeup.set()
+
+    async def start_scene(self, body):
+        from utils.gradient_engine import GradientAnimator
+        from utils.chase_engine import ChaseAnimator
+
+        scene = body.get("scene")
+        bulbs = [bulb for _, bulb in self.registry.numbered] or list(self.registry)
+        if scene == "gradient":
+            animator = GradientAnimator(bulbs, step=int(body.get("step", 5)), fps=float(body.get("fps", 10)),
+                                        spread=float(body.get("spread", 1.0)), telemetry=self.telemetry)
+        elif scene == "chase":
+            animator = ChaseAnimator(bulbs, color=_rgb(body.get("rgb", (255, 0, 0))),
+                                     speed=float(body.get("speed", 0.1)), heads=int(body.get("heads", 1)),
+                                     tail=int(body.get("tail", 0)), bounce=bool(body.get("bounce", False)),
+                                     telemetry=self.telemetry)
+        else:
+            raise ControlError(f"unknown scene {scene}, use one of {', '.join(SCENES)}")
+        duration = body.get("duration")
+        self._replace_current(f"scene:{scene}", animator.run(None if duration is None else float(duration)))
+        return {"activity": self.current_name}
+
+    async def stop(self, body):
+        stopped = None
+        if self.current is not None and not self.current.done():
+            stopped = self.current_name
+            self.current.cancel()
+        if body.get("clear"):
+            self.queue.clear()
+        return {"stopped": stopped, "queue": [name for name, _ in self.queue]}
+
+    def _show_job(self, script, songs):
+        # Show modules pull in audio analysis and playback, so they are only imported when a show is queued
+        if self.cache is None:
+            from utils.analysis_cache import AnalysisCache
+            self.cache = AnalysisCache()
+        if script == "advanced":
+            from music_light_advanced import play_playlist
+            return lambda: play_playlist(self.registry, songs, self.cache, self.latency, self.telemetry)
+        if script == "rendered":
+            if self.transport is None:
+                raise ControlError("rendered shows need USE_RAW_UDP", 409)
+            from render_show import play_cues
+            return lambda: play_cues(self.transport, self.registry, songs, self.cache, self.telemetry)
+        raise ControlError(f"unknown script {script}, use one of {', '.join(SCRIPTS)}")
+
+    async def enqueue(self, body):
+        script = body.get("script")
+        songs = body.get("songs")
+        if not songs:
+            from music_light_advanced import MUSIC_FILES
+            songs = MUSIC_FILES
+        self.queue.append((f"{script}:{','.join(songs)}", self._show_job(script, list(songs))))
+        self.wakeup.set()
+        return {"queue": [name for name, _ in self.queue]}
+
+    async def _run_queue(self):
+        """Start queued shows one at a time whenever nothing else is running."""
+        while True:
+            if self.current is not None and not self.current.done():
+                await asyncio.wait([self.current])
+                continue
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            name, job = self.queue.popleft()
+            self._start(name, job())
+
+    async def shutdown(self, body):
+        self.stopped.set()
+        return {"shutdown": True}
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        tasks = [task for task in (self.current, self.runner) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.registry is not None:
+            # Leave the rig dark rather than frozen on the last frame of the show
+            await asyncio.gather(*(bulb.turn_off() for bulb in self.registry), return_exceptions=True)
+        self.mailboxes.close()
+        self.health.close()
+        if self.transport is not None:
+            self.transport.close()
+        self.telemetry.finish()
+
+
+async def main():
+    daemon = await ShowDaemon().start()
+    try:
+        await daemon.stopped.wait()
+    finally:
+        await daemon.close()
+    print("Show daemon stopped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,17 @@
-import asyncio
-from pywizlight import wizlight, PilotBuilder, discovery
-from utils.network_utils import find_light_bulbs
-from utils.constants import map_light_bulbs  # Import the ip_mapping from utils.py
+import sys
+from utils.control_api import ControlError, control_request
+
+# Thin client for show_daemon.py: the daemon owns discovery and the bulbs, this only sends requests.
+#
+#   python simple_cli_control.py                       interactive menu
+#   python simple_cli_control.py set <group> r g b [brightness]
+#   python simple_cli_control.py off <group>
+#   python simple_cli_control.py scene gradient|chase [duration]
+#   python simple_cli_control.py stop [clear]
+#   python simple_cli_control.py queue advanced|rendered [song.mp3 ...]
+#   python simple_cli_control.py status
+#
+# <group> is all, row1..row5 or bulb numbers like 1,2,7.
 
 rainbow_colors = [
     (255, 0, 0),      # Red
@@ -12,36 +22,32 @@ rainbow_colors = [
     (148, 0, 211)     # Violet
 ]
 
-async def start_terminal():
-    print("Starting terminal...")
-    
-    bulbs = await find_light_bulbs()
-    mapped_bulbs = map_light_bulbs(bulbs)
 
-    await display_menu(mapped_bulbs)
+def send_set(group, rgb=None, brightness=None, state=True):
+    result = control_request("POST", "/set", {"group": group, "rgb": rgb, "brightness": brightness, "state": state})
+    print(f"{result['bulbs']} bulbs updated in {result['seconds'] * 1000:.1f} ms, {result['failed']} failed")
+
 
-async def display_menu(mapped_bulbs):
+def display_menu():
     while True:
+        bulbs = control_request("GET", "/bulbs")["bulbs"]
         print("Menu:")
         print("Select a light bulb to control:")
-        for number, bulb in mapped_bulbs:
-            print(f"{number}. Light bulb {number} at {bulb.ip}")
+        for bulb in bulbs:
+            print(f"{bulb['number']}. Light bulb {bulb['number']} at {bulb['ip']}")
 
         print("0. Exit")
-        choice = int(input("Enter your choice: "))
-        if choice == 0:
+        choice = input("Enter your choice: ").strip()
+        if choice == "0":
             return
-        
-        light_index = choice - 1
-        if light_index < 0 or light_index >= len(mapped_bulbs):
-            print("Invalid selection. Exiting.")
+        if choice not in {str(bulb["number"]) for bulb in bulbs}:
+            print("Invalid selection.")
             continue
-        
-        print("Selected bulb:", mapped_bulbs[light_index][1].ip)
 
-        await display_commands_light_bulb(mapped_bulbs[light_index][1])
+        display_commands_light_bulb(choice)
+
 
-async def display_commands_light_bulb(light_bulb):
+def display_commands_light_bulb(group):
     print("Commands:")
     print("1. Turn on")
     print("2. Turn off")
@@ -50,39 +56,75 @@ async def display_commands_light_bulb(light_bulb):
     print("5. Exit")
 
     command = input("Enter command number: ")
-    
+
     if command == "1":
-        await light_bulb.turn_on(PilotBuilder(brightness=1))
+        send_set(group, brightness=1)
     elif command == "2":
-        await light_bulb.turn_off()
+        send_set(group, state=False)
     elif command == "3":
-        await set_light_bulb_color(light_bulb)
+        set_light_bulb_color(group)
     elif command == "4":
-        await set_light_bulb_brightness(light_bulb)
+        set_light_bulb_brightness(group)
     elif command == "5":
         print("Exiting.")
         return
     else:
         print("Invalid command.")
 
-async def set_light_bulb_color(light_bulb):
+
+def set_light_bulb_color(group):
     print("Write rgb color in format: r g b (e.g. 255 0 0 for red)")
     input_color = input("Enter color: ")
-    selected_color = tuple(map(int, input_color.split()))
+    selected_color = list(map(int, input_color.split()))
+
+    send_set(group, rgb=selected_color, brightness=1)
 
-    await light_bulb.turn_on(PilotBuilder(rgb=selected_color, brightness=1))
 
-async def set_light_bulb_brightness(light_bulb):
+def set_light_bulb_brightness(group):
     brightness = int(input("Enter brightness: "))
 
     while brightness < 0 or brightness > 255:
         print("Brightness must be between 0 and 255.")
         brightness = int(input("Enter brightness: "))
 
-    await light_bulb.turn_on(PilotBuilder(brightness=brightness))
+    send_set(group, brightness=brightness)
+
+
+def run_command(args):
+    command, rest = args[0], args[1:]
+    if command == "set":
+        rgb = list(map(int, rest[1:4]))
+        send_set(rest[0], rgb=rgb, brightness=int(rest[4]) if len(rest) > 4 else None)
+    elif command == "off":
+        send_set(rest[0] if rest else "all", state=False)
+    elif command == "scene":
+        body = {"scene": rest[0]}
+        if len(rest) > 1:
+            body["duration"] = float(rest[1])
+        print(control_request("POST", "/scene/start", body))
+    elif command == "stop":
+        print(control_request("POST", "/stop", {"clear": rest[:1] == ["clear"]}))
+    elif command == "queue":
+        print(control_request("POST", "/queue", {"script": rest[0], "songs": rest[1:]}))
+    elif command == "status":
+        print(control_request("GET", "/status"))
+    elif command == "shutdown":
+        print(control_request("POST", "/shutdown", {}))
+    else:
+        print(f"Unknown command {command}.")
+
+
+def main():
+    try:
+        if len(sys.argv) > 1:
+            run_command(sys.argv[1:])
+        else:
+            display_menu()
+    except ConnectionError as exc:
+        print(f"{exc}\nStart it first with: python show_daemon.py")
+    except ControlError as exc:
+        print(f"Daemon refused the request: {exc}")
 
-async def main():
-    await start_terminal()
 
-loop = asyncio.get_event_loop()
-loop.run_until_complete(main())
+if __name__ == "__main__":
+    main()
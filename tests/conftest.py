@@ -0,0 +1,15 @@
+import pytest
+
+
+class DiscoveredBulb:
+    """What UdpTransport.wrap reads from a discovered wizlight: its ip and mac."""
+
+    def __init__(self, ip, mac=None):
+        self.ip = ip
+        self.mac = mac
+
+
+@pytest.fixture
+def discovered():
+    """Discovered-bulb stand-ins for a list of IPs, such as a BulbSimulator's."""
+    return lambda ips: [DiscoveredBulb(ip) for ip in ips]
@@ -0,0 +1,73 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from utils.analysis_cache import AnalysisCache, compute_entries
+
+FRAME_RATE = 8000
+SECONDS = 0.5
+PCM_BYTES = int(FRAME_RATE * SECONDS) * 2 * 2  # stereo int16 samples in a pcm-*.npy, before its header
+
+
+def write_song(path, seed):
+    samples = np.random.default_rng(seed).integers(-8000, 8000, size=(int(FRAME_RATE * SECONDS), 2), dtype=np.int16)
+    with wave.open(str(path), "wb") as song:
+        song.setnchannels(2)
+        song.setsampwidth(2)
+        song.setframerate(FRAME_RATE)
+        song.writeframes(samples.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def songs(tmp_path):
+    return [write_song(tmp_path / f"song{i}.wav", i) for i in range(3)]
+
+
+def cached_names(cache):
+    return sorted(name for name in os.listdir(cache.cache_dir) if name.endswith(".npy"))
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, songs):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=int(2.5 * PCM_BYTES))
+    first, second, third = songs
+    cache.load_pcm(first)
+    cache.load_pcm(second)
+    cache.load_pcm(first)  # now the second song is the least recently used
+    cache.load_pcm(third)
+
+    kept = {f"pcm-{cache.file_hash(song)}.npy" for song in (first, third)}
+    assert set(cached_names(cache)) == kept
+    assert {name + ".npy" for name in cache.index["entries"]} == kept
+
+    # the index on disk agrees, so the next run sees the same entries
+    assert AnalysisCache(cache.cache_dir, cache.max_bytes).index["entries"].keys() == cache.index["entries"].keys()
+
+
+def test_entry_in_use_is_kept_over_the_cap(tmp_path, songs):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=PCM_BYTES // 2)
+    for song in songs:
+        samples, frame_rate, sample_width = cache.load_pcm(song)
+        assert (samples.shape, frame_rate, sample_width) == ((int(FRAME_RATE * SECONDS), 2), FRAME_RATE, 2)
+    assert cached_names(cache) == [f"pcm-{cache.file_hash(songs[-1])}.npy"]
+
+
+def test_warm_hit_returns_the_decoded_samples(tmp_path, songs):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    decoded, _, _ = cache.load_pcm(songs[0])
+    decoded = np.array(decoded)
+    mtime = os.stat(cache._path(f"pcm-{cache.file_hash(songs[0])}.npy")).st_mtime_ns
+
+    samples, _, _ = AnalysisCache(cache.cache_dir).load_pcm(songs[0])
+    np.testing.assert_array_equal(samples, decoded)
+    assert os.stat(cache._path(f"pcm-{cache.file_hash(songs[0])}.npy")).st_mtime_ns == mtime
+
+
+def test_register_keeps_both_entries_of_a_song(tmp_path, songs):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=PCM_BYTES)
+    result = compute_entries(cache.prepare_job(songs[0], 50, [(20, 250), (250, 4000)]))
+    cache.register(result)
+    assert set(cache.index["entries"]) == {result["pcm_name"], result["power_name"]}
+    assert len(cached_names(cache)) == 2
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from music_light_advanced import CHUNK_MS, freq_ranges
+from utils.analysis_reference import legacy_power_mapping, synthetic_song
+from utils.audio_analysis import analyze_band_power, compute_thresholds, power_matrix_to_mapping, song_to_mono_samples
+
+
+def vectorized_power_mapping(song):
+    power_matrix = analyze_band_power(song_to_mono_samples(song), song.frame_rate, CHUNK_MS, freq_ranges)
+    upper_threshold, lower_threshold = compute_thresholds(power_matrix)
+    return power_matrix_to_mapping(power_matrix, freq_ranges), upper_threshold, lower_threshold
+
+
+# Whole chunks; a short last chunk; a full last chunk that runs a few samples past the end; under one chunk
+@pytest.mark.parametrize("seconds", [10.0, 10.5, 10.0 + 30 / 44100, 0.3])
+def test_vectorized_analysis_matches_per_chunk_loop(seconds):
+    song = synthetic_song(seconds)
+    legacy_mapping, legacy_upper, legacy_lower = legacy_power_mapping(song, CHUNK_MS, freq_ranges)
+    mapping, upper, lower = vectorized_power_mapping(song)
+
+    assert len(mapping) == len(legacy_mapping)
+    for i in legacy_mapping:
+        assert list(mapping[i]) == freq_ranges
+        np.testing.assert_allclose(list(mapping[i].values()), list(legacy_mapping[i].values()), rtol=1e-9)
+    assert np.isclose(upper, legacy_upper)
+    assert np.isclose(lower, legacy_lower)
+
+
+def test_silent_song_matches_per_chunk_loop():
+    song = synthetic_song(2.0).apply_gain(-200)
+    legacy_mapping, legacy_upper, legacy_lower = legacy_power_mapping(song, CHUNK_MS, freq_ranges)
+    mapping, upper, lower = vectorized_power_mapping(song)
+    for i in legacy_mapping:
+        assert list(mapping[i].values()) == list(legacy_mapping[i].values())
+    assert (upper, lower) == (legacy_upper, legacy_lower)
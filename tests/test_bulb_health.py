@@ -0,0 +1,23 @@
+import asyncio
+
+from utils.bulb_health import HealthMonitor
+from utils.bulb_simulator import BulbSimulator
+from utils.udp_transport import UdpBulb, UdpTransport
+
+
+def test_quarantined_bulb_rejoins_when_its_address_answers():
+    async def run():
+        async with BulbSimulator(1, latency=0.01, jitter=0) as simulator:
+            transport = await UdpTransport().open()
+            monitor = HealthMonitor(reprobe_interval=0.05)
+            try:
+                # a replayed bulb: the recorded IP does not answer, the loopback address does
+                bulb, = monitor.wrap([UdpBulb(transport, "192.0.2.1", addr=(simulator.ips[0], simulator.port))])
+                monitor.quarantine(bulb)
+                await asyncio.wait_for(monitor.prober, 2.0)
+            finally:
+                monitor.close()
+                transport.close()
+            return bulb.health.quarantined, monitor.rejoined
+
+    assert asyncio.run(run()) == (False, 1)
@@ -0,0 +1,79 @@
+import asyncio
+
+from pywizlight import PilotBuilder
+
+from utils.bulb_mailbox import BulbMailboxes
+from utils.bulb_simulator import BulbSimulator
+from utils.udp_transport import UdpTransport
+
+
+
+async def mailbox_rig(simulator, discovered, max_rate=10.0):
+    transport = await UdpTransport(ack_timeout=2.0).open()
+    mailboxes = BulbMailboxes(max_rate=max_rate)
+    bulbs = mailboxes.wrap(transport.wrap(discovered(simulator.ips)))
+    return transport, mailboxes, bulbs
+
+
+def test_latest_command_supersedes_queued_ones(discovered):
+    async def run():
+        async with BulbSimulator(1, latency=0.02, jitter=0) as simulator:
+            transport, mailboxes, (bulb,) = await mailbox_rig(simulator, discovered)
+            try:
+                first = asyncio.create_task(bulb.turn_on(PilotBuilder(brightness=10)))
+                await asyncio.sleep(0.005)  # the worker has taken the first command
+                queued = [asyncio.create_task(bulb.turn_on(PilotBuilder(brightness=b))) for b in (20, 30, 40)]
+                results = await asyncio.gather(first, *queued)
+            finally:
+                mailboxes.close()
+                transport.close()
+            return results, mailboxes.counters(), simulator.bulbs[0]
+
+    results, counters, simulated = asyncio.run(run())
+    assert isinstance(results[0], float)
+    assert results[1:3] == [False, False]
+    assert isinstance(results[3], float)
+    assert counters["submitted"] == 4
+    assert counters["sent"] == 2
+    assert counters["superseded"] == 2
+    assert counters["queue_depth"] == 0
+    assert simulated.received == 2
+    assert simulated.pilot["dimming"] == PilotBuilder(brightness=40).pilot_params["dimming"]
+
+
+def test_commands_to_one_bulb_respect_max_rate(discovered):
+    async def run():
+        async with BulbSimulator(1, latency=0.0, jitter=0) as simulator:
+            transport, mailboxes, (bulb,) = await mailbox_rig(simulator, discovered, max_rate=20.0)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            try:
+                for level in range(1, 6):
+                    await bulb.turn_on(PilotBuilder(brightness=level))
+            finally:
+                mailboxes.close()
+                transport.close()
+            return loop.time() - start
+
+    # five commands in a row, at most one every 50 ms
+    assert asyncio.run(run()) >= 4 / 20.0
+
+
+def test_close_cancels_in_flight_and_queued_commands(discovered):
+    async def run():
+        async with BulbSimulator(1, latency=0.5, jitter=0) as simulator:
+            transport, mailboxes, (bulb,) = await mailbox_rig(simulator, discovered)
+            try:
+                in_flight = asyncio.create_task(bulb.turn_on(PilotBuilder(brightness=10)))
+                await asyncio.sleep(0.05)
+                queued = asyncio.create_task(bulb.turn_on(PilotBuilder(brightness=20)))
+                await asyncio.sleep(0)
+                mailboxes.close()
+                results = await asyncio.wait_for(asyncio.gather(in_flight, queued, return_exceptions=True), 0.2)
+            finally:
+                transport.close()
+            return results, mailboxes.counters()
+
+    results, counters = asyncio.run(run())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert counters["queue_depth"] == 0
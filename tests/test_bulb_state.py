@@ -0,0 +1,57 @@
+import asyncio
+
+from pywizlight import PilotBuilder
+
+from utils.bulb_state import BulbStateCache
+
+RED = PilotBuilder(rgb=(255, 0, 0))
+BLUE = PilotBuilder(rgb=(0, 0, 255))
+
+
+class SlowBulb:
+    """Applies each command on arrival and acknowledges it after its own delay."""
+
+    ip = "192.0.2.1"
+
+    def __init__(self):
+        self.delays = []
+        self.applied = []
+
+    async def turn_on(self, pilot):
+        self.applied.append(pilot.pilot_params["r"])
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+
+    async def turn_off(self):
+        self.applied.append(None)
+
+
+def test_repeated_state_is_suppressed_until_refresh():
+    async def run():
+        cache = BulbStateCache(refresh_interval=60)
+        bulb, = cache.wrap([SlowBulb()])
+        results = [await bulb.turn_on(RED), await bulb.turn_on(RED), await bulb.turn_off()]
+        return results, cache.counters()
+
+    results, counters = asyncio.run(run())
+    assert results == [True, False, True]
+    assert (counters["sent"], counters["suppressed"]) == (2, 1)
+
+
+def test_command_back_to_the_acknowledged_state_overtakes_a_pending_one():
+    async def run():
+        slow = SlowBulb()
+        bulb, = BulbStateCache(refresh_interval=60).wrap([slow])
+        await bulb.turn_on(RED)
+        slow.delays = [0.05, 0.0]
+        # blue is still pending when red is asked for again; red must not be taken as already applied
+        blue = asyncio.create_task(bulb.turn_on(BLUE))
+        await asyncio.sleep(0.01)
+        red = await bulb.turn_on(RED)
+        await blue
+        return red, slow.applied, await bulb.turn_on(RED)
+
+    red, applied, repeat = asyncio.run(run())
+    assert red is True
+    assert applied == [255, 0, 255]
+    # blue's late acknowledgement does not overwrite red, the state the bulb is really in
+    assert repeat is False
@@ -0,0 +1,17 @@
+import numpy as np
+
+from utils.chase_engine import chase_frames, chase_positions
+
+
+def test_bounce_directions_follow_the_leg_being_finished():
+    positions, directions = chase_positions(4, 6, bounce=True)
+    assert positions.tolist() == [0, 1, 2, 3, 2, 1]
+    assert directions.tolist() == [-1, 1, 1, 1, -1, -1]
+
+
+def test_bounce_tail_stays_visible_at_the_ends():
+    frames = chase_frames(4, tail=2, falloff=0.5, bounce=True, brightness=255)
+    assert frames[0].tolist() == [255, 128, 64, 0]
+    assert frames[3].tolist() == [0, 64, 128, 255]
+    # one bulb in from an end only one bulb is left behind the head for the tail
+    assert np.count_nonzero(frames, axis=1).tolist() == [3, 2, 3, 3, 2, 3]
@@ -0,0 +1,18 @@
+import pytest
+
+from gradient_one import updatelightColorByHue
+from utils.gradient_engine import hue_wheel
+
+
+@pytest.mark.parametrize("step", [1, 5, 7, 60, 255])
+def test_hue_wheel_matches_single_step_walk(step):
+    wheel = hue_wheel(step)
+    color = (255, 0, 0)
+    walk = []
+    for _ in range(len(wheel)):
+        walk.append(color)
+        color = updatelightColorByHue(color, step)
+
+    assert [tuple(int(v) for v in entry) for entry in wheel] == walk
+    # one more step closes the cycle back on red
+    assert color == (255, 0, 0)
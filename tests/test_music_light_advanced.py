@@ -0,0 +1,41 @@
+import numpy as np
+
+from music_light_advanced import (
+    calculate_power_level, freq_ranges, level_frames, power_levels, row_level_commands,
+)
+
+
+def test_power_levels_match_calculate_power_level():
+    rng = np.random.default_rng(0)
+    power = rng.uniform(-10, 90, size=(200, 5))
+    power[::17] = 0  # silent chunks
+    lower = rng.uniform(20, 50, size=power.shape)
+    upper = lower + rng.uniform(0, 30, size=power.shape)
+    upper[::7] = lower[::7]  # collapsed thresholds
+    power[3, 2] = lower[3, 2] + (upper[3, 2] - lower[3, 2]) * 0.625  # exactly half-way between two levels
+
+    levels = power_levels(power, upper, lower)
+
+    for (frame, band), power_db in np.ndenumerate(power):
+        if power_db <= 0:
+            assert levels[frame, band] == -1
+        else:
+            expected = calculate_power_level(float(power_db), float(lower[frame, band]), float(upper[frame, band]))
+            assert levels[frame, band] == expected, (frame, band)
+
+
+def test_level_frames_look_up_each_frames_commands():
+    rows = [tuple(f"bulb-{band}-{i}" for i in range(4)) for band in range(len(freq_ranges))]
+    rows[3] = rows[3][:2]  # incomplete row, never addressed
+    band_rows = dict(zip(freq_ranges, rows))
+    levels = np.random.default_rng(1).integers(-1, 5, size=(300, len(freq_ranges)))
+
+    frames = list(level_frames(band_rows, levels))
+
+    assert len(frames) == len(levels)
+    for frame_levels, commands in zip(levels.tolist(), frames):
+        expected = [command
+                    for band, level in enumerate(frame_levels) if level >= 0 and band != 3
+                    for command in row_level_commands(rows[band])[level]]
+        assert list(commands) == expected
+    assert list(level_frames(band_rows, levels[:0])) == []
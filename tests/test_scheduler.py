@@ -0,0 +1,125 @@
+import asyncio
+
+from pywizlight import PilotBuilder
+
+from utils.bulb_simulator import BulbSimulator
+from utils.scheduler import FrameScheduler, LatencyEstimator
+from utils.udp_transport import UdpTransport
+
+FRAME_INTERVAL = 0.05
+# A busy machine can wake the loop late, never early: lateness is only bounded by a frame
+LATE = FRAME_INTERVAL
+EARLY = 0.002
+PILOTS = [PilotBuilder(brightness=level) for level in (10, 128, 255)]
+
+
+
+class CallTimes:
+    """Wrapper noting the loop time each command was dispatched at."""
+
+    def __init__(self, bulb):
+        self.bulb = bulb
+        self.ip = bulb.ip
+        self.calls = []
+
+    async def turn_on(self, pilot):
+        self.calls.append(asyncio.get_running_loop().time())
+        return await self.bulb.turn_on(pilot)
+
+    async def turn_off(self):
+        self.calls.append(asyncio.get_running_loop().time())
+        return await self.bulb.turn_off()
+
+
+def show(bulbs, frames):
+    return [[(bulb, PILOTS[(index + i) % len(PILOTS)]) for i, bulb in enumerate(bulbs)] for index in range(frames)]
+
+
+async def simulated_bulbs(simulator, discovered):
+    transport = await UdpTransport().open()
+    return transport, [CallTimes(bulb) for bulb in transport.wrap(discovered(simulator.ips))]
+
+
+def test_frames_are_dispatched_on_their_deadlines(discovered):
+    async def run():
+        async with BulbSimulator(3, latency=0.01, jitter=0) as simulator:
+            transport, bulbs = await simulated_bulbs(simulator, discovered)
+            scheduler = FrameScheduler(FRAME_INTERVAL, LatencyEstimator(default=0.0))
+            anchor = asyncio.get_running_loop().time() + 0.1
+            scheduler.anchor_at(anchor)
+            try:
+                report = await scheduler.run(show(bulbs, 10))
+            finally:
+                transport.close()
+            return anchor, bulbs, scheduler.latency, report, simulator.counters()
+
+    anchor, bulbs, latency, report, counters = asyncio.run(run())
+    assert report["frames"] == 10
+    assert report["skipped_frames"] == 0
+    assert report["commands"] == 30
+    assert report["missed_deadlines"] == 0
+    assert report["failed_commands"] == 0
+    assert counters["received"] == 30
+    for bulb in bulbs:
+        # frame i goes out at anchor + i * interval, minus half the round trip learned so far
+        assert anchor - EARLY <= bulb.calls[0] < anchor + LATE
+        for index, called in enumerate(bulb.calls[1:], start=1):
+            due = anchor + index * FRAME_INTERVAL
+            assert due - LATE / 2 - EARLY <= called < due + LATE
+        assert 0.01 <= latency.rtt[bulb.ip] < LATE
+
+
+def test_commands_lead_the_frame_by_the_bulb_latency(discovered):
+    async def run():
+        async with BulbSimulator(2, latency=0.01, jitter=0) as simulator:
+            transport, bulbs = await simulated_bulbs(simulator, discovered)
+            latency = LatencyEstimator(default=0.0)
+            latency.rtt[bulbs[0].ip] = 0.2  # scheduled 100 ms ahead of the frame
+            scheduler = FrameScheduler(FRAME_INTERVAL, latency)
+            anchor = asyncio.get_running_loop().time() + 0.2
+            scheduler.anchor_at(anchor)
+            try:
+                await scheduler.run(show(bulbs, 1))
+            finally:
+                transport.close()
+            return anchor, bulbs
+
+    anchor, (slow, fast) = asyncio.run(run())
+    assert anchor - 0.1 - EARLY <= slow.calls[0] < anchor - 0.1 + LATE
+    assert anchor - EARLY <= fast.calls[0] < anchor + LATE
+
+
+def test_late_frames_are_skipped(discovered):
+    async def run():
+        async with BulbSimulator(1, latency=0.0, jitter=0) as simulator:
+            transport, bulbs = await simulated_bulbs(simulator, discovered)
+            scheduler = FrameScheduler(FRAME_INTERVAL, LatencyEstimator(default=0.0))
+            # frames 0 and 1 are more than a full interval late by the time the show starts
+            scheduler.anchor_at(asyncio.get_running_loop().time() - 2.5 * FRAME_INTERVAL)
+            try:
+                report = await scheduler.run(show(bulbs, 5))
+            finally:
+                transport.close()
+            return report
+
+    report = asyncio.run(run())
+    assert report["frames"] == 5
+    assert report["skipped_frames"] == 2
+    assert report["commands"] == 3
+
+
+def test_busy_bulb_misses_the_frame(discovered):
+    async def run():
+        # the acknowledgement takes longer than a frame, so every other frame finds the bulb busy
+        async with BulbSimulator(1, latency=1.5 * FRAME_INTERVAL, jitter=0) as simulator:
+            transport, bulbs = await simulated_bulbs(simulator, discovered)
+            scheduler = FrameScheduler(FRAME_INTERVAL, LatencyEstimator(default=0.0))
+            try:
+                report = await scheduler.run(show(bulbs, 6))
+            finally:
+                transport.close()
+            return report
+
+    report = asyncio.run(run())
+    assert report["missed_deadlines"] > 0
+    assert report["commands"] + report["missed_deadlines"] == 6
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+from pywizlight import PilotBuilder
+from pywizlight.utils import to_wiz_json
+
+from utils.bulb_simulator import BulbSimulator
+from utils.bulb_state import OFF_STATE
+from utils.udp_transport import PayloadCache, UdpTransport
+
+PILOTS = [
+    PilotBuilder(rgb=(255, 0, 0)),
+    PilotBuilder(rgb=(12, 34, 56), brightness=128),
+    PilotBuilder(brightness=10),
+    PilotBuilder(colortemp=2700, brightness=255),
+    PilotBuilder(scene=4, speed=120),
+]
+
+
+def datagram(tail, sequence=7):
+    return json.loads(b'{"id":%d,' % sequence + tail)
+
+
+@pytest.mark.parametrize("pilot", PILOTS)
+def test_pilot_tail_matches_pywizlight_encoding(pilot):
+    message = datagram(PayloadCache().pilot_tail(pilot))
+    assert message.pop("id") == 7
+    assert message == json.loads(to_wiz_json(pilot.set_pilot_message(state=True)))
+
+
+def test_off_tail_matches_pywizlight_turn_off():
+    assert datagram(PayloadCache().tail(OFF_STATE)) == {"id": 7, "method": "setPilot", "params": {"state": False}}
+
+
+def test_tails_are_encoded_once_per_state():
+    payloads = PayloadCache()
+    first = payloads.pilot_tail(PilotBuilder(rgb=(1, 2, 3)))
+    assert payloads.pilot_tail(PilotBuilder(rgb=(1, 2, 3))) is first
+    assert len(payloads.tails) == 1
+
+
+
+def test_udp_bulb_sets_simulated_bulb_and_returns_round_trip(discovered):
+    async def run():
+        async with BulbSimulator(2, latency=0.01, jitter=0) as simulator:
+            transport = await UdpTransport().open()
+            try:
+                bulbs = transport.wrap(discovered(simulator.ips))
+                rtt = await bulbs[0].turn_on(PilotBuilder(rgb=(0, 0, 255), brightness=100))
+                await bulbs[1].turn_off()
+            finally:
+                transport.close()
+            return rtt, [bulb.pilot for bulb in simulator.bulbs]
+
+    rtt, (on, off) = asyncio.run(run())
+    assert 0.01 <= rtt < 0.2
+    assert (on["state"], on["r"], on["g"], on["b"]) == (True, 0, 0, 255)
+    assert off["state"] is False
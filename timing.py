@@ -1,46 +1,254 @@
 import asyncio
+import json
+import random
+import sys
 import time
-from pywizlight import PilotBuilder
+from pywizlight import PilotBuilder, wizlight
 from utils.network_utils import find_light_bulbs
+from utils.bulb_simulator import BulbSimulator, DEFAULT_LATENCY, DEFAULT_JITTER, DEFAULT_LOSS
+from utils.bulb_registry import BulbRegistry
+from utils.bulb_state import BulbStateCache
+from utils.udp_transport import UdpTransport
+from utils.bulb_health import HealthMonitor, print_health_counters
+from utils.telemetry import Telemetry, summarize
+from utils.startup import STARTUP
 
 REPETITIONS = 20
 PERIOD = 3  # seconds
 TOTAL_BULBS = 20
+SIMULATED_BULB_COUNTS = [1, 10, 20, 50, 100, 200]
+THROUGHPUT_ROUNDS = 20  # rounds of one command per bulb for the commands/sec measurement
+FRAMES = 50  # frames per show-script dispatch measurement
+RESULTS_PATH = "./bench_results.json"
 
-async def toggle_bulb(bulb, bulb_id, repetitions=REPETITIONS, period=PERIOD):
+def format_percentiles(stats):
+    return (f"p50 {stats['p50'] * 1000:.2f} ms, p95 {stats['p95'] * 1000:.2f} ms, "
+            f"p99 {stats['p99'] * 1000:.2f} ms ({stats['count']} samples)")
+
+async def toggle_bulb(bulb, bulb_id, repetitions=REPETITIONS, period=PERIOD, verbose=False, telemetry=None):
     durations = []
+    failures = 0
     for i in range(repetitions):
         start = time.perf_counter()
-        await bulb.turn_on(PilotBuilder(brightness=1))
-        await bulb.turn_off()
+        try:
+            sent = await bulb.turn_on(PilotBuilder(brightness=1))
+            await bulb.turn_off()
+        except Exception:
+            sent = False
         end = time.perf_counter()
         duration = end - start
-        durations.append(duration)
-        print(f"Bulb {bulb_id} - Cycle {i+1} took {duration:.4f} seconds")
+        if sent is False:
+            # failed, or skipped while the bulb is quarantined
+            failures += 1
+            if telemetry is not None:
+                telemetry.count("failed_cycles")
+        else:
+            durations.append(duration)
+            if telemetry is not None:
+                telemetry.observe("toggle", duration)
+                telemetry.frame(i, ack=duration)
+        if verbose:
+            print(f"Bulb {bulb_id} - Cycle {i+1} took {duration:.4f} seconds")
         await asyncio.sleep(max(0, period - 0.1))
-    mean_duration = sum(durations) / len(durations)
-    print(f"Bulb {bulb_id} - Mean toggle time: {mean_duration:.4f} seconds\n")
-    return mean_duration
+    mean_duration = sum(durations) / len(durations) if durations else 0.0
+    print(f"Bulb {bulb_id} - Mean toggle time: {mean_duration:.4f} seconds ({failures} failed cycles)")
+    return durations
+
+async def timed_command(command, latencies):
+    """Await one bulb command and record its latency; failures are counted, not raised."""
+    start = time.perf_counter()
+    try:
+        await command
+    except Exception:
+        return False
+    latencies.append(time.perf_counter() - start)
+    return True
+
+async def measure_throughput(bulbs, rounds=THROUGHPUT_ROUNDS):
+    """
+    Send one setPilot to every bulb per round, all bulbs concurrently.
+    Returns per-command latency percentiles, commands/sec and failures.
+    """
+    colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for round_index in range(rounds):
+        pilot = PilotBuilder(rgb=colors[round_index % len(colors)])
+        results = await asyncio.gather(*(timed_command(bulb.turn_on(pilot), latencies) for bulb in bulbs))
+        failures += results.count(False)
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": summarize(latencies),
+        "commands_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "failures": failures,
+    }
+
+async def benchmark_show_frames(simulator, transport):
+    """
+    Time one frame of each show script's dispatch path against simulated bulbs.
+    """
+    from music_light_advanced import freq_ranges, map_bands_to_rows, set_light_by_power_and_range
+    from music_light import set_brightness, rms_to_brightness
+    from gradient_one import updatelightColorByHue
+    from utils.gradient_engine import GradientAnimator
+    from utils.chase_engine import ChaseAnimator
+
+    rng = random.Random(0)
+    results = {}
+    opened = []  # every wizlight made here, closed when the benchmark ends
+
+    def open_bulbs(ips):
+        bulbs = [wizlight(ip) for ip in ips]
+        opened.extend(bulbs)
+        return bulbs
+
+    def registry_for(bulbs):
+        return BulbRegistry(bulbs, mapping=simulator.ip_mapping)
+
+    async def frame_loop(name, dispatch):
+        durations = []
+        for frame_index in range(FRAMES):
+            start = time.perf_counter()
+            try:
+                await dispatch(frame_index)
+            except Exception:
+                pass
+            durations.append(time.perf_counter() - start)
+        results[name] = summarize(durations)
+
+    try:
+        # music_light_advanced: five bands, both the pywizlight path and raw UDP + state cache
+        for label, bulbs in (
+            ("pywizlight", open_bulbs(simulator.ips)),
+            ("raw_udp_state_cache", BulbStateCache().wrap(transport.wrap(open_bulbs(simulator.ips)))),
+        ):
+            band_rows = map_bands_to_rows(registry_for(bulbs), freq_ranges)
+
+            async def advanced_frame(frame_index, band_rows=band_rows):
+                await asyncio.gather(*(
+                    set_light_by_power_and_range(band_rows, rng.uniform(90, 130), freq_range, 120, 100)
+                    for freq_range in freq_ranges
+                ))
+
+            await frame_loop(f"music_light_advanced/{label}", advanced_frame)
+
+        # music_light: one lamp, brightness from RMS
+        lamp = open_bulbs(simulator.ips[:1])[0]
+
+        async def music_light_frame(frame_index):
+            await set_brightness(lamp, rms_to_brightness(rng.uniform(0, 1000), 1000))
+
+        await frame_loop("music_light", music_light_frame)
+
+        # running_light: serial turn_off of the current bulb, then turn_on of the next one
+        chain = open_bulbs(simulator.ips[:6])
+
+        async def running_light_step(frame_index):
+            await chain[frame_index % len(chain)].turn_off()
+            await chain[(frame_index + 1) % len(chain)].turn_on(PilotBuilder(brightness=1, rgb=(255, 0, 0)))
+
+        await frame_loop("running_light", running_light_step)
+
+        # running_light engine: concurrent off/on per step, two heads with a one-bulb tail
+        chaser = ChaseAnimator(chain, heads=2, tail=1)
+
+        async def chase_engine_step(frame_index):
+            await chaser.apply(chaser.frames[frame_index % len(chaser.frames)])
+
+        await frame_loop("running_light/engine", chase_engine_step)
+
+        # gradient_one: one hue step on one bulb
+        gradient_bulb = open_bulbs(simulator.ips[:1])[0]
+        color = [(255, 0, 0)]
+
+        async def gradient_step(frame_index):
+            color[0] = updatelightColorByHue(color[0], 5)
+            await gradient_bulb.turn_on(PilotBuilder(rgb=color[0]))
+
+        await frame_loop("gradient_one", gradient_step)
+
+        # gradient_one engine: one rainbow frame across the whole rig
+        animator = GradientAnimator(open_bulbs(simulator.ips), step=5)
+
+        async def gradient_engine_frame(frame_index):
+            animator.dispatch(frame_index)
+            await asyncio.gather(*animator.in_flight.values())
+
+        await frame_loop("gradient_one/engine", gradient_engine_frame)
+    finally:
+        await asyncio.gather(*(bulb.async_close() for bulb in opened), return_exceptions=True)
+    return results
+
+async def simulate(latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, loss=DEFAULT_LOSS, results_path=RESULTS_PATH):
+    """
+    Run the whole benchmark suite against local simulated bulbs and write the results as JSON.
+    """
+    results = {
+        "simulator": {"latency": latency, "jitter": jitter, "loss": loss},
+        "throughput": {},
+        "frame_dispatch": {},
+    }
+
+    for count in SIMULATED_BULB_COUNTS:
+        async with BulbSimulator(count, latency, jitter, loss) as simulator:
+            transport = await UdpTransport().open()
+            pywiz_bulbs = [wizlight(ip) for ip in simulator.ips]
+            results["throughput"][str(count)] = {
+                "pywizlight": await measure_throughput(pywiz_bulbs),
+                "raw_udp": await measure_throughput(transport.wrap(pywiz_bulbs)),
+            }
+            for bulb in pywiz_bulbs:
+                await bulb.async_close()
+            transport.close()
+        for path, stats in results["throughput"][str(count)].items():
+            print(f"{count:>3} bulbs, {path:<10}: {stats['commands_per_sec']:8.0f} commands/sec, "
+                  f"{format_percentiles(stats['latency'])}")
+
+    async with BulbSimulator(TOTAL_BULBS, latency, jitter, loss) as simulator:
+        transport = await UdpTransport().open()
+        results["frame_dispatch"] = await benchmark_show_frames(simulator, transport)
+        transport.close()
+    for name, stats in results["frame_dispatch"].items():
+        print(f"Frame dispatch {name}: {format_percentiles(stats)}")
+
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {results_path}")
+    return results
 
 async def main():
-    bulbs = await find_light_bulbs()
+    health = HealthMonitor()
+    telemetry = await Telemetry("timing").start()
+    # A dead bulb fails fast and is re-probed instead of stalling on retries
+    bulbs = health.wrap(await find_light_bulbs())
+    STARTUP.ready()
 
     print(f"Starting toggle timing test on {len(bulbs)} bulbs...")
-    all_mean_times = []
 
     # Create a list of tasks for all bulbs
     tasks = []
     for idx, bulb in enumerate(bulbs, start=1):
         print(f"Testing bulb {idx} with id {bulb.ip}...")
-        tasks.append(toggle_bulb(bulb, idx))
+        tasks.append(toggle_bulb(bulb, idx, telemetry=telemetry))
 
     # Run all tasks concurrently
-    all_mean_times = await asyncio.gather(*tasks)
+    all_durations = await asyncio.gather(*tasks)
 
-    overall_mean = sum(all_mean_times) / len(all_mean_times) if all_mean_times else 0
-    print(f"=== Overall mean toggle execution time across all bulbs: {overall_mean:.4f} seconds ===")
+    overall = summarize([duration for durations in all_durations for duration in durations])
+    print(f"=== Overall toggle time across all bulbs: mean {overall['mean']:.4f} seconds, {format_percentiles(overall)} ===")
+    print_health_counters(health.counters())
+    health.close()
+    telemetry.finish()
 
 if __name__ == "__main__":
+    # python timing.py                     - toggle timing on the real bulbs
+    # python timing.py --simulate [latency jitter loss]
+    #                                      - full suite against local simulated bulbs, JSON results
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    if len(sys.argv) > 1 and sys.argv[1] == "--simulate":
+        params = [float(value) for value in sys.argv[2:5]]
+        loop.run_until_complete(simulate(*params))
+    else:
+        loop.run_until_complete(main())
     loop.close()
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+
+from utils.audio_analysis import analyze_band_power, compute_thresholds
+
+CACHE_DIR = "./.analysis_cache"
+CACHE_MAX_BYTES = 4 * 1024 ** 3  # LRU eviction kicks in above 4 GB
+CACHE_VERSION = 1  # bump when the stored analysis format changes
+HASH_BLOCK_SIZE = 1024 * 1024
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def decode_to_npy(audio_file, npy_path):
+    """
+    Decode audio_file with ffmpeg and save its samples as a (frames, channels) .npy.
+    Returns (frame_rate, sample_width).
+    """
+    from pydub import AudioSegment
+
+    song = AudioSegment.from_file(audio_file)
+    if song.sample_width not in SAMPLE_DTYPES:
+        song = song.set_sample_width(2)
+    samples = np.frombuffer(song.raw_data, dtype=SAMPLE_DTYPES[song.sample_width])
+    np.save(npy_path, samples.reshape(-1, song.channels))
+    return song.frame_rate, song.sample_width
+
+
+def analyze_to_npy(samples, frame_rate, base_path, chunk_ms, freq_ranges, lower_percent, upper_percent):
+    """
+    Band power analysis of (frames, channels) samples, saved as base_path.npy plus thresholds in base_path.json.
+    Returns (upper_threshold, lower_threshold).
+    """
+    mono = samples[:, 0]  # same left-channel simplification as song_to_mono_samples
+    power_matrix = analyze_band_power(mono, frame_rate, chunk_ms, freq_ranges)
+    upper_threshold, lower_threshold = compute_thresholds(power_matrix, lower_percent, upper_percent)
+    np.save(base_path + ".npy", power_matrix)
+    with open(base_path + ".json", "w") as f:
+        json.dump({"upper_threshold": upper_threshold, "lower_threshold": lower_threshold}, f)
+    return upper_threshold, lower_threshold
+
+
+def compute_entries(job):
+    """
+    Write the cache entries described by a job from AnalysisCache.prepare_job without touching
+    the index, so it can run in a worker process; hand the result to AnalysisCache.register.
+    Only these small dicts cross the process boundary, samples and matrices stay in the .npy files.
+    """
+    result = dict(job)
+    pcm_path = os.path.join(job["cache_dir"], job["pcm_name"] + ".npy")
+    if job["decode"]:
+        result["frame_rate"], result["sample_width"] = decode_to_npy(job["audio_file"], pcm_path)
+    samples = np.load(pcm_path, mmap_mode="r")
+    analyze_to_npy(samples, result["frame_rate"], os.path.join(job["cache_dir"], job["power_name"]),
+                   job["chunk_ms"], job["freq_ranges"], job["lower_percent"], job["upper_percent"])
+    return result
+
+
+class AnalysisCache:
+    """
+    On-disk cache of decoded PCM and per-band power analysis.
+
+    Layout of cache_dir:
+        index.json                 file stat -> content hash memo and LRU bookkeeping
+        pcm-<file_hash>.npy        decoded samples, shape (frames, channels), memory-mappable
+        power-<key>.npy            (chunks, bands) dB matrix, memory-mappable
+        power-<key>.json           thresholds for that matrix
+    Analysis keys combine the content hash with every analysis parameter,
+    so changing CHUNK_MS, freq_ranges or percentiles never returns stale data.
+
+    Shows call load_song from executor threads while the event loop prepares the next
+    jobs, so the index is only read, changed and written under self.lock.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = threading.RLock()
+        self.index = self._read_index()
+        self.dirty = False  # index changed since it was last written
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get("version") == CACHE_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"version": CACHE_VERSION, "files": {}, "entries": {}}
+
+    def _write_index(self):
+        # The lock only orders this process's threads; across processes the last os.replace wins.
+        # The temp file just keeps readers from ever seeing a half-written index.
+        with self.lock, tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            json.dump(self.index, f)
+            tmp_path = f.name
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def file_hash(self, audio_file):
+        """
+        SHA-256 of the file contents, memoized by (size, mtime) so warm starts skip reading the file.
+        """
+        stat = os.stat(audio_file)
+        abs_path = os.path.abspath(audio_file)
+        with self.lock:
+            memo = self.index["files"].get(abs_path)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+
+        digest = hashlib.sha256()
+        with open(audio_file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        file_hash = digest.hexdigest()
+        with self.lock:
+            self.index["files"][abs_path] = [stat.st_size, stat.st_mtime_ns, file_hash]
+            self.dirty = True
+        return file_hash
+
+    @staticmethod
+    def analysis_key(file_hash, chunk_ms, freq_ranges, lower_percent, upper_percent):
+        params = json.dumps([CACHE_VERSION, chunk_ms, [list(r) for r in freq_ranges],
+                             lower_percent, upper_percent])
+        return hashlib.sha256(f"{file_hash}:{params}".encode()).hexdigest()[:32]
+
+    def _touch(self, name, files, **meta):
+        """
+        Record an entry (or refresh its LRU timestamp) and evict old entries over the size cap.
+        """
+        return self._touch_all({name: (files, meta)})[name]
+
+    def _touch_all(self, specs):
+        """
+        Like _touch for several {name: (files, meta)} entries at once; none of them is evicted.
+        """
+        with self.lock:
+            touched = {}
+            for name, (files, meta) in specs.items():
+                entry = self.index["entries"].get(name)
+                if entry is None:
+                    size = sum(os.path.getsize(self._path(f)) for f in files)
+                    entry = {"files": files, "size": size, **meta}
+                    self.index["entries"][name] = entry
+                entry["last_used"] = time.time()
+                touched[name] = entry
+            self._evict(keep=set(specs))
+            self._write_index()
+        return touched
+
+    def _evict(self, keep=()):
+        entries = self.index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        for name in sorted(entries, key=lambda n: entries[n]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name in keep:
+                continue
+            for f in entries[name]["files"]:
+                try:
+                    os.remove(self._path(f))
+                except FileNotFoundError:
+                    pass
+            total -= entries.pop(name)["size"]
+
+    def _lookup(self, name):
+        with self.lock:
+            entry = self.index["entries"].get(name)
+            if entry is None:
+                return None
+            if not all(os.path.exists(self._path(f)) for f in entry["files"]):
+                del self.index["entries"][name]
+                self.dirty = True
+                return None
+            return entry
+
+    def prepare_job(self, audio_file, chunk_ms, freq_ranges, lower_percent=0.30, upper_percent=0.70):
+        """
+        Describe the decode/analysis work audio_file still needs as a picklable dict for
+        compute_entries, or return None when everything is cached already.
+        """
+        file_hash = self.file_hash(audio_file)
+        pcm_name = f"pcm-{file_hash}"
+        power_name = "power-" + self.analysis_key(file_hash, chunk_ms, freq_ranges, lower_percent, upper_percent)
+        if self.dirty:
+            self._write_index()  # keep a new hash memo even when nothing else changes
+        pcm_entry = self._lookup(pcm_name)
+        if pcm_entry is not None and self._lookup(power_name) is not None:
+            return None
+        return {
+            "audio_file": audio_file,
+            "cache_dir": self.cache_dir,
+            "pcm_name": pcm_name,
+            "power_name": power_name,
+            "decode": pcm_entry is None,
+            "frame_rate": pcm_entry and pcm_entry["frame_rate"],
+            "sample_width": pcm_entry and pcm_entry["sample_width"],
+            "chunk_ms": chunk_ms,
+            "freq_ranges": [tuple(r) for r in freq_ranges],
+            "lower_percent": lower_percent,
+            "upper_percent": upper_percent,
+        }
+
+    def register(self, result):
+        """Index the entries written by compute_entries."""
+        pcm_name = result["pcm_name"]
+        power_name = result["power_name"]
+        self._touch_all({
+            pcm_name: ([pcm_name + ".npy"],
+                       {"frame_rate": result["frame_rate"], "sample_width": result["sample_width"]}),
+            power_name: ([power_name + ".npy", power_name + ".json"], {}),
+        })
+
+    def load_pcm(self, audio_file):
+        """
+        Return (samples, frame_rate, sample_width) where samples is a read-only
+        memory-mapped (frames, channels) array. Decodes with ffmpeg only on a miss.
+        """
+        file_hash = self.file_hash(audio_file)
+        name = f"pcm-{file_hash}"
+        entry = self._lookup(name)
+
+        if entry is None:
+            frame_rate, sample_width = decode_to_npy(audio_file, self._path(name + ".npy"))
+            entry = self._touch(name, [name + ".npy"], frame_rate=frame_rate, sample_width=sample_width)
+        else:
+            self._touch(name, entry["files"])
+
+        samples = np.load(self._path(name + ".npy"), mmap_mode="r")
+        return samples, entry["frame_rate"], entry["sample_width"]
+
+    def load_song(self, audio_file):
+        """
+        AudioSegment for playback, rebuilt from the cached PCM.
+        pydub is imported here, so shows that never play a song do not load it.
+        """
+        from pydub import AudioSegment
+
+        samples, frame_rate, sample_width = self.load_pcm(audio_file)
+        return AudioSegment(
+            data=samples.tobytes(),
+            sample_width=sample_width,
+            frame_rate=frame_rate,
+            channels=samples.shape[1],
+        )
+
+    def load_analysis(self, audio_file, chunk_ms, freq_ranges, lower_percent=0.30, upper_percent=0.70):
+        """
+        Return (power_matrix, upper_threshold, lower_threshold), computing and storing them on a miss.
+        power_matrix is a read-only memory-mapped (chunks, bands) array.
+        """
+        file_hash = self.file_hash(audio_file)
+        key = self.analysis_key(file_hash, chunk_ms, freq_ranges, lower_percent, upper_percent)
+        name = f"power-{key}"
+        entry = self._lookup(name)
+
+        if entry is None:
+            samples, frame_rate, _ = self.load_pcm(audio_file)
+            upper_threshold, lower_threshold = analyze_to_npy(
+                samples, frame_rate, self._path(name), chunk_ms, freq_ranges, lower_percent, upper_percent
+            )
+            self._touch(name, [name + ".npy", name + ".json"])
+        else:
+            self._touch(name, entry["files"])
+            with open(self._path(name + ".json")) as f:
+                thresholds = json.load(f)
+            upper_threshold = thresholds["upper_threshold"]
+            lower_threshold = thresholds["lower_threshold"]
+
+        power_matrix = np.load(self._path(name + ".npy"), mmap_mode="r")
+        return power_matrix, upper_threshold, lower_threshold
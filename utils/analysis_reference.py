@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def legacy_power_mapping(song, chunk_ms, freq_ranges, lower_percent=0.30, upper_percent=0.70):
+    """
+    The original per-chunk loop from pre_calculate_power_mapping, kept as the baseline
+    the vectorized engine is benchmarked and tested against.
+    Returns (power_mapping, upper_threshold, lower_threshold).
+    """
+    chunks = list(song[::chunk_ms])
+    power_mapping = {}
+    all_power_values = []
+
+    for i, chunk in enumerate(chunks):
+        samples = np.array(chunk.get_array_of_samples())
+
+        if chunk.channels == 2:
+            samples = samples[::2]
+
+        fft_result = np.fft.fft(samples)
+        freqs = np.fft.fftfreq(len(fft_result), d=1/song.frame_rate)
+
+        power_values = {}
+        for freq_range in freq_ranges:
+            min_freq, max_freq = freq_range
+            indices = np.where((freqs >= min_freq) & (freqs < max_freq))
+            power = np.sum(np.abs(fft_result[indices]) ** 2)
+            power_db = 10 * np.log10(power) if power > 0 else 0
+
+            power_values[freq_range] = power_db
+            all_power_values.append(power_db)
+
+        power_mapping[i] = power_values
+
+    all_power_values.sort()
+    n = len(all_power_values)
+
+    lower_index = max(0, int(n * lower_percent) - 1)
+    upper_index = min(n - 1, int(n * upper_percent))
+
+    lower_threshold = all_power_values[lower_index] if n > 0 else 0
+    upper_threshold = all_power_values[upper_index] if n > 0 else 0
+
+    return power_mapping, upper_threshold, lower_threshold
+
+
+def synthetic_song(seconds, frame_rate=44100):
+    """
+    Stereo 16-bit noise with a few tones, so every band has some energy.
+    """
+    from pydub import AudioSegment
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    signal = 0.2 * rng.standard_normal(len(t))
+    for freq in (100, 400, 1000, 3000, 6000):
+        signal += 0.1 * np.sin(2 * np.pi * freq * t) * (1 + np.sin(2 * np.pi * t / 7))
+    pcm = np.clip(signal * 8000, -32768, 32767).astype(np.int16)
+    stereo = np.repeat(pcm, 2)
+    return AudioSegment(stereo.tobytes(), sample_width=2, frame_rate=frame_rate, channels=2)
@@ -0,0 +1,209 @@
+import math
+
+import numpy as np
+
+FRAME_BATCH = 256  # frames per rfft call, keeps peak memory bounded on long tracks
+
+
+def song_to_mono_samples(song):
+    """
+    Return the samples of a pydub AudioSegment as a 1-D numpy view.
+    Stereo is simplified to mono by taking the left channel, like the chunk loop did.
+    """
+    raw = song.get_array_of_samples()
+    samples = np.frombuffer(raw, dtype=raw.typecode)
+    if song.channels == 2:
+        samples = samples[::2]
+    return samples
+
+
+def chunk_boundaries(num_samples, frame_rate, chunk_ms):
+    """
+    Sample boundaries of every chunk, computed exactly like pydub's song[::chunk_ms].
+    Returns a list of (start, end) sample indices; end may run past num_samples
+    by a couple of milliseconds, which pydub pads with silence.
+    """
+    length_ms = round(1000 * (num_samples / frame_rate))
+    boundaries = []
+    for start_ms in range(0, length_ms, chunk_ms):
+        end_ms = min(start_ms + chunk_ms, length_ms)
+        start = int(start_ms * frame_rate / 1000.0)
+        end = int(end_ms * frame_rate / 1000.0)
+        boundaries.append((start, end))
+    return boundaries
+
+
+def frame_samples(samples, frame_length, num_frames, hop=None):
+    """
+    View num_frames windows of frame_length samples, hop samples apart (back to back
+    by default), as a (num_frames, frame_length) array without copying.
+    """
+    stride = samples.strides[0]
+    return np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(num_frames, frame_length),
+        strides=(stride * (hop or frame_length), stride),
+        writeable=False,
+    )
+
+
+def band_bin_edges(frame_length, frame_rate, freq_ranges):
+    """
+    Precompute [lo, hi) rfft bin indices for every (min_freq, max_freq) range.
+    A bin belongs to a range when min_freq <= freq < max_freq.
+    """
+    freqs = np.fft.rfftfreq(frame_length, d=1 / frame_rate)
+    edges = []
+    for min_freq, max_freq in freq_ranges:
+        lo = int(np.searchsorted(freqs, min_freq, side="left"))
+        hi = int(np.searchsorted(freqs, max_freq, side="left"))
+        edges.append((lo, max(lo, hi)))
+    return edges
+
+
+def band_power_db(frames, frame_rate, freq_ranges, tail=None):
+    """
+    Power in dB of every frequency range for a 2-D (frames, samples) block, plus the
+    rows of tail (same frame length) appended to the last batch instead of a call of their own.
+    Silent bands report 0 dB.
+    """
+    frame_length = frames.shape[1]
+    num_frames = len(frames) + (0 if tail is None else len(tail))
+    edges = band_bin_edges(frame_length, frame_rate, freq_ranges)
+    top = max((hi for _, hi in edges), default=0)  # bins above the highest band are never summed
+    power = np.empty((num_frames, len(freq_ranges)), dtype=np.float64)
+
+    for start in range(0, num_frames, FRAME_BATCH):
+        batch = frames[start:start + FRAME_BATCH]
+        if tail is not None and start + FRAME_BATCH >= num_frames:
+            batch = np.concatenate([batch, tail])
+        spectrum = np.fft.rfft(batch, axis=1)[:, :top]
+        spectrum_power = spectrum.real ** 2 + spectrum.imag ** 2
+        for band, (lo, hi) in enumerate(edges):
+            power[start:start + FRAME_BATCH, band] = spectrum_power[:, lo:hi].sum(axis=1)
+
+    power_db = np.zeros_like(power)
+    np.log10(power, out=power_db, where=power > 0)
+    power_db *= 10
+    return power_db
+
+
+def analyze_band_power(samples, frame_rate, chunk_ms, freq_ranges):
+    """
+    Per-chunk band power for a whole mono sample buffer.
+    Returns a (num_chunks, len(freq_ranges)) float64 matrix of dB values.
+    """
+    boundaries = chunk_boundaries(len(samples), frame_rate, chunk_ms)
+    if not boundaries:
+        return np.zeros((0, len(freq_ranges)), dtype=np.float64)
+
+    # All chunks but possibly the last one share the same length when chunk_ms
+    # maps to a whole number of samples, which lets them go through one batched rfft.
+    frame_length = boundaries[0][1] - boundaries[0][0]
+    num_uniform = 0
+    for start, end in boundaries:
+        if end - start != frame_length or start != num_uniform * frame_length:
+            break
+        num_uniform += 1
+    # A full-length last chunk running past the end is padded with silence, as pydub does,
+    # and joins the last batch; only a shorter last chunk needs an rfft of its own length
+    num_inside = min(num_uniform, len(samples) // frame_length)
+    tail = None
+    if num_uniform > num_inside:
+        tail = np.zeros((num_uniform - num_inside, frame_length), dtype=samples.dtype)
+        for row, (start, end) in enumerate(boundaries[num_inside:num_uniform]):
+            chunk = samples[start:end]
+            tail[row, :len(chunk)] = chunk
+
+    blocks = []
+    if num_uniform:
+        frames = frame_samples(samples, frame_length, num_inside)
+        blocks.append(band_power_db(frames, frame_rate, freq_ranges, tail))
+
+    for start, end in boundaries[num_uniform:]:
+        chunk = samples[start:min(end, len(samples))]
+        if end > len(samples):
+            chunk = np.concatenate([chunk, np.zeros(end - len(samples), dtype=samples.dtype)])
+        blocks.append(band_power_db(chunk[np.newaxis, :], frame_rate, freq_ranges))
+
+    return np.concatenate(blocks, axis=0)
+
+
+def rms_envelope(samples, frame_rate, chunk_ms, channels=1):
+    """
+    RMS of every chunk of song[::chunk_ms] from its interleaved sample buffer, over all
+    channels like pydub's chunk.rms. Whole, back-to-back chunks are rows of one view
+    whose squares are summed FRAME_BATCH rows at a time, so only a batch is ever float64.
+    """
+    boundaries = chunk_boundaries(len(samples) // channels, frame_rate, chunk_ms)
+    envelope = np.zeros(len(boundaries), dtype=np.float64)
+    if not boundaries:
+        return envelope
+
+    frame_length = boundaries[0][1] - boundaries[0][0]
+    num_uniform = 0
+    for start, end in boundaries:
+        if end - start != frame_length or start != num_uniform * frame_length or end * channels > len(samples):
+            break
+        num_uniform += 1
+
+    frames = frame_samples(samples, frame_length * channels, num_uniform)
+    for first in range(0, num_uniform, FRAME_BATCH):
+        batch = frames[first:first + FRAME_BATCH].astype(np.float64)
+        envelope[first:first + len(batch)] = np.einsum("ij,ij->i", batch, batch)
+    envelope[:num_uniform] /= frame_length * channels
+
+    for index, (start, end) in enumerate(boundaries[num_uniform:], start=num_uniform):
+        # Samples past the end count as silence, as pydub pads them
+        chunk = samples[start * channels:min(end * channels, len(samples))].astype(np.float64)
+        envelope[index] = np.dot(chunk, chunk) / ((end - start) * channels)
+    return np.sqrt(envelope, out=envelope)
+
+
+class EnvelopeFollower:
+    """
+    Attack/release smoothing: the output rises towards louder input with the attack
+    time constant and falls towards quieter input with the release one.
+    """
+
+    def __init__(self, frame_interval, attack, release):
+        self.attack = 1.0 - math.exp(-frame_interval / attack) if attack > 0 else 1.0
+        self.release = 1.0 - math.exp(-frame_interval / release) if release > 0 else 1.0
+        self.value = 0.0
+
+    def step(self, value):
+        coefficient = self.attack if value > self.value else self.release
+        self.value += coefficient * (value - self.value)
+        return self.value
+
+
+def smooth_envelope(envelope, frame_interval, attack, release):
+    """An EnvelopeFollower run over a whole envelope."""
+    follower = EnvelopeFollower(frame_interval, attack, release)
+    return np.fromiter((follower.step(value) for value in envelope.tolist()), dtype=np.float64, count=len(envelope))
+
+
+def compute_thresholds(power_matrix, lower_percent=0.30, upper_percent=0.70):
+    """
+    Global lower/upper thresholds over every dB value in the matrix.
+    Returns (upper_threshold, lower_threshold).
+    """
+    all_power_values = np.sort(power_matrix, axis=None)
+    n = len(all_power_values)
+    if n == 0:
+        return 0, 0
+
+    lower_index = max(0, int(n * lower_percent) - 1)
+    upper_index = min(n - 1, int(n * upper_percent))
+
+    return float(all_power_values[upper_index]), float(all_power_values[lower_index])
+
+
+def power_matrix_to_mapping(power_matrix, freq_ranges):
+    """
+    Convert the power matrix back into {chunk_index: {freq_range: power_db}}.
+    """
+    return {
+        i: dict(zip(freq_ranges, row))
+        for i, row in enumerate(power_matrix.tolist())
+    }
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+import wave
+
+AUDIO_OUTPUT = "device"  # "device", "null", or "file:<path.wav>" to run a show headless
+PLAYBACK_BLOCK_MS = 20  # audio released per step by the paced sinks, and the clock's resolution
+
+
+class OutputSink:
+    """
+    Base of the audio outputs: tracks how many frames have been played and when that
+    count last advanced, which is what the playback clock is read from.
+    """
+
+    latency = 0.0  # seconds between a frame being consumed and it being heard
+
+    def __init__(self):
+        self.frames = 0  # frames played so far
+        self.updated = None  # time.monotonic() when frames last advanced, None before start
+        self.frame_rate = None
+        self.total_frames = 0
+
+    def position(self):
+        """Seconds of audio heard so far, interpolated between updates."""
+        if self.updated is None:
+            return 0.0
+        position = self.frames / self.frame_rate
+        if self.frames < self.total_frames:
+            # Between updates the output keeps playing at the real-time rate
+            position += min(time.monotonic() - self.updated, PLAYBACK_BLOCK_MS / 1000)
+        return max(0.0, position - self.latency)
+
+
+class PacedSink(OutputSink):
+    """
+    Output that releases audio in PLAYBACK_BLOCK_MS blocks at the real-time rate.
+
+    The number of frames released is the playback position. Subclasses decide what
+    happens to each block; this one discards them, for headless runs and tests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.task = None
+
+    def open(self, frame_rate, channels, sample_width):
+        pass
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+    def start(self, pcm, frame_rate, channels, sample_width):
+        self.frame_rate = frame_rate
+        self.frame_bytes = channels * sample_width
+        self.total_frames = len(pcm) // self.frame_bytes
+        self.open(frame_rate, channels, sample_width)
+        self.task = asyncio.create_task(self._pump(memoryview(pcm)))
+
+    async def _pump(self, pcm):
+        block_frames = max(1, int(self.frame_rate * PLAYBACK_BLOCK_MS / 1000))
+        started = time.monotonic()
+        self.updated = started
+        try:
+            while self.frames < self.total_frames:
+                end = min(self.frames + block_frames, self.total_frames)
+                due = started + end / self.frame_rate
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.write(pcm[self.frames * self.frame_bytes:end * self.frame_bytes])
+                self.frames = end
+                self.updated = time.monotonic()
+        finally:
+            self.close()
+
+    def is_playing(self):
+        return self.task is not None and not self.task.done()
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+class FileSink(PacedSink):
+    """Paced sink that writes what was played to a WAV file, to check sync offline."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.wav = None
+
+    def open(self, frame_rate, channels, sample_width):
+        self.wav = wave.open(self.path, "wb")
+        self.wav.setnchannels(channels)
+        self.wav.setsampwidth(sample_width)
+        self.wav.setframerate(frame_rate)
+
+    def write(self, data):
+        self.wav.writeframes(data)
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+
+class StreamSink(OutputSink):
+    """
+    Sound card output through a sounddevice callback stream.
+
+    The callback copies the next block out of the song buffer and advances the frame
+    count, so the position is what the device actually consumed, minus its output latency.
+    """
+
+    DTYPES = {1: "uint8", 2: "int16", 3: "int24", 4: "int32"}
+
+    def __init__(self):
+        super().__init__()
+        self.stream = None
+        self.finished = threading.Event()
+
+    def start(self, pcm, frame_rate, channels, sample_width):
+        import sounddevice
+
+        self.frame_rate = frame_rate
+        frame_bytes = channels * sample_width
+        self.total_frames = len(pcm) // frame_bytes
+        pcm = memoryview(pcm)
+        block_frames = max(1, int(frame_rate * PLAYBACK_BLOCK_MS / 1000))
+
+        def callback(outdata, frames, time_info, status):
+            start = self.frames * frame_bytes
+            chunk = pcm[start:start + frames * frame_bytes]
+            outdata[:len(chunk)] = chunk
+            if len(chunk) < len(outdata):
+                outdata[len(chunk):] = b"\x00" * (len(outdata) - len(chunk))
+            self.frames += len(chunk) // frame_bytes
+            self.updated = time.monotonic()
+            if self.frames >= self.total_frames:
+                raise sounddevice.CallbackStop
+
+        self.stream = sounddevice.RawOutputStream(
+            samplerate=frame_rate, channels=channels, dtype=self.DTYPES[sample_width],
+            blocksize=block_frames, callback=callback, finished_callback=self.finished.set,
+        )
+        self.updated = time.monotonic()
+        self.stream.start()
+
+    @property
+    def latency(self):
+        return self.stream.latency if self.stream is not None else 0.0
+
+    def is_playing(self):
+        return self.stream is not None and not self.finished.is_set()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.finished.set()
+
+
+class SimpleAudioSink(OutputSink):
+    """
+    simpleaudio fallback when sounddevice is not installed. simpleaudio cannot report
+    its position, so the clock counts from the moment play_buffer returned.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.play_obj = None
+
+    def start(self, pcm, frame_rate, channels, sample_width):
+        import simpleaudio
+
+        self.frame_rate = frame_rate
+        self.total_frames = len(pcm) // (channels * sample_width)
+        self.play_obj = simpleaudio.play_buffer(pcm, num_channels=channels, bytes_per_sample=sample_width,
+                                                sample_rate=frame_rate)
+        self.updated = time.monotonic()
+
+    def position(self):
+        if self.updated is None:
+            return 0.0
+        return min(time.monotonic() - self.updated, self.total_frames / self.frame_rate)
+
+    def is_playing(self):
+        return self.play_obj is not None and self.play_obj.is_playing()
+
+    def stop(self):
+        if self.play_obj is not None:
+            self.play_obj.stop()
+
+
+def open_sink(output=None):
+    """Sink for an AUDIO_OUTPUT spec: "device", "null" or "file:<path.wav>"."""
+    output = output or AUDIO_OUTPUT
+    if output == "null":
+        return PacedSink()
+    if output.startswith("file:"):
+        return FileSink(output[len("file:"):])
+    if output != "device":
+        raise ValueError(f"unknown audio output {output}")
+    try:
+        import sounddevice  # noqa: F401
+    except (ImportError, OSError):
+        return SimpleAudioSink()
+    return StreamSink()
+
+
+class AudioPlayback:
+    """
+    Plays one song through a sink and serves as the show's master clock.
+
+    seconds() is the position of the sample being heard now, interpolated between
+    sink updates, and anchor() converts it to the time.monotonic() / loop.time() moment
+    that sample 0 was heard. Schedulers locked to a playback re-read anchor() every
+    frame, so the lights follow the audio rather than a separately running timer.
+    """
+
+    def __init__(self, song, sink=None):
+        self.song = song
+        self.sink = sink or open_sink()
+
+    def start(self):
+        self.sink.start(self.song.raw_data, self.song.frame_rate, self.song.channels, self.song.sample_width)
+        return self
+
+    @property
+    def started(self):
+        return self.sink.updated is not None
+
+    def seconds(self):
+        return self.sink.position()
+
+    def anchor(self):
+        return time.monotonic() - self.seconds()
+
+    def is_playing(self):
+        return self.sink.is_playing()
+
+    def stop(self):
+        self.sink.stop()
+
+    async def wait_done(self, poll=PLAYBACK_BLOCK_MS / 1000):
+        while self.is_playing():
+            await asyncio.sleep(poll)
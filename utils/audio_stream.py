@@ -0,0 +1,234 @@
+import asyncio
+import os
+import time
+import wave
+import numpy as np
+
+from utils.audio_analysis import band_bin_edges
+from utils.band_normalizer import AdaptiveBandNormalizer
+
+STREAM_FRAME_RATE = 44100
+STREAM_CHANNELS = 2
+HISTOGRAM_MIN_DB = 0.0
+HISTOGRAM_MAX_DB = 200.0
+HISTOGRAM_STEP_DB = 0.1
+
+
+async def ffmpeg_pcm_blocks(source, block_frames, frame_rate=STREAM_FRAME_RATE, channels=STREAM_CHANNELS):
+    """
+    Decode any ffmpeg-readable source (file, URL, device) in a subprocess and yield
+    int16 blocks of shape (block_frames, channels). Only one block is held at a time.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", source,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(frame_rate), "-",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    block_bytes = block_frames * channels * 2
+    try:
+        while True:
+            try:
+                data = await proc.stdout.readexactly(block_bytes)
+            except asyncio.IncompleteReadError as e:
+                data = e.partial[:len(e.partial) - len(e.partial) % (channels * 2)]
+                if data:
+                    yield np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+                break
+            yield np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+async def wav_pcm_blocks(wav, block_frames):
+    """
+    Yield blocks from an open wave reader on a WAV file or a FIFO carrying a WAV stream.
+    Reads run in the default executor so a slow FIFO writer never blocks the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        channels = wav.getnchannels()
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[wav.getsampwidth()]
+        while True:
+            data = await loop.run_in_executor(None, wav.readframes, block_frames)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=dtype).reshape(-1, channels)
+    finally:
+        wav.close()
+
+
+async def raw_pcm_blocks(path, block_frames, channels=STREAM_CHANNELS):
+    """
+    Yield blocks of raw signed 16-bit little-endian PCM from a file or FIFO,
+    e.g. one fed by `arecord -f S16_LE` or `ffmpeg ... -f s16le fifo`.
+    """
+    loop = asyncio.get_running_loop()
+    block_bytes = block_frames * channels * 2
+    f = await loop.run_in_executor(None, open, path, "rb")
+    try:
+        pending = b""
+        while True:
+            data = await loop.run_in_executor(None, f.read, block_bytes - len(pending))
+            if not data:
+                break
+            pending += data
+            if len(pending) == block_bytes:
+                yield np.frombuffer(pending, dtype="<i2").reshape(-1, channels)
+                pending = b""
+        usable = len(pending) - len(pending) % (channels * 2)
+        if usable:
+            yield np.frombuffer(pending[:usable], dtype="<i2").reshape(-1, channels)
+    finally:
+        f.close()
+
+
+async def open_pcm_source(source, chunk_ms, frame_rate=STREAM_FRAME_RATE):
+    """
+    Pick a block generator for a source string:
+        *.wav            -> wave reader, at the WAV's own frame rate
+        raw:<path>       -> raw s16le stereo file or FIFO at frame_rate
+        anything else    -> ffmpeg decoder subprocess, resampled to frame_rate
+    Returns (blocks, frame_rate): blocks of chunk_ms each and the frame rate they are at.
+    """
+    if source.lower().endswith(".wav") and not source.startswith("raw:"):
+        # Opening a FIFO waits for its writer, so it happens off the event loop
+        wav = await asyncio.get_running_loop().run_in_executor(None, wave.open, source, "rb")
+        frame_rate = wav.getframerate()
+        return wav_pcm_blocks(wav, int(frame_rate * chunk_ms / 1000)), frame_rate
+    block_frames = int(frame_rate * chunk_ms / 1000)
+    if source.startswith("raw:"):
+        return raw_pcm_blocks(source[4:], block_frames), frame_rate
+    return ffmpeg_pcm_blocks(source, block_frames, frame_rate), frame_rate
+
+
+async def file_playback(source):
+    """
+    AudioPlayback of a source that is a regular audio file, so a show streaming it is also
+    heard; the whole file is decoded for playback, only the analysis is streamed. None for live
+    sources (raw:, FIFOs, devices, URLs), which are being heard from wherever they come from.
+    """
+    if source.startswith("raw:") or not os.path.isfile(source):
+        return None
+    from pydub import AudioSegment
+    from utils.audio_playback import AudioPlayback
+
+    song = await asyncio.get_running_loop().run_in_executor(None, AudioSegment.from_file, source)
+    return AudioPlayback(song)
+
+
+class RunningQuantiles:
+    """
+    Fixed-size dB histogram that answers percentile queries over everything seen so far.
+    Memory is constant regardless of how many values are added.
+    """
+
+    def __init__(self, min_db=HISTOGRAM_MIN_DB, max_db=HISTOGRAM_MAX_DB, step_db=HISTOGRAM_STEP_DB):
+        self.min_db = min_db
+        self.step_db = step_db
+        self.counts = np.zeros(int(round((max_db - min_db) / step_db)) + 1, dtype=np.int64)
+        self.total = 0
+
+    def add(self, values):
+        bins = np.clip(((np.asarray(values) - self.min_db) / self.step_db).astype(np.int64),
+                       0, len(self.counts) - 1)
+        np.add.at(self.counts, bins, 1)
+        self.total += bins.size
+
+    def quantile(self, fraction):
+        if self.total == 0:
+            return 0
+        rank = min(self.total - 1, max(0, int(self.total * fraction)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side="right"))
+        return self.min_db + index * self.step_db
+
+
+class StreamingBandAnalyzer:
+    """
+    Incremental version of the whole-track analysis: one block in, one dict of
+    {freq_range: power_db} out, with running lower/upper percentile thresholds.
+    With adaptive=True every band gets its own thresholds from an AdaptiveBandNormalizer.
+    """
+
+    def __init__(self, frame_rate, block_frames, freq_ranges, lower_percent=0.30, upper_percent=0.70,
+                 adaptive=False):
+        self.freq_ranges = list(freq_ranges)
+        self.block_frames = block_frames
+        self.frame_rate = frame_rate
+        self.edges = band_bin_edges(block_frames, frame_rate, self.freq_ranges)
+        self.lower_percent = lower_percent
+        self.upper_percent = upper_percent
+        self.quantiles = RunningQuantiles()
+        self.normalizer = AdaptiveBandNormalizer(len(self.freq_ranges), lower_percent, upper_percent) if adaptive else None
+        self.blocks = 0
+
+    def process(self, block):
+        """
+        Returns (power_values, upper_thresholds, lower_thresholds) for one PCM block,
+        all three {freq_range: dB} dicts.
+        """
+        mono = block[:, 0] if block.ndim == 2 else block
+        if len(mono) < self.block_frames:
+            mono = np.concatenate([mono, np.zeros(self.block_frames - len(mono), dtype=mono.dtype)])
+
+        spectrum = np.fft.rfft(mono)
+        spectrum_power = spectrum.real ** 2 + spectrum.imag ** 2
+        power_db = np.zeros(len(self.edges))
+        for band, (lo, hi) in enumerate(self.edges):
+            power = spectrum_power[lo:hi].sum()
+            power_db[band] = 10 * np.log10(power) if power > 0 else 0
+
+        if self.normalizer is not None:
+            upper, lower = self.normalizer.update(power_db, self.blocks * self.block_frames / self.frame_rate)
+            upper_thresholds = dict(zip(self.freq_ranges, upper.tolist()))
+            lower_thresholds = dict(zip(self.freq_ranges, lower.tolist()))
+        else:
+            self.quantiles.add(power_db)
+            upper_thresholds = dict.fromkeys(self.freq_ranges, self.quantiles.quantile(self.upper_percent))
+            lower_thresholds = dict.fromkeys(self.freq_ranges, self.quantiles.quantile(self.lower_percent))
+        self.blocks += 1
+        return dict(zip(self.freq_ranges, power_db.tolist())), upper_thresholds, lower_thresholds
+
+
+async def stream_band_power(blocks, analyzer, on_frame, chunk_ms, realtime=True, telemetry=None, clock=None):
+    """
+    Drive on_frame(index, power_values, upper_thresholds, lower_thresholds) from a block generator.
+    With realtime=True frames are paced to chunk_ms against a monotonic clock, so file
+    sources are not consumed faster than they play; live sources are already behind
+    that schedule and never wait. With an AudioPlayback as clock, frame i is due when
+    the audio at i * chunk_ms is heard.
+    Returns {"frames": n, "first_frame_latency": seconds} where the latency runs from
+    the call until the first frame was handed to on_frame.
+    With a Telemetry, each frame's analysis, on_frame (dispatch) and pacing overshoot are recorded.
+    """
+    started = time.perf_counter()
+    first_frame_latency = None
+    index = 0
+
+    async for block in blocks:
+        analysis_start = time.perf_counter()
+        power_values, upper_thresholds, lower_thresholds = analyzer.process(block)
+        analysis = time.perf_counter() - analysis_start
+
+        if clock is not None:
+            # The playback anchor is on the time.monotonic() clock
+            due, now = clock.anchor() + index * chunk_ms / 1000, time.monotonic
+        else:
+            due, now = started + index * chunk_ms / 1000, time.perf_counter
+        if realtime:
+            delay = due - now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        overshoot = now() - due if realtime else float("nan")
+        dispatch_start = time.perf_counter()
+        await on_frame(index, power_values, upper_thresholds, lower_thresholds)
+        if telemetry is not None:
+            telemetry.count("frames")
+            telemetry.frame(index, analysis, time.perf_counter() - dispatch_start, overshoot=overshoot)
+        if first_frame_latency is None:
+            first_frame_latency = time.perf_counter() - started
+        index += 1
+
+    return {"frames": index, "first_frame_latency": first_frame_latency}
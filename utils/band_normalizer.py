@@ -0,0 +1,69 @@
+from statistics import NormalDist
+
+import numpy as np
+
+NORMALIZER_TIME_CONSTANT = 10.0  # seconds, how quickly the per-band statistics follow the music
+INITIAL_SPREAD_DB = 6.0  # assumed standard deviation of a band before it has any history
+
+
+class AdaptiveBandNormalizer:
+    """
+    Per-band lower/upper thresholds from exponentially weighted running mean and variance.
+
+    Every band is normalized against its own recent history, so quiet high bands
+    light up as readily as the loud low ones. Thresholds sit where the lower/upper
+    percentiles would fall for a normal distribution with the running statistics.
+    Each update is O(bands) and no history is kept, so the same class serves
+    offline analysis and live streams. Bands at 0 dB (silent or not updated) are skipped.
+    """
+
+    def __init__(self, num_bands, lower_percent=0.30, upper_percent=0.70, time_constant=NORMALIZER_TIME_CONSTANT):
+        self.lower_z = NormalDist().inv_cdf(lower_percent)
+        self.upper_z = NormalDist().inv_cdf(upper_percent)
+        self.time_constant = time_constant
+        self.mean = np.zeros(num_bands)
+        self.variance = np.full(num_bands, INITIAL_SPREAD_DB ** 2)
+        self.last_time = np.full(num_bands, np.nan)
+
+    def update(self, power_db, t):
+        """
+        Fold one frame of band powers observed at time t (seconds) into the statistics.
+        Returns (upper_thresholds, lower_thresholds) arrays, one value per band.
+        """
+        values = np.asarray(power_db, dtype=np.float64)
+        active = values > 0
+        first = active & np.isnan(self.last_time)
+        self.mean[first] = values[first]
+
+        rest = active & ~first
+        if rest.any():
+            # alpha scales with the time since the band's last update, so skipped frames are fine
+            alpha = 1 - np.exp(-(t - self.last_time[rest]) / self.time_constant)
+            diff = values[rest] - self.mean[rest]
+            increment = alpha * diff
+            self.mean[rest] += increment
+            self.variance[rest] = (1 - alpha) * (self.variance[rest] + diff * increment)
+
+        self.last_time[active] = t
+        return self.thresholds()
+
+    def thresholds(self):
+        spread = np.sqrt(self.variance)
+        return self.mean + self.upper_z * spread, self.mean + self.lower_z * spread
+
+
+def adaptive_thresholds(power_matrix, frame_interval, lower_percent=0.30, upper_percent=0.70,
+                        time_constant=NORMALIZER_TIME_CONSTANT):
+    """
+    Run an AdaptiveBandNormalizer over a whole (frames, bands) matrix.
+    Returns (upper, lower) matrices of the same shape, each row using only that frame and earlier ones.
+    """
+    normalizer = AdaptiveBandNormalizer(power_matrix.shape[1], lower_percent, upper_percent, time_constant)
+    upper = np.empty(power_matrix.shape)
+    lower = np.empty(power_matrix.shape)
+    current = normalizer.thresholds()
+    for index, row in enumerate(power_matrix):
+        if row.any():
+            current = normalizer.update(row, index * frame_interval)
+        upper[index], lower[index] = current
+    return upper, lower
@@ -0,0 +1,178 @@
+import numpy as np
+
+from utils.audio_analysis import FRAME_BATCH, band_bin_edges, frame_samples
+
+HOP_MS = 23  # analysis hop, ~1024 samples at 44.1 kHz
+WINDOW_MS = 46  # analysis window, rounded up to a power of two in samples
+MIN_BPM = 60
+MAX_BPM = 200
+PRIOR_BPM = 120  # tempo estimates are weighted towards this, one octave standard deviation
+TIGHTNESS = 100  # how strongly beat tracking sticks to the estimated period
+ONSET_WAIT_MS = 60  # minimum gap between two picked onsets
+
+
+def analysis_frames(num_samples, frame_rate, hop_ms=HOP_MS, window_ms=WINDOW_MS):
+    """
+    (hop, frame_length, num_frames) in samples for a hop_ms grid with window_ms windows.
+    """
+    hop = max(1, round(frame_rate * hop_ms / 1000))
+    frame_length = 1 << int(np.ceil(np.log2(frame_rate * window_ms / 1000)))
+    num_frames = 0 if num_samples < frame_length else 1 + (num_samples - frame_length) // hop
+    return hop, frame_length, num_frames
+
+
+def spectral_analysis(samples, frame_rate, freq_ranges, hop_ms=HOP_MS, window_ms=WINDOW_MS):
+    """
+    Short-time band power and spectral flux of a mono sample buffer in one batched pass.
+    Returns (band_db, flux, hop_seconds): a (frames, bands) dB matrix (silent bands are 0 dB),
+    the half-wave rectified frame-to-frame increase of log magnitude summed over all bins,
+    and the exact hop length in seconds.
+    """
+    hop, frame_length, num_frames = analysis_frames(len(samples), frame_rate, hop_ms, window_ms)
+    band_db = np.zeros((num_frames, len(freq_ranges)), dtype=np.float64)
+    flux = np.zeros(num_frames, dtype=np.float64)
+    if not num_frames:
+        return band_db, flux, hop / frame_rate
+
+    frames = frame_samples(samples, frame_length, num_frames, hop)
+    edges = band_bin_edges(frame_length, frame_rate, freq_ranges)
+    window = np.hanning(frame_length)
+    previous = None
+
+    for start in range(0, num_frames, FRAME_BATCH):
+        spectrum = np.fft.rfft(frames[start:start + FRAME_BATCH] * window, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+
+        batch_power = np.stack([power[:, lo:hi].sum(axis=1) for lo, hi in edges], axis=1)
+        batch_db = band_db[start:start + FRAME_BATCH]
+        np.log10(batch_power, out=batch_db, where=batch_power > 0)
+
+        log_magnitude = np.log1p(np.sqrt(power))
+        if previous is None:
+            previous = log_magnitude[:1]
+        diff = np.diff(np.concatenate([previous, log_magnitude]), axis=0)
+        flux[start:start + FRAME_BATCH] = np.maximum(diff, 0).sum(axis=1)
+        previous = log_magnitude[-1:]
+
+    band_db *= 10
+    return band_db, flux, hop / frame_rate
+
+
+def onset_envelope(flux):
+    """Flux with its slow-moving trend removed and scaled to 0..1."""
+    if not len(flux):
+        return flux
+    width = min(len(flux), 15)
+    trend = np.convolve(flux, np.ones(width) / width, mode="same")
+    envelope = np.maximum(flux - trend, 0)
+    peak = envelope.max()
+    return envelope / peak if peak > 0 else envelope
+
+
+def pick_onsets(envelope, hop_seconds, delta=0.07, wait_ms=ONSET_WAIT_MS):
+    """
+    Frame indices of onsets: local maxima over ~+/-50 ms that rise delta above the
+    local mean over ~+/-150 ms, at least wait_ms apart.
+    """
+    if not len(envelope):
+        return np.zeros(0, dtype=np.int64)
+    max_half = max(1, round(0.05 / hop_seconds))
+    avg_half = max(1, round(0.15 / hop_seconds))
+    padded = np.pad(envelope, max_half, mode="edge")
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * max_half + 1).max(axis=1)
+    local_mean = np.convolve(envelope, np.ones(2 * avg_half + 1) / (2 * avg_half + 1), mode="same")
+    candidates = np.flatnonzero((envelope >= local_max) & (envelope >= local_mean + delta))
+
+    wait = max(1, round(wait_ms / 1000 / hop_seconds))
+    onsets = []
+    for frame in candidates:
+        if not onsets or frame - onsets[-1] >= wait:
+            onsets.append(frame)
+    return np.array(onsets, dtype=np.int64)
+
+
+def estimate_tempo(envelope, hop_seconds, min_bpm=MIN_BPM, max_bpm=MAX_BPM, prior_bpm=PRIOR_BPM):
+    """
+    Tempo in BPM from the autocorrelation of the onset envelope, weighted by a
+    log-normal prior around prior_bpm. Returns (bpm, period in frames).
+    """
+    min_lag = max(1, int(60 / (max_bpm * hop_seconds)))
+    max_lag = int(np.ceil(60 / (min_bpm * hop_seconds)))
+    if len(envelope) <= max_lag:
+        return float(prior_bpm), 60 / (prior_bpm * hop_seconds)
+
+    centered = envelope - envelope.mean()
+    size = 1 << int(np.ceil(np.log2(2 * len(centered))))
+    spectrum = np.fft.rfft(centered, size)
+    autocorrelation = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)[:max_lag + 1]
+
+    lags = np.arange(min_lag, max_lag + 1)
+    bpms = 60 / (lags * hop_seconds)
+    prior = np.exp(-0.5 * np.log2(bpms / prior_bpm) ** 2)
+    best_lag = int(lags[np.argmax(autocorrelation[min_lag:] * prior)])
+    return 60 / (best_lag * hop_seconds), best_lag
+
+
+def track_beats(envelope, period, tightness=TIGHTNESS):
+    """
+    Dynamic-programming beat tracker: every frame's score is its onset strength plus the
+    best predecessor score half to two periods back, penalized by how far the gap is
+    from the period. Returns beat frame indices.
+    """
+    n = len(envelope)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    period = max(1, int(round(period)))
+    offsets = np.arange(-2 * period, -max(1, period // 2) + 1)
+    penalty = -tightness * np.log(-offsets / period) ** 2
+
+    score = envelope.astype(np.float64).copy()
+    backlink = np.full(n, -1, dtype=np.int64)
+    for t in range(-offsets[-1], n):
+        lo = max(0, t + offsets[0])
+        candidates = score[lo:t + offsets[-1] + 1] + penalty[lo - (t + offsets[0]):]
+        best = int(np.argmax(candidates))
+        if candidates[best] > 0:
+            score[t] += candidates[best]
+            backlink[t] = lo + best
+
+    # Start from the best scoring frame within the last period and follow the links back
+    tail = max(0, n - period)
+    beat = tail + int(np.argmax(score[tail:]))
+    beats = [beat]
+    while backlink[beat] >= 0:
+        beat = backlink[beat]
+        beats.append(beat)
+    return np.array(beats[::-1], dtype=np.int64)
+
+
+def analyze_beats(samples, frame_rate, freq_ranges, hop_ms=HOP_MS):
+    """
+    Full onset/tempo/beat analysis of a mono sample buffer.
+    Returns a dict with hop_seconds, band_db (frames, bands), envelope, onsets, tempo and beats.
+    """
+    band_db, flux, hop_seconds = spectral_analysis(samples, frame_rate, freq_ranges, hop_ms)
+    envelope = onset_envelope(flux)
+    tempo, period = estimate_tempo(envelope, hop_seconds)
+    return {
+        "hop_seconds": hop_seconds,
+        "band_db": band_db,
+        "envelope": envelope,
+        "onsets": pick_onsets(envelope, hop_seconds),
+        "tempo": tempo,
+        "beats": track_beats(envelope, period),
+    }
+
+
+def beat_power_matrix(band_db, beats):
+    """
+    Hop-rate matrix that is 0 dB everywhere except on beat frames, which carry the mean
+    band power until the next beat. Fed through light_commands_by_power_and_range,
+    the 0 dB frames leave the lights as they are, so changes land on beats only.
+    """
+    matrix = np.zeros_like(band_db)
+    if not len(beats):
+        return matrix
+    counts = np.diff(np.append(beats, len(band_db)))
+    matrix[beats] = np.add.reduceat(band_db, beats, axis=0) / counts[:, np.newaxis]
+    return matrix
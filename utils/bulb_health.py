@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+from utils.network_utils import PROBE_TIMEOUT, probe_bulb
+
+COMMAND_DEADLINE = 0.5  # seconds a healthy bulb gets before the command counts as failed
+QUARANTINE_DEADLINE = 0.2  # seconds a fire-and-forget command to a quarantined bulb may take
+FAILURES_TO_QUARANTINE = 3  # consecutive failures before a bulb is quarantined
+MIN_SUCCESS_RATE = 0.5  # smoothed success rate below which a bulb is quarantined
+SLOW_RTT = 0.4  # smoothed round-trip in seconds above which a bulb is quarantined
+HEALTH_EWMA_ALPHA = 0.2
+REPROBE_INTERVAL = 5.0  # seconds between background probes of quarantined bulbs
+
+
+class BulbHealth:
+    """Success rate, round-trip and quarantine state of one bulb."""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.success_rate = 1.0
+        self.rtt = None
+        self.quarantined = False
+        self.quarantined_at = None
+        self.quarantines = 0
+
+    def record(self, ok, rtt=None):
+        self.success_rate += HEALTH_EWMA_ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.rtt = rtt if self.rtt is None else self.rtt + HEALTH_EWMA_ALPHA * (rtt - self.rtt)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def unhealthy(self):
+        return (self.consecutive_failures >= FAILURES_TO_QUARANTINE
+                or self.success_rate < MIN_SUCCESS_RATE
+                or (self.rtt is not None and self.rtt > SLOW_RTT))
+
+    def counters(self):
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": self.success_rate,
+            "rtt": self.rtt,
+            "quarantined": self.quarantined,
+            "quarantines": self.quarantines,
+        }
+
+
+class MonitoredBulb:
+    """
+    Drop-in wrapper that keeps one slow or dead bulb from stalling a whole frame.
+
+    Healthy bulbs get COMMAND_DEADLINE to acknowledge, and the outcome of every
+    command that was actually sent feeds their BulbHealth. Once quarantined, commands are sent fire-and-forget with a short
+    deadline and turn_on/turn_off return False straight away, so a gather over all
+    bulbs never waits on this one. The HealthMonitor re-probes it in the background.
+    Any other attribute is passed through to the wrapped bulb.
+    """
+
+    def __init__(self, bulb, monitor):
+        self.bulb = bulb
+        self.monitor = monitor
+        self.health = BulbHealth()
+
+    def __getattr__(self, name):
+        return getattr(self.bulb, name)
+
+    def __repr__(self):
+        return f"<MonitoredBulb {self.bulb.ip}>"
+
+    async def _timed(self, send, deadline):
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(send(), deadline)
+        except Exception:
+            self.health.record(False)
+            raise
+        if result is not False:
+            # False is a command the state cache underneath suppressed: nothing went out, so it
+            # says nothing about the bulb and must not pull the success rate up or the rtt down.
+            # UdpBulbs return the transport's own ack round trip, which is the better measure.
+            rtt = result if isinstance(result, float) else time.monotonic() - start
+            self.health.record(True, rtt)
+        return result
+
+    async def _forget(self, send):
+        try:
+            await self._timed(send, QUARANTINE_DEADLINE)
+        except Exception:
+            pass
+
+    async def _send(self, send):
+        if self.health.quarantined:
+            self.monitor.spawn(self._forget(send))
+            return False
+        try:
+            return await self._timed(send, self.monitor.command_deadline)
+        finally:
+            if self.health.unhealthy():
+                self.monitor.quarantine(self)
+
+    async def turn_on(self, pilot):
+        return await self._send(lambda: self.bulb.turn_on(pilot))
+
+    async def turn_off(self):
+        return await self._send(self.bulb.turn_off)
+
+
+class HealthMonitor:
+    """
+    Creates MonitoredBulb wrappers and re-probes quarantined bulbs in the background
+    until they answer again, then lets them rejoin the show.
+    """
+
+    def __init__(self, command_deadline=COMMAND_DEADLINE, reprobe_interval=REPROBE_INTERVAL):
+        self.command_deadline = command_deadline
+        self.reprobe_interval = reprobe_interval
+        self.bulbs = []
+        self.tasks = set()
+        self.prober = None
+        self.rejoined = 0
+
+    def wrap(self, bulbs):
+        wrapped = [MonitoredBulb(bulb, self) for bulb in bulbs]
+        self.bulbs.extend(wrapped)
+        return wrapped
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def quarantine(self, bulb):
+        if bulb.health.quarantined:
+            return
+        bulb.health.quarantined = True
+        bulb.health.quarantined_at = time.monotonic()
+        bulb.health.quarantines += 1
+        print(f"Bulb {bulb.ip} quarantined: success rate {bulb.health.success_rate:.2f}, "
+              f"{bulb.health.consecutive_failures} consecutive failures")
+        if self.prober is None or self.prober.done():
+            self.prober = asyncio.create_task(self._reprobe())
+
+    def rejoin(self, bulb):
+        health = bulb.health
+        health.quarantined = False
+        health.consecutive_failures = 0
+        health.success_rate = 1.0
+        health.rtt = None
+        invalidate = getattr(bulb.bulb, "invalidate", None)
+        if invalidate is not None:
+            invalidate()  # its state is unknown after the outage, resend the next command
+        self.rejoined += 1
+        print(f"Bulb {bulb.ip} answered again and rejoined the show")
+
+    async def _answers(self, bulb):
+        """
+        Probe a quarantined bulb the way its commands travel: UdpBulbs through their transport
+        and address (a replayed or simulated bulb does not listen on its IP), wizlights by IP.
+        """
+        probe = getattr(bulb, "probe", None)
+        if probe is None:
+            found = await probe_bulb(bulb.ip, PROBE_TIMEOUT)
+            if found is None:
+                return False
+            await found.async_close()
+            return True
+        try:
+            await asyncio.wait_for(probe(), PROBE_TIMEOUT)
+        except Exception:
+            return False
+        return True
+
+    async def _reprobe(self):
+        while True:
+            quarantined = [bulb for bulb in self.bulbs if bulb.health.quarantined]
+            if not quarantined:
+                return
+            await asyncio.sleep(self.reprobe_interval)
+            answers = await asyncio.gather(*(self._answers(bulb) for bulb in quarantined))
+            for bulb, answered in zip(quarantined, answers):
+                if answered:
+                    self.rejoin(bulb)
+
+    def counters(self):
+        return {
+            "bulbs": len(self.bulbs),
+            "quarantined": sum(1 for bulb in self.bulbs if bulb.health.quarantined),
+            "quarantines": sum(bulb.health.quarantines for bulb in self.bulbs),
+            "rejoined": self.rejoined,
+            "failures": sum(bulb.health.failures for bulb in self.bulbs),
+        }
+
+    def close(self):
+        if self.prober is not None:
+            self.prober.cancel()
+        for task in list(self.tasks):
+            task.cancel()
+
+
+def print_health_counters(counters):
+    print(f"Health: {counters['quarantined']} of {counters['bulbs']} bulbs quarantined now, "
+          f"{counters['quarantines']} quarantines, {counters['rejoined']} rejoined, "
+          f"{counters['failures']} failed commands")
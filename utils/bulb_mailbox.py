@@ -0,0 +1,170 @@
+import asyncio
+
+MAX_BULB_RATE = 10.0  # commands per second a single bulb is sent at most
+GLOBAL_PACKET_RATE = 200.0  # packets per second across the whole rig
+GLOBAL_BURST = 40  # packets that may go out back to back before the global rate applies
+
+
+class TokenBucket:
+    """
+    Global packets/sec budget: acquire() waits until a token is available.
+    """
+
+    def __init__(self, rate=GLOBAL_PACKET_RATE, burst=GLOBAL_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = None
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated is not None:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MailboxStats:
+    def __init__(self):
+        self.submitted = 0
+        self.sent = 0
+        self.superseded = 0
+        self.failed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    def counters(self):
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "superseded": self.superseded,
+            "failed": self.failed,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class MailboxBulb:
+    """
+    Drop-in wrapper around a bulb with a one-slot outbound mailbox.
+
+    A new command replaces one that has not gone out yet; the replaced command's caller
+    gets False, like a suppressed command from TrackedBulb. A per-bulb worker sends the
+    latest command at most max_rate times per second, one at a time, within the shared
+    global packet budget, and returns the wrapped bulb's result to the caller.
+    Any other attribute is passed through to the wrapped bulb.
+    """
+
+    def __init__(self, bulb, mailboxes):
+        self.bulb = bulb
+        self.mailboxes = mailboxes
+        self.slot = None  # (send, future) of the latest command not sent yet
+        self.in_flight = None  # future of the command the worker is sending
+        self.worker = None
+        self.last_sent = None
+
+    def __getattr__(self, name):
+        return getattr(self.bulb, name)
+
+    def __repr__(self):
+        return f"<MailboxBulb {self.bulb.ip}>"
+
+    def _post(self, send):
+        stats = self.mailboxes.stats
+        future = asyncio.get_running_loop().create_future()
+        stats.submitted += 1
+        if self.slot is not None:
+            superseded = self.slot[1]
+            if not superseded.done():
+                superseded.set_result(False)
+            stats.superseded += 1
+        else:
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+        self.slot = (send, future)
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._drain())
+        return future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        stats = self.mailboxes.stats
+        while self.slot is not None:
+            if self.last_sent is not None:
+                wait = self.last_sent + 1 / self.mailboxes.max_rate - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            await self.mailboxes.bucket.acquire()
+
+            # Whatever is in the slot now is the latest state, earlier ones were dropped
+            send, future = self.slot
+            self.slot = None
+            stats.queue_depth -= 1
+            stats.sent += 1
+            self.last_sent = loop.time()
+            self.in_flight = future
+            try:
+                result = await send()
+            except Exception as exc:
+                stats.failed += 1
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.in_flight = None
+
+    async def turn_on(self, pilot):
+        return await self._post(lambda: self.bulb.turn_on(pilot))
+
+    async def turn_off(self):
+        return await self._post(self.bulb.turn_off)
+
+    def close(self):
+        """Stop the worker; callers still waiting on a queued or in-flight command get CancelledError."""
+        if self.in_flight is not None:
+            # The worker has taken it out of the slot, so cancelling the worker alone would leave it pending
+            self.in_flight.cancel()
+            self.in_flight = None
+        if self.slot is not None:
+            self.slot[1].cancel()
+            self.slot = None
+            self.mailboxes.stats.queue_depth -= 1
+        if self.worker is not None:
+            self.worker.cancel()
+
+
+class BulbMailboxes:
+    """
+    Creates MailboxBulb wrappers that share one global packet budget and one set of counters.
+    """
+
+    def __init__(self, max_rate=MAX_BULB_RATE, global_rate=GLOBAL_PACKET_RATE, burst=GLOBAL_BURST):
+        self.max_rate = max_rate
+        self.bucket = TokenBucket(global_rate, burst)
+        self.stats = MailboxStats()
+        self.bulbs = []
+
+    def wrap(self, bulbs):
+        wrapped = [MailboxBulb(bulb, self) for bulb in bulbs]
+        self.bulbs.extend(wrapped)
+        return wrapped
+
+    def counters(self):
+        return self.stats.counters()
+
+    def close(self):
+        for bulb in self.bulbs:
+            bulb.close()
+
+
+def print_mailbox_counters(counters):
+    print(f"Mailbox: {counters['sent']} sent of {counters['submitted']} submitted, "
+          f"{counters['superseded']} superseded, {counters['failed']} failed, "
+          f"max queue depth {counters['max_queue_depth']}")
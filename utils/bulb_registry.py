@@ -0,0 +1,81 @@
+from types import MappingProxyType
+
+from utils.constants import ip_mapping
+
+ROW_SIZE = 4  # bulbs per row of the rig, one row per frequency band
+
+
+class BulbRegistry:
+    """
+    Discovered bulbs indexed once at startup.
+
+    Lookups by number (from ip_mapping), IP and MAC are dict hits, and group views
+    (numbered list, rows, chains) are precomputed tuples, so show loops never build
+    dicts or slice lists per frame. Works with wizlight objects and with any wrapper
+    that exposes .ip and .mac.
+    """
+
+    def __init__(self, bulbs, mapping=ip_mapping, row_size=ROW_SIZE):
+        self.bulbs = tuple(bulbs)
+        self._by_ip = MappingProxyType({str(bulb.ip): bulb for bulb in self.bulbs})
+        self._by_mac = MappingProxyType({bulb.mac: bulb for bulb in self.bulbs if getattr(bulb, "mac", None)})
+        self._by_number = MappingProxyType({
+            number: self._by_ip[ip] for number, ip in mapping.items() if ip in self._by_ip
+        })
+        # Same (number, bulb) tuples map_light_bulbs used to return, in ip_mapping order
+        self.numbered = tuple(sorted(self._by_number.items()))
+        ordered = tuple(bulb for _, bulb in self.numbered)
+        self.rows = tuple(ordered[i:i + row_size] for i in range(0, len(ordered), row_size))
+        self._chains = {}
+
+    def __len__(self):
+        return len(self.bulbs)
+
+    def __iter__(self):
+        return iter(self.bulbs)
+
+    def by_number(self, number):
+        return self._by_number.get(number)
+
+    def by_ip(self, ip):
+        return self._by_ip.get(str(ip))
+
+    def by_mac(self, mac):
+        return self._by_mac.get(mac)
+
+    def chain(self, ips):
+        """
+        Bulbs in the given IP order, skipping any that were not discovered.
+        Cached, so repeated calls with the same order return the same tuple.
+        """
+        key = tuple(ips)
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = tuple(self._by_ip[ip] for ip in key if ip in self._by_ip)
+            self._chains[key] = chain
+        return chain
+
+    def missing(self, ips):
+        return [ip for ip in ips if ip not in self._by_ip]
+
+    def group(self, spec):
+        """
+        Bulbs for a group spec: "all", "rowN" (1-based) or comma-separated bulb numbers.
+        Raises KeyError for a bulb number that was not discovered.
+        """
+        spec = str(spec or "all").strip().lower()
+        if spec == "all":
+            return self.bulbs
+        if spec.startswith("row"):
+            return self.row(int(spec[3:]) - 1)
+        numbers = [int(number) for number in spec.split(",")]
+        missing = [number for number in numbers if number not in self._by_number]
+        if missing:
+            raise KeyError(missing[0])
+        return tuple(self._by_number[number] for number in numbers)
+
+    def row(self, index):
+        """
+        index-th row of ROW_SIZE bulbs by number, or an empty tuple if that row was not found.
+        """
+        return self.rows[index] if 0 <= index < len(self.rows) else ()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import random
+
+from utils.udp_transport import PORT
+
+SIMULATOR_HOST_PREFIX = "127.0.1."  # bulb i listens on 127.0.1.<i + 1>; all of 127/8 is loopback on Linux
+DEFAULT_LATENCY = 0.02  # seconds before a simulated bulb answers
+DEFAULT_JITTER = 0.005  # +/- seconds of uniform jitter on top of the latency
+DEFAULT_LOSS = 0.0  # probability that a request is silently dropped
+
+
+class SimulatedBulb(asyncio.DatagramProtocol):
+    """
+    Local stand-in for a WiZ bulb speaking the JSON-over-UDP protocol.
+
+    Handles setPilot, getPilot, getSystemConfig and registration with configurable
+    latency, jitter and loss, keeps the pilot state it was given and echoes the
+    request id when one is present.
+    """
+
+    def __init__(self, ip, mac, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, loss=DEFAULT_LOSS, seed=None):
+        self.ip = ip
+        self.mac = mac
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.pilot = {"state": False, "sceneId": 0, "dimming": 100, "r": 255, "g": 255, "b": 255}
+        self.received = 0
+        self.dropped = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        asyncio.get_running_loop().call_later(delay, self._respond, request, addr)
+
+    def handle(self, request):
+        method = request.get("method")
+        params = request.get("params", {})
+        if method in ("setPilot", "setState"):
+            self.pilot.update(params)
+            return {"result": {"success": True}}
+        if method == "getPilot":
+            return {"result": {"mac": self.mac, "rssi": -50, **self.pilot}}
+        if method == "getSystemConfig":
+            return {"result": {"mac": self.mac, "homeId": 1, "roomId": 1, "fwVersion": "1.25.0",
+                               "moduleName": "ESP01_SHRGB1C_31"}}
+        if method == "registration":
+            return {"result": {"mac": self.mac, "success": True}}
+        return {"error": {"code": -32601, "message": "Method not found"}}
+
+    def _respond(self, request, addr):
+        if self.transport is None or self.transport.is_closing():
+            return
+        response = {"method": request.get("method"), "env": "pro", **self.handle(request)}
+        if "id" in request:
+            response["id"] = request["id"]
+        self.transport.sendto(json.dumps(response, separators=(",", ":")).encode(), addr)
+
+
+class BulbSimulator:
+    """
+    A rig of SimulatedBulb endpoints on loopback addresses, one per bulb.
+    """
+
+    def __init__(self, count, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, loss=DEFAULT_LOSS,
+                 host_prefix=SIMULATOR_HOST_PREFIX, port=PORT, seed=0):
+        self.count = count
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.host_prefix = host_prefix
+        self.port = port
+        self.seed = seed
+        self.bulbs = []
+        self.endpoints = []
+
+    @property
+    def ips(self):
+        return [bulb.ip for bulb in self.bulbs]
+
+    @property
+    def ip_mapping(self):
+        """Number -> IP mapping in the same shape as utils.constants.ip_mapping."""
+        return {number: ip for number, ip in enumerate(self.ips, start=1)}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for i in range(self.count):
+            ip = f"{self.host_prefix}{i + 1}"
+            bulb = SimulatedBulb(ip, f"a8bb50{i:06x}", self.latency, self.jitter, self.loss, self.seed + i)
+            transport, _ = await loop.create_datagram_endpoint(lambda b=bulb: b, local_addr=(ip, self.port))
+            self.bulbs.append(bulb)
+            self.endpoints.append(transport)
+        return self
+
+    def close(self):
+        for transport in self.endpoints:
+            transport.close()
+        self.endpoints = []
+
+    def counters(self):
+        return {
+            "received": sum(bulb.received for bulb in self.bulbs),
+            "dropped": sum(bulb.dropped for bulb in self.bulbs),
+        }
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+        await asyncio.sleep(0)  # let the sockets actually close so the addresses can be reused
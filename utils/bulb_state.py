@@ -0,0 +1,130 @@
+import asyncio
+import time
+import weakref
+
+REFRESH_INTERVAL = 5.0  # seconds after which an unchanged state is re-sent anyway, to recover lost packets
+
+OFF_STATE = (("state", False),)
+
+_pilot_states = weakref.WeakKeyDictionary()
+
+
+def pilot_state(pilot):
+    """
+    Hashable target state of a PilotBuilder; None means off.
+    """
+    if pilot is None:
+        return OFF_STATE
+    state = _pilot_states.get(pilot)
+    if state is None:
+        params = dict(pilot.pilot_params)
+        params["state"] = True
+        state = tuple(sorted(params.items()))
+        # Reused pilots (precomputed wheels, interned scene entries) only pay for this once
+        _pilot_states[pilot] = state
+    return state
+
+
+class BulbStateStats:
+    def __init__(self):
+        self.sent = 0
+        self.suppressed = 0
+        self.refreshed = 0
+
+    def counters(self):
+        total = self.sent + self.suppressed
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "refreshed": self.refreshed,
+            "suppressed_ratio": self.suppressed / total if total else 0.0,
+        }
+
+
+class TrackedBulb:
+    """
+    Drop-in wrapper around a wizlight that remembers the last acknowledged state and
+    only sends a command when the target differs, or when the last acknowledgement is
+    older than the refresh interval. turn_on/turn_off return False when suppressed,
+    otherwise the wrapped bulb's result (a UdpBulb's ack round trip) or True.
+    Any other attribute is passed through to the wrapped wizlight.
+    """
+
+    def __init__(self, bulb, stats, refresh_interval=REFRESH_INTERVAL):
+        self.bulb = bulb
+        self.stats = stats
+        self.refresh_interval = refresh_interval
+        self.acked_state = None
+        self.acked_at = 0.0
+        self.pending_state = None
+
+    def __getattr__(self, name):
+        return getattr(self.bulb, name)
+
+    def __repr__(self):
+        return f"<TrackedBulb {self.bulb.ip}>"
+
+    async def _apply(self, state, send):
+        now = time.monotonic()
+        if self.pending_state is not None:
+            # A command is still in flight, so the bulb ends up in its state unless this one differs;
+            # the acknowledged state is about to be overwritten and says nothing
+            if state == self.pending_state:
+                self.stats.suppressed += 1
+                return False
+        elif state == self.acked_state:
+            if now - self.acked_at < self.refresh_interval:
+                self.stats.suppressed += 1
+                return False
+            self.stats.refreshed += 1
+
+        self.stats.sent += 1
+        self.pending_state = state
+        try:
+            result = await send()
+        except (Exception, asyncio.CancelledError):
+            # State on the bulb is unknown now (failed, or cancelled by a deadline), so the next command always goes out
+            self.acked_state = None
+            if self.pending_state == state:
+                self.pending_state = None
+            raise
+        if self.pending_state == state:
+            # Only the latest command sent decides the known state; an older one acknowledged
+            # after it was overtaken leaves that to the newer command's acknowledgement
+            self.acked_state = state
+            self.acked_at = time.monotonic()
+            self.pending_state = None
+        return True if result is None else result
+
+    async def turn_on(self, pilot):
+        return await self._apply(pilot_state(pilot), lambda: self.bulb.turn_on(pilot))
+
+    async def turn_off(self):
+        return await self._apply(OFF_STATE, self.bulb.turn_off)
+
+    def invalidate(self):
+        """
+        Forget the known state so the next command is sent unconditionally.
+        """
+        self.acked_state = None
+
+
+class BulbStateCache:
+    """
+    Creates TrackedBulb wrappers that share one set of sent/suppressed counters.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.stats = BulbStateStats()
+
+    def wrap(self, bulbs):
+        return [TrackedBulb(bulb, self.stats, self.refresh_interval) for bulb in bulbs]
+
+    def counters(self):
+        return self.stats.counters()
+
+
+def print_state_counters(counters):
+    print(f"Bulb commands sent: {counters['sent']} ({counters['refreshed']} refreshes), "
+          f"suppressed: {counters['suppressed']} ({counters['suppressed_ratio'] * 100:.0f}%)")
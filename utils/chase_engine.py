@@ -0,0 +1,123 @@
+import asyncio
+import time
+import numpy as np
+from pywizlight import PilotBuilder
+
+
+def chase_positions(num_bulbs, steps, bounce=False):
+    """
+    Head position for each step: wraps around the chain, or ping-pongs between the ends with bounce.
+    Returns (positions, directions) arrays, direction being +1 or -1: the direction of the
+    move that brought the head there, so a tail keeps trailing it at the turning points.
+    """
+    step = np.arange(steps)
+    if not bounce or num_bulbs < 2:
+        return step % max(num_bulbs, 1), np.ones(steps, dtype=np.int64)
+    period = 2 * (num_bulbs - 1)
+    phase = step % period
+    positions = np.where(phase < num_bulbs, phase, period - phase)
+    # The last bulb ends the outward leg and the first one (phase 0) ends the return leg
+    directions = np.where((phase > 0) & (phase <= num_bulbs - 1), 1, -1)
+    return positions, directions
+
+
+def chase_frames(num_bulbs, heads=1, tail=0, falloff=0.5, bounce=False, brightness=255):
+    """
+    Precompute one full cycle of the pattern as a (steps, bulbs) brightness matrix, 0 meaning off.
+    Heads are spread evenly along the chain; each drags `tail` bulbs behind it whose
+    brightness falls off geometrically. Overlapping heads/tails keep the brighter value.
+    """
+    steps = 2 * (num_bulbs - 1) if bounce and num_bulbs > 1 else num_bulbs
+    frames = np.zeros((steps, num_bulbs), dtype=np.int64)
+    levels = [brightness] + [max(1, round(brightness * falloff ** k)) for k in range(1, tail + 1)]
+
+    for head in range(heads):
+        # offset each head by an equal share of the cycle
+        offset = head * steps // heads
+        positions, directions = chase_positions(num_bulbs, steps + offset, bounce)
+        positions, directions = positions[offset:], directions[offset:]
+        for k, level in enumerate(levels):
+            trail = positions - k * directions
+            if bounce:
+                valid = (trail >= 0) & (trail < num_bulbs)
+            else:
+                trail = trail % num_bulbs
+                valid = np.ones(steps, dtype=bool)
+            rows = np.flatnonzero(valid)
+            cols = trail[valid]
+            frames[rows, cols] = np.maximum(frames[rows, cols], level)
+    return frames
+
+
+class ChaseAnimator:
+    """
+    Runs a precomputed chase pattern over an ordered chain of bulbs.
+
+    Every step only touches bulbs whose brightness changed, and all of those commands
+    (the off of the old position and the on of the new one) go out concurrently.
+    Steps are held against the monotonic clock: if a step takes longer than the
+    period, the following steps are dropped rather than slowing the whole chase.
+    """
+
+    def __init__(self, bulbs, color=(255, 0, 0), speed=1.0, heads=1, tail=0, falloff=0.5,
+                 bounce=False, brightness=255, telemetry=None):
+        self.bulbs = list(bulbs)
+        self.telemetry = telemetry
+        self.speed = speed
+        self.frames = chase_frames(len(self.bulbs), heads, tail, falloff, bounce, brightness)
+        self.pilots = {
+            int(level): PilotBuilder(brightness=int(level), rgb=color)
+            for level in np.unique(self.frames) if level > 0
+        }
+        self.current = np.zeros(len(self.bulbs), dtype=np.int64)
+        self.stats = {"steps": 0, "dropped_steps": 0, "commands": 0, "failed_commands": 0}
+
+    def _command(self, bulb, level):
+        return bulb.turn_off() if level == 0 else bulb.turn_on(self.pilots[level])
+
+    async def apply(self, target):
+        changed = np.flatnonzero(target != self.current)
+        results = await asyncio.gather(
+            *(self._command(self.bulbs[i], int(target[i])) for i in changed),
+            return_exceptions=True,
+        )
+        self.stats["commands"] += len(changed)
+        self.stats["failed_commands"] += sum(1 for r in results if isinstance(r, BaseException))
+        self.current = target.copy()
+
+    async def reset(self):
+        """Switch every bulb off at once."""
+        await asyncio.gather(*(bulb.turn_off() for bulb in self.bulbs), return_exceptions=True)
+        self.current[:] = 0
+
+    async def run(self, duration=None, steps=None):
+        """
+        Chase until cancelled, for duration seconds or for a number of steps.
+        Returns stats including the achieved vs requested step rate.
+        """
+        start = time.monotonic()
+        step_index = 0
+        try:
+            while (duration is None or time.monotonic() - start < duration) and \
+                    (steps is None or self.stats["steps"] < steps):
+                step_start = time.monotonic()
+                await self.apply(self.frames[step_index % len(self.frames)])
+                self.stats["steps"] += 1
+                if self.telemetry is not None:
+                    # apply() awaits the acknowledgements, so its duration is the step's ack time
+                    self.telemetry.count("frames")
+                    self.telemetry.frame(step_index, ack=time.monotonic() - step_start,
+                                         overshoot=step_start - (start + step_index * self.speed))
+
+                next_index = step_index + 1
+                elapsed_steps = int((time.monotonic() - start) / self.speed)
+                if elapsed_steps > next_index:
+                    self.stats["dropped_steps"] += elapsed_steps - next_index
+                    next_index = elapsed_steps
+                step_index = next_index
+                await asyncio.sleep(max(0, start + step_index * self.speed - time.monotonic()))
+        finally:
+            elapsed = time.monotonic() - start
+            self.stats["requested_rate"] = 1 / self.speed
+            self.stats["achieved_rate"] = self.stats["steps"] / elapsed if elapsed else 0.0
+        return self.stats
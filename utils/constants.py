@@ -3,6 +3,8 @@ CHUNK_MS = 100
 MIN_BRIGHTNESS = 10  
 MAX_BRIGHTNESS = 255
 NUMBER_OF_BULBS = 20
+BROADCAST_SPACE = "192.168.8.255"
+BROADCAST_SPACES = [BROADCAST_SPACE]  # one broadcast address per subnet/VLAN the rig spans
 
 ip_mapping = {
     1: "192.168.8.150",
@@ -29,13 +31,8 @@ ip_mapping = {
 
 def map_light_bulbs(bulbs):
     """Map the received light bulbs according to the ip_mapping."""
-    mapped_bulbs = []
-    for number, ip in ip_mapping.items():
-        for bulb in bulbs:
-            if bulb.ip == ip:
-                mapped_bulbs.append((number, bulb))
-                break
-    return mapped_bulbs
+    bulb_by_ip = {bulb.ip: bulb for bulb in reversed(bulbs)}
+    return [(number, bulb_by_ip[ip]) for number, ip in ip_mapping.items() if ip in bulb_by_ip]
 
 
 
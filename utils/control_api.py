@@ -0,0 +1,94 @@
+import asyncio
+import json
+import urllib.error
+import urllib.request
+
+CONTROL_HOST = "127.0.0.1"  # localhost only, the API has no authentication
+CONTROL_PORT = 8765
+CLIENT_TIMEOUT = 5.0  # seconds a client waits for the daemon to answer
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ControlError(Exception):
+    """Raised by a route handler to answer with an error status instead of 200."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 500: "Internal Server Error"}
+
+
+async def _read_request(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ControlError("request body too large")
+    body = json.loads(await reader.readexactly(length)) if length else {}
+    if not isinstance(body, dict):
+        raise ControlError("request body must be a JSON object")
+    return method, path.split("?", 1)[0], body
+
+
+async def serve_control_api(routes, host=CONTROL_HOST, port=CONTROL_PORT):
+    """
+    Minimal JSON-over-HTTP server on the event loop.
+    routes maps (method, path) to an async handler taking the JSON body dict and
+    returning a JSON-serializable dict. Returns the asyncio server.
+    """
+
+    async def handle(reader, writer):
+        status = 200
+        try:
+            method, path, body = await _read_request(reader)
+            handler = routes.get((method, path))
+            if handler is None:
+                raise ControlError(f"no route {method} {path}", 404)
+            response = await handler(body)
+        except ControlError as exc:
+            status, response = exc.status, {"error": str(exc)}
+        except (ValueError, KeyError, TypeError) as exc:
+            status, response = 400, {"error": f"{type(exc).__name__}: {exc}"}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as exc:
+            status, response = 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+        payload = json.dumps(response).encode()
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def control_request(method, path, body=None, host=CONTROL_HOST, port=CONTROL_PORT, timeout=CLIENT_TIMEOUT):
+    """
+    Blocking client call for command-line tools. Returns the decoded JSON response;
+    raises ControlError with the daemon's message on an error status and
+    ConnectionError when no daemon is listening.
+    """
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        raise ControlError(json.loads(exc.read()).get("error", exc.reason), exc.code)
+    except urllib.error.URLError as exc:
+        raise ConnectionError(f"show daemon not reachable on {host}:{port}: {exc.reason}")
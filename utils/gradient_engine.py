@@ -0,0 +1,117 @@
+import asyncio
+import time
+import numpy as np
+from pywizlight import PilotBuilder
+
+TARGET_FPS = 10  # frames per second sent to every bulb
+
+
+def hue_ramp(step):
+    """0, step, 2*step, ... clamped so the ramp always ends exactly on 255."""
+    ramp = np.arange(0, 255, step, dtype=np.int16)
+    return np.append(ramp, 255)
+
+
+def hue_wheel(step):
+    """
+    Full RGB hue cycle as an (N, 3) uint8 lookup table, the same sequence that repeated
+    calls of gradient_one.updatelightColorByHue walk from red:
+    red -> yellow -> green -> cyan -> blue -> magenta -> back to red.
+    """
+    up = hue_ramp(step)[:-1]  # each segment stops before the colour the next one starts on
+    down = 255 - up
+    full = np.full_like(up, 255)
+    zero = np.zeros_like(up)
+    segments = [
+        (full, up, zero),    # g rises
+        (down, full, zero),  # r falls
+        (zero, full, up),    # b rises
+        (zero, down, full),  # g falls
+        (up, zero, full),    # r rises
+        (full, zero, down),  # b falls
+    ]
+    return np.concatenate([np.stack(segment, axis=1) for segment in segments]).astype(np.uint8)
+
+
+def phase_offsets(num_bulbs, wheel_length, spread=1.0):
+    """
+    Per-bulb start offsets into the wheel; spread=1.0 lays one full rainbow across the bulbs.
+    """
+    return np.round(np.arange(num_bulbs) * wheel_length * spread / max(num_bulbs, 1)).astype(np.int64) % wheel_length
+
+
+class GradientAnimator:
+    """
+    Plays a hue wheel across several bulbs at a fixed frame rate.
+
+    One PilotBuilder per wheel entry is built up front and reused. The frame to show is
+    derived from the monotonic clock, so when the loop falls behind it jumps ahead
+    instead of slowing down; a bulb still busy with its previous command skips the frame.
+    """
+
+    def __init__(self, bulbs, step=5, fps=TARGET_FPS, spread=1.0, start_color=(255, 0, 0), telemetry=None):
+        self.bulbs = list(bulbs)
+        self.telemetry = telemetry
+        self.wheel = hue_wheel(step)
+        self.fps = fps
+        self.pilots = [PilotBuilder(rgb=tuple(int(v) for v in color)) for color in self.wheel]
+        self.offsets = phase_offsets(len(self.bulbs), len(self.wheel), spread)
+        matches = np.flatnonzero((self.wheel == np.array(start_color, dtype=np.uint8)).all(axis=1))
+        self.start_index = int(matches[0]) if len(matches) else 0
+        self.in_flight = {}
+        self.stats = {"frames": 0, "dropped_frames": 0, "skipped_commands": 0, "failed_commands": 0}
+
+    async def _send(self, bulb, pilot, frame_index):
+        sent_at = time.monotonic()
+        try:
+            await bulb.turn_on(pilot)
+        except Exception:
+            self.stats["failed_commands"] += 1
+        else:
+            if self.telemetry is not None:
+                self.telemetry.frame_ack(frame_index, time.monotonic() - sent_at)
+        finally:
+            self.in_flight.pop(bulb.ip, None)
+
+    def dispatch(self, frame_index):
+        """Fire one frame's commands without waiting for acknowledgements."""
+        wheel_length = len(self.pilots)
+        base = self.start_index + frame_index
+        for bulb, offset in zip(self.bulbs, self.offsets):
+            if bulb.ip in self.in_flight:
+                self.stats["skipped_commands"] += 1
+                continue
+            pilot = self.pilots[(base + offset) % wheel_length]
+            self.in_flight[bulb.ip] = asyncio.create_task(self._send(bulb, pilot, frame_index))
+
+    async def run(self, duration=None):
+        """
+        Animate until cancelled, or for duration seconds. Returns the stats with the achieved fps.
+        """
+        period = 1 / self.fps
+        start = time.monotonic()
+        last_frame = -1
+        woke_at = None
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                now = time.monotonic()
+                frame_index = int((now - start) / period)
+                if frame_index > last_frame + 1:
+                    self.stats["dropped_frames"] += frame_index - last_frame - 1
+                dispatch_start = time.perf_counter()
+                self.dispatch(frame_index)
+                if self.telemetry is not None:
+                    self.telemetry.count("frames")
+                    self.telemetry.frame(frame_index, dispatch=time.perf_counter() - dispatch_start,
+                                         overshoot=now - woke_at if woke_at is not None else 0.0)
+                self.stats["frames"] += 1
+                last_frame = frame_index
+                next_frame_at = start + (frame_index + 1) * period
+                woke_at = next_frame_at
+                await asyncio.sleep(max(0, next_frame_at - time.monotonic()))
+        finally:
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight.values(), return_exceptions=True)
+            elapsed = time.monotonic() - start
+            self.stats["achieved_fps"] = self.stats["frames"] / elapsed if elapsed else 0.0
+        return self.stats
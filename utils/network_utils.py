@@ -1,36 +1,130 @@
 import asyncio
+import json
+import os
 import re
 from pywizlight import discovery, wizlight, PilotBuilder
 
-import asyncio
+from utils.constants import NUMBER_OF_BULBS, BROADCAST_SPACES
+from utils.startup import STARTUP
+from utils.traffic_log import RECORDER
+
+BULB_REGISTRY_PATH = "./.bulb_registry.json"
+PROBE_TIMEOUT = 1.0  # seconds for a known bulb to answer its unicast probe
+BROADCAST_WAIT_TIME = 3.0  # seconds each broadcast round listens for replies
+DISCOVERY_DEADLINE = 10.0  # seconds before returning a partial set of bulbs
+WARM_PROBE_TIMEOUT = 0.3  # seconds for the quick check of a trusted registry
+TRUST_REGISTRY = False  # skip broadcast and blinking when every registry bulb answers its probe; set by light_wiz
+REPLAY_RIG = None  # a ReplayRig serving the bulbs of a traffic log instead of the network; set by light_wiz
+
+def load_bulb_registry(path=BULB_REGISTRY_PATH):
+    """Last known {mac: ip} registry, or an empty dict."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_bulb_registry(bulbs, previous=None, path=BULB_REGISTRY_PATH):
+    """Store {mac: ip}; bulbs missing this time keep their previous entry so they get probed next time."""
+    registry = dict(previous or {})
+    registry.update({bulb.mac: bulb.ip for bulb in bulbs if bulb.mac})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+async def probe_bulb(ip, timeout=PROBE_TIMEOUT):
+    """Unicast getSystemConfig to one IP; returns a wizlight with its mac or None."""
+    bulb = wizlight(ip)
+    try:
+        await asyncio.wait_for(bulb.getMac(), timeout=timeout)
+    except Exception:
+        await bulb.async_close()
+        return None
+    return bulb
 
-from utils.constants import NUMBER_OF_BULBS
+async def probe_known_bulbs(registry, timeout=PROBE_TIMEOUT):
+    """Probe every registry IP concurrently; returns {mac: wizlight} of the ones that answered."""
+    results = await asyncio.gather(*(probe_bulb(ip, timeout) for ip in registry.values()))
+    return {bulb.mac: bulb for bulb in results if bulb is not None}
 
-async def find_light_bulbs():
+async def identify_bulbs(bulbs):
+    """Blink every bulb once, all at the same time."""
+    await asyncio.gather(*(bulb.turn_on(PilotBuilder(brightness=1)) for bulb in bulbs), return_exceptions=True)
+    await asyncio.sleep(1)
+    await asyncio.gather(*(bulb.turn_off() for bulb in bulbs), return_exceptions=True)
+
+async def find_light_bulbs(expected=NUMBER_OF_BULBS, deadline=DISCOVERY_DEADLINE, identify=True,
+                           broadcast_spaces=BROADCAST_SPACES):
+    """
+    Find the bulbs, fast path first:
+    1. probe the last known MAC -> IP registry with concurrent unicast requests
+       (with TRUST_REGISTRY, a short check that returns at once if every bulb answered),
+    2. broadcast on every subnet only if some bulbs are still missing, until the deadline,
+    3. return whatever was found by then instead of blocking forever.
+    While a traffic log is being recorded the bulbs come back wrapped in RecordingBulbs.
+    """
     print("Starting to look for bulbs...")
-    
-    while True:
-        try:
-            bulbs = await asyncio.wait_for(
-                discovery.discover_lights(broadcast_space="192.168.8.255"),
-                timeout=10
-            )
-            if len(bulbs) != NUMBER_OF_BULBS:
-                print(f"Found {len(bulbs)} bulbs, expected {NUMBER_OF_BULBS}. Retrying...")
-                await asyncio.sleep(1)
-                continue
-        except asyncio.TimeoutError:
-            print("Timed out waiting for bulbs, retrying...")
+    STARTUP.mark("imports")
+    if REPLAY_RIG is not None:
+        bulbs = await REPLAY_RIG.bulbs()
+        STARTUP.mark("discovery")
+        return bulbs
+
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+
+    registry = load_bulb_registry()
+    found = {}
+    if registry:
+        warm = TRUST_REGISTRY and len(registry) >= expected
+        found = await probe_known_bulbs(registry, WARM_PROBE_TIMEOUT if warm else PROBE_TIMEOUT)
+        if warm and all(mac in found and found[mac].ip == ip for mac, ip in registry.items()):
+            # Warm start: every cached bulb answered from its cached IP, so no broadcast and no blinking.
+            # Anything stale (a bulb missing or moved) falls through to the full discovery below.
+            bulbs = list(found.values())
+            STARTUP.mark("discovery")
+            print(f"Using {len(bulbs)} bulbs from {BULB_REGISTRY_PATH}")
+            return RECORDER.wrap(bulbs)
+        print(f"{len(found)}/{len(registry)} known bulbs answered unicast probes.")
+
+    while len(found) < expected:
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            print(f"Discovery deadline reached with {len(found)} of {expected} bulbs.")
+            break
+        wait_time = min(BROADCAST_WAIT_TIME, remaining)
+        # Every subnet is searched at the same time, so more VLANs do not lengthen discovery
+        rounds = await asyncio.gather(*(
+            asyncio.wait_for(discovery.discover_lights(broadcast_space=space, wait_time=wait_time),
+                             timeout=wait_time + 1)
+            for space in broadcast_spaces
+        ), return_exceptions=True)
+        failures = [result for result in rounds if isinstance(result, BaseException)]
+        if len(failures) == len(rounds):
+            if all(isinstance(result, asyncio.TimeoutError) for result in failures):
+                print("Timed out waiting for bulbs, retrying...")
+            else:
+                # e.g. no route to a subnet; this fails at once, so wait instead of spinning
+                print(f"Broadcast discovery failed: {failures[0]!r}, retrying...")
+                await asyncio.sleep(min(1.0, max(0.0, give_up_at - loop.time())))
             continue
-        
-        if bulbs:
-            for bulb in bulbs:
-                await bulb.turn_on(PilotBuilder(brightness=1))
-            await asyncio.sleep(1)
-            for bulb in bulbs:
-                await bulb.turn_off()
-            print(f"Found bulbs: {bulbs}")
-            return bulbs
+        discovered = [bulb for result in rounds if not isinstance(result, BaseException) for bulb in result]
+        for bulb in discovered:
+            if bulb.mac not in found:
+                found[bulb.mac] = bulb
+        if len(found) < expected:
+            print(f"Found {len(found)} bulbs, expected {expected}. Retrying...")
+
+    bulbs = list(found.values())
+    STARTUP.mark("discovery")
+    if bulbs:
+        save_bulb_registry(bulbs, registry)
+        if identify:
+            await identify_bulbs(bulbs)
+            STARTUP.mark("identify")
+        print(f"Found bulbs: {bulbs}")
+    return RECORDER.wrap(bulbs)
 
 
 
@@ -0,0 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.analysis_cache import compute_entries
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class PlaylistPreparer:
+    """
+    Decodes and analyzes a whole playlist across worker processes ahead of the show.
+
+    Workers write PCM and power matrices straight into the AnalysisCache directory;
+    only small job/result dicts are pickled, and the parent memory-maps the .npy
+    files, so the page cache is the shared memory between processes. Jobs are
+    submitted in playlist order, so song N+1 is always the next one to finish
+    while song N plays. Only the parent process writes the cache index.
+    """
+
+    def __init__(self, cache, chunk_ms, freq_ranges, lower_percent=0.30, upper_percent=0.70,
+                 workers=DEFAULT_WORKERS):
+        self.cache = cache
+        self.chunk_ms = chunk_ms
+        self.freq_ranges = freq_ranges
+        self.lower_percent = lower_percent
+        self.upper_percent = upper_percent
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.jobs = {}
+
+    def submit_all(self, song_paths):
+        """Queue every song that is not cached yet; cached songs need no worker."""
+        for song_path in song_paths:
+            if song_path in self.jobs:
+                continue
+            job = self.cache.prepare_job(song_path, self.chunk_ms, self.freq_ranges,
+                                         self.lower_percent, self.upper_percent)
+            self.jobs[song_path] = None if job is None else self.executor.submit(compute_entries, job)
+
+    async def wait_ready(self, song_path):
+        """Wait for song_path's worker, if any, and index what it wrote."""
+        if song_path not in self.jobs:
+            self.submit_all([song_path])
+        future = self.jobs[song_path]
+        if future is not None:
+            self.cache.register(await asyncio.wrap_future(future))
+            self.jobs[song_path] = None
+
+    async def prepare(self, song_path):
+        """
+        Return (power_matrix, upper_threshold, lower_threshold, song) for song_path,
+        loading the analysis (which decodes and analyzes on a miss) and building the
+        playback AudioSegment off the event loop.
+        """
+        await self.wait_ready(song_path)
+        loop = asyncio.get_running_loop()
+        power_matrix, upper_threshold, lower_threshold = await loop.run_in_executor(
+            None, self.cache.load_analysis,
+            song_path, self.chunk_ms, self.freq_ranges, self.lower_percent, self.upper_percent
+        )
+        song = await loop.run_in_executor(None, self.cache.load_song, song_path)
+        return power_matrix, upper_threshold, lower_threshold, song
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,112 @@
+import asyncio
+
+from pywizlight import PilotBuilder
+
+# Scene entry flags: an entry with state 0 turns the bulb off
+STATE_ON = 1
+STATE_RGB = 2  # r, g, b are set
+STATE_DIM = 4  # brightness is set
+
+# numpy dtype spec; numpy itself is imported by the functions that build scenes, so that
+# importing this module (as the daemon does at startup) does not load it
+SCENE_DTYPE = [("state", "u1"), ("r", "u1"), ("g", "u1"), ("b", "u1"), ("brightness", "u1")]
+
+
+def scene_entry(rgb=None, brightness=None, on=True):
+    """One (state, r, g, b, brightness) entry; fields left as None are not sent."""
+    import numpy as np
+
+    if not on:
+        return np.zeros((), dtype=SCENE_DTYPE)
+    state = STATE_ON | (STATE_RGB if rgb is not None else 0) | (STATE_DIM if brightness is not None else 0)
+    r, g, b = rgb if rgb is not None else (0, 0, 0)
+    return np.array((state, r, g, b, brightness or 0), dtype=SCENE_DTYPE)
+
+
+def scene_frame(num_bulbs, entry=None):
+    """A frame for num_bulbs bulbs, all off or all set to entry."""
+    import numpy as np
+
+    frame = np.zeros(num_bulbs, dtype=SCENE_DTYPE)
+    if entry is not None:
+        frame[:] = entry
+    return frame
+
+
+def level_table(colors):
+    """
+    Bar-graph scenes for a row of len(colors) bulbs: row k of the table lights the
+    first k bulbs in their colors and turns the rest off, so level 0 is all off.
+    """
+    import numpy as np
+
+    table = np.zeros((len(colors) + 1, len(colors)), dtype=SCENE_DTYPE)
+    for level in range(1, len(colors) + 1):
+        for position, rgb in enumerate(colors[:level]):
+            table[level, position] = scene_entry(rgb)
+    return table
+
+
+class PilotTable:
+    """
+    Interns one PilotBuilder per distinct scene entry, so repeated states reuse the same
+    object (and, through pilot_state and PayloadCache, the same encoded payload).
+    """
+
+    def __init__(self):
+        self.pilots = {}
+
+    def pilot(self, entry):
+        """PilotBuilder for a scene entry, or None for off."""
+        key = entry.tobytes()
+        try:
+            return self.pilots[key]
+        except KeyError:
+            pass
+        state = int(entry["state"])
+        if not state & STATE_ON:
+            pilot = None
+        else:
+            params = {}
+            if state & STATE_RGB:
+                params["rgb"] = (int(entry["r"]), int(entry["g"]), int(entry["b"]))
+            if state & STATE_DIM:
+                params["brightness"] = int(entry["brightness"])
+            pilot = PilotBuilder(**params)
+        self.pilots[key] = pilot
+        return pilot
+
+    def commands(self, bulbs, frame):
+        """[(bulb, PilotBuilder or None)] for a frame over bulbs, in the shape the schedulers take."""
+        return [(bulb, self.pilot(entry)) for bulb, entry in zip(bulbs, frame)]
+
+
+class BulbGroup:
+    """
+    An ordered group of bulbs that is set from one scene frame per call.
+
+    apply() sends every bulb's command concurrently; one failing bulb does not abort
+    the others. level_commands() precomputes the commands for every row of a scene
+    table, so a show can pick a level per frame without building anything.
+    """
+
+    def __init__(self, bulbs, pilots=None):
+        self.bulbs = tuple(bulbs)
+        self.pilots = pilots if pilots is not None else PilotTable()
+
+    def __len__(self):
+        return len(self.bulbs)
+
+    def commands(self, frame):
+        return self.pilots.commands(self.bulbs, frame)
+
+    async def apply(self, frame):
+        """Set every bulb to its entry of frame. Returns the per-bulb results or exceptions."""
+        return await asyncio.gather(
+            *(bulb.turn_off() if pilot is None else bulb.turn_on(pilot) for bulb, pilot in self.commands(frame)),
+            return_exceptions=True,
+        )
+
+    def level_commands(self, table):
+        """Tuple of (bulb, pilot) command tuples, one per row of table."""
+        return tuple(tuple(self.commands(frame)) for frame in table)
@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+DEFAULT_BULB_LATENCY = 0.23  # seconds, initial guess until acknowledgements come back
+LATENCY_EWMA_ALPHA = 0.2  # weight of the newest round-trip sample
+START_LEAD = 0.3  # extra headroom between scheduling and the playback anchor
+
+
+class LatencyEstimator:
+    """
+    Per-bulb latency estimates, updated online from acknowledgement round-trips.
+    The latency used for scheduling is half the smoothed round-trip: the bulb applies
+    the command when the request arrives, the other half is the acknowledgement.
+    """
+
+    def __init__(self, default=DEFAULT_BULB_LATENCY, alpha=LATENCY_EWMA_ALPHA):
+        self.default = default
+        self.alpha = alpha
+        self.rtt = {}
+
+    def estimate(self, bulb):
+        rtt = self.rtt.get(bulb.ip)
+        return self.default if rtt is None else rtt / 2
+
+    def max_estimate(self, bulbs):
+        return max((self.estimate(bulb) for bulb in bulbs), default=self.default)
+
+    def observe(self, bulb, rtt):
+        previous = self.rtt.get(bulb.ip)
+        self.rtt[bulb.ip] = rtt if previous is None else previous + self.alpha * (rtt - previous)
+
+    async def send(self, bulb, pilot):
+        """
+        Send one command (pilot=None means turn off) and feed its round-trip into the estimate.
+
+        Bulbs on the raw UDP transport return the round trip measured from the datagram
+        leaving the socket to its acknowledgement, which leaves out time spent waiting in
+        wrappers such as the mailbox's rate limit; other bulbs are timed around the call.
+        """
+        start = time.monotonic()
+        if pilot is None:
+            sent = await bulb.turn_off()
+        else:
+            sent = await bulb.turn_on(pilot)
+        # A state-tracking wrapper returns False when the command was suppressed
+        if sent is False:
+            return
+        self.observe(bulb, sent if isinstance(sent, float) else time.monotonic() - start)
+
+
+class ScheduleStats:
+    def __init__(self):
+        self.frames = 0
+        self.skipped_frames = 0
+        self.commands = 0
+        self.missed_deadlines = 0
+        self.failed_commands = 0
+        self.drifts = []
+
+    def report(self):
+        drifts = sorted(self.drifts)
+        n = len(drifts)
+        return {
+            "frames": self.frames,
+            "skipped_frames": self.skipped_frames,
+            "commands": self.commands,
+            "missed_deadlines": self.missed_deadlines,
+            "failed_commands": self.failed_commands,
+            "mean_drift": sum(drifts) / n if n else 0.0,
+            "p95_drift": drifts[min(n - 1, int(n * 0.95))] if n else 0.0,
+            "max_drift": drifts[-1] if n else 0.0,
+        }
+
+
+def print_schedule_report(report):
+    print(f"Frames: {report['frames']} ({report['skipped_frames']} skipped), "
+          f"commands: {report['commands']} ({report['missed_deadlines']} missed deadlines, "
+          f"{report['failed_commands']} failed)")
+    print(f"Dispatch drift: mean {report['mean_drift'] * 1000:.1f} ms, "
+          f"p95 {report['p95_drift'] * 1000:.1f} ms, max {report['max_drift'] * 1000:.1f} ms")
+
+
+class FrameScheduler:
+    """
+    Deadline-based show scheduler on the event loop's monotonic clock.
+
+    Frame i is due at anchor + i * frame_interval; once locked to an AudioPlayback the
+    anchor follows the audio position. Each bulb's command is dispatched at
+    that time minus the bulb's estimated latency, so the change lands on the frame
+    boundary. Deadlines are absolute, so time spent dispatching never accumulates.
+    A bulb that still has a command in flight skips the frame, and a frame that is
+    already a full interval late is dropped, so the show never falls behind.
+    """
+
+    def __init__(self, frame_interval, latency=None, telemetry=None):
+        self.frame_interval = frame_interval
+        self.latency = latency or LatencyEstimator()
+        self.telemetry = telemetry
+        self.anchor = None
+        self.clock = None
+        self.in_flight = {}
+        self.stats = ScheduleStats()
+
+    def anchor_at(self, anchor):
+        """
+        Set the time (loop.time() clock) that frame 0 corresponds to, e.g. the playback start.
+        """
+        self.anchor = anchor
+
+    def lock_to(self, clock):
+        """
+        Follow an AudioPlayback: from now on frame 0 is wherever the audio says it was,
+        re-read every frame, so the show cannot drift from what is being heard.
+        """
+        self.clock = clock
+        self.anchor = clock.anchor()
+
+    async def _send(self, bulb, pilot, index):
+        sent_at = time.monotonic()
+        try:
+            await self.latency.send(bulb, pilot)
+        except Exception:
+            self.stats.failed_commands += 1
+            if self.telemetry is not None:
+                self.telemetry.count("failed_commands")
+        else:
+            if self.telemetry is not None:
+                self.telemetry.frame_ack(index, time.monotonic() - sent_at)
+        finally:
+            self.in_flight.pop(bulb.ip, None)
+
+    async def run(self, frames):
+        """
+        frames yields, per frame, a list of (bulb, pilot) commands; pilot=None turns the bulb off.
+        Frames are pulled lazily so they can be computed just in time.
+        Returns the statistics report for this run.
+        """
+        loop = asyncio.get_running_loop()
+        if self.anchor is None:
+            self.anchor = loop.time()
+        self.stats = ScheduleStats()
+        telemetry = self.telemetry
+        frames = iter(frames)
+        index = -1
+
+        while True:
+            # Frames are computed lazily, so pulling the next one is the analysis time
+            pulled_at = time.perf_counter()
+            commands = next(frames, None)
+            if commands is None:
+                break
+            analysis = time.perf_counter() - pulled_at
+            index += 1
+            self.stats.frames += 1
+            if self.clock is not None:
+                self.anchor = self.clock.anchor()
+            t_frame = self.anchor + index * self.frame_interval
+            if loop.time() > t_frame + self.frame_interval:
+                self.stats.skipped_frames += 1
+                if telemetry is not None:
+                    telemetry.count("skipped_frames")
+                continue
+
+            timed = sorted(
+                ((t_frame - self.latency.estimate(bulb), i, bulb, pilot)
+                 for i, (bulb, pilot) in enumerate(commands)),
+                key=lambda c: c[:2],
+            )
+            dispatch = 0.0
+            overshoot = 0.0
+            missed = 0
+            for due, _, bulb, pilot in timed:
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                dispatch_start = time.perf_counter()
+                if bulb.ip in self.in_flight:
+                    self.stats.missed_deadlines += 1
+                    missed += 1
+                    continue
+                drift = loop.time() - due
+                overshoot = max(overshoot, drift)
+                self.stats.commands += 1
+                self.stats.drifts.append(drift)
+                self.in_flight[bulb.ip] = asyncio.create_task(self._send(bulb, pilot, index))
+                dispatch += time.perf_counter() - dispatch_start
+
+            if telemetry is not None:
+                telemetry.count("frames")
+                telemetry.count("commands", len(timed) - missed)
+                telemetry.count("missed_deadlines", missed)
+                telemetry.frame(index, analysis, dispatch, overshoot=overshoot)
+
+        # Hold until the last frame has played out, then let outstanding commands finish
+        end = self.anchor + (index + 1) * self.frame_interval
+        if end > loop.time():
+            await asyncio.sleep(end - loop.time())
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight.values())
+
+        return self.stats.report()
@@ -0,0 +1,206 @@
+import asyncio
+import ipaddress
+import math
+import os
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+DEFAULT_SHARDS = os.cpu_count() or 1
+SHARD_PREFIX = 24  # bulbs in the same /24 (usually one VLAN) go to the same shard
+SHARD_START_LEAD = 0.5  # seconds between submitting a song and its first frame, for the workers to prepare
+ANCHOR_SYNC_INTERVAL = 0.02  # seconds between copies of the audio clock into shared memory, and between stop checks
+STOP_TIMEOUT = 1.0  # seconds a stopped show waits for its shards to notice, before the bulbs are turned off
+
+
+def shard_by_subnet(numbered, shards=DEFAULT_SHARDS, prefix=SHARD_PREFIX):
+    """
+    Split [(number, ip)] into at most `shards` lists, keeping each subnet together
+    when possible; subnets larger than an even share are split across shards.
+    """
+    subnets = defaultdict(list)
+    for number, ip in numbered:
+        subnets[ipaddress.ip_network(f"{ip}/{prefix}", strict=False)].append((number, ip))
+    share = max(1, math.ceil(len(numbered) / max(1, shards)))
+    groups = []
+    for subnet in sorted(subnets):
+        members = subnets[subnet]
+        groups.extend(members[i:i + share] for i in range(0, len(members), share))
+
+    # More groups than shards (many small subnets): fold the smallest into the emptiest shards
+    groups.sort(key=len, reverse=True)
+    result = groups[:shards]
+    for group in groups[shards:]:
+        min(result, key=len).extend(group)
+    return result
+
+
+class SharedAnchor:
+    """
+    The show's anchor (time.monotonic() of frame 0) and a stop flag in a memory-mapped file.
+
+    The coordinator writes the anchor from the audio clock; every shard maps the same file and
+    reads it once per frame like any other clock, so all processes follow the same audio
+    position. The monotonic clock is system-wide, so the value means the same moment in
+    every process. stop() tells every shard to end its show early.
+    """
+
+    def __init__(self, path=None):
+        self.owner = path is None
+        if self.owner:
+            fd, path = tempfile.mkstemp(prefix="light_wiz-", suffix=".anchor")
+            os.close(fd)
+        self.path = path
+        self.value = np.memmap(path, dtype=np.float64, mode="w+" if self.owner else "r", shape=(2,))
+
+    def set(self, anchor):
+        self.value[0] = anchor
+
+    def anchor(self):
+        return float(self.value[0])
+
+    def stop(self):
+        self.value[1] = 1.0
+
+    def stopped(self):
+        return bool(self.value[1])
+
+    def close(self):
+        self.value = None
+        if self.owner:
+            os.remove(self.path)
+
+
+def run_shard(job):
+    """
+    Worker entry point: play one shard's columns of a cue file on its own event loop and socket.
+    Runs in a separate process; only the small job and result dicts are pickled.
+    """
+    return asyncio.run(_run_shard(job))
+
+
+async def _run_shard(job):
+    # Imported in the worker, so the coordinator's pickled job stays small
+    from utils.bulb_registry import BulbRegistry
+    from utils.show_timeline import TimelinePlayer, load_timeline
+    from utils.telemetry import Telemetry
+    from utils.udp_transport import UdpBulb, UdpTransport
+
+    cues, frame_interval, columns = load_timeline(job["cue_path"])
+    mapping = dict(job["bulbs"])
+    addrs = job.get("addrs", {})
+    indexes = [i for i, number in enumerate(columns) if number in mapping]
+    transport = await UdpTransport().open()
+    anchor = SharedAnchor(job["anchor"])
+    try:
+        # Replayed and simulated bulbs keep their recorded IPs but listen on other addresses
+        registry = BulbRegistry([UdpBulb(transport, ip, addr=addrs.get(ip)) for ip in mapping.values()],
+                                mapping=mapping)
+        telemetry = Telemetry(f"shard{job['shard']}")
+        player = TimelinePlayer(transport, cues[:, indexes], frame_interval, [columns[i] for i in indexes],
+                                registry, telemetry=telemetry).prepare()
+        player.lock_to(anchor)
+        show = asyncio.create_task(player.run())
+        while not show.done():
+            if anchor.stopped():
+                show.cancel()
+            await asyncio.wait({show}, timeout=ANCHOR_SYNC_INTERVAL)
+        stats = dict(player.stats, stopped=show.cancelled())
+    finally:
+        anchor.close()
+        transport.close()
+
+    frames = telemetry.frames()
+    dispatch = frames["dispatch"][~np.isnan(frames["dispatch"])]
+    late = frames["overshoot"][~np.isnan(frames["overshoot"])]
+    return {
+        "shard": job["shard"],
+        "pid": os.getpid(),
+        "bulbs": len(mapping),
+        **stats,
+        "dispatch_p50": float(np.percentile(dispatch, 50)) if len(dispatch) else 0.0,
+        "dispatch_max": float(dispatch.max()) if len(dispatch) else 0.0,
+        "late_p95": float(np.percentile(late, 95)) if len(late) else 0.0,
+        "transport": transport.counters(),
+    }
+
+
+def _warm_up():
+    # Import the worker's modules ahead of the first song
+    import utils.show_timeline  # noqa: F401
+    import utils.telemetry  # noqa: F401
+    return os.getpid()
+
+
+class ShardCoordinator:
+    """
+    Plays cue files across worker processes, one shard of bulbs per process.
+
+    Each worker has its own event loop and UDP socket and memory-maps the cue file,
+    so the precomputed frames are shared through the page cache and only the shard's
+    bulb list and the shared anchor's path are sent to it. All shards start from the
+    same anchor, which follow() keeps copying from the audio clock.
+    """
+
+    def __init__(self, shards, addrs=None):
+        self.shards = [list(shard) for shard in shards if shard]
+        self.addrs = addrs or {}  # ip -> (host, port) for bulbs that do not listen on their own IP
+        self.executor = ProcessPoolExecutor(max_workers=max(1, len(self.shards)))
+        for _ in self.shards:
+            self.executor.submit(_warm_up)
+
+    async def play(self, cue_path, start_time, clock_task=None):
+        """
+        Run every shard of cue_path with frame 0 at start_time (loop.time() clock).
+        clock_task, if given, resolves to the AudioPlayback to follow once music starts.
+        Returns the per-shard reports.
+        """
+        loop = asyncio.get_running_loop()
+        anchor = SharedAnchor()
+        anchor.set(start_time)
+        jobs = []
+        try:
+            jobs = [
+                self.executor.submit(run_shard, {
+                    "shard": index, "bulbs": shard, "cue_path": cue_path, "anchor": anchor.path,
+                    "addrs": {ip: self.addrs[ip] for _, ip in shard if ip in self.addrs},
+                })
+                for index, shard in enumerate(self.shards)
+            ]
+            done = asyncio.gather(*(asyncio.wrap_future(job) for job in jobs))
+            if clock_task is not None:
+                follower = asyncio.create_task(self._follow(anchor, clock_task, done))
+            try:
+                return await done
+            finally:
+                if clock_task is not None:
+                    follower.cancel()
+        finally:
+            # Cancelling the futures cannot stop shards that are already playing; the flag does.
+            # After a normal finish every shard has returned and it changes nothing.
+            anchor.stop()
+            running = [job for job in jobs if not job.done()]
+            if running:
+                # so nothing is sent after the caller turns the bulbs off
+                await loop.run_in_executor(None, wait, running, STOP_TIMEOUT)
+            anchor.close()
+
+    async def _follow(self, anchor, clock_task, done):
+        clock = await clock_task
+        while not done.done():
+            anchor.set(clock.anchor())
+            await asyncio.sleep(ANCHOR_SYNC_INTERVAL)
+
+    def close(self):
+        """Drop queued jobs without waiting; shards still playing stop at their next check of the stop flag."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def print_shard_report(reports):
+    for report in reports:
+        print(f"Shard {report['shard']} (pid {report['pid']}): {report['bulbs']} bulbs, "
+              f"{report['frames']} frames ({report['skipped_frames']} skipped), {report['packets']} packets, "
+              f"dispatch p50 {report['dispatch_p50'] * 1000:.2f} ms / max {report['dispatch_max'] * 1000:.2f} ms, "
+              f"late p95 {report['late_p95'] * 1000:.2f} ms")
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import time
+import numpy as np
+
+from utils.constants import ip_mapping
+from utils.udp_transport import PORT
+
+CUES_DIR = "./cues"
+CUE_LEAD = 0.23  # seconds a frame's packets are sent ahead of its time, to cover bulb latency
+
+# Cue states
+CUE_UNSET = 0  # nothing sent to this bulb yet
+CUE_OFF = 1
+CUE_ON = 2
+
+# Which optional setPilot params a cue carries
+FIELD_BITS = {"r": 1, "g": 2, "b": 4, "c": 8, "w": 16, "dimming": 32}
+
+CUE_DTYPE = np.dtype([
+    ("state", "u1"),
+    ("fields", "u1"),
+    ("r", "u1"),
+    ("g", "u1"),
+    ("b", "u1"),
+    ("c", "u1"),
+    ("w", "u1"),
+    ("dimming", "u1"),
+    ("changed", "?"),
+])
+
+
+def cue_columns(mapping=ip_mapping):
+    """Bulb numbers in column order; the cue file addresses bulbs by number, not by object."""
+    return sorted(mapping)
+
+
+class CueSlot:
+    """Stand-in bulb used while rendering, so the show logic fills a column instead of sending."""
+
+    def __init__(self, ip, column):
+        self.ip = ip
+        self.mac = None
+        self.column = column
+
+
+def cue_slots(mapping=ip_mapping):
+    return [CueSlot(mapping[number], column) for column, number in enumerate(cue_columns(mapping))]
+
+
+def write_cue(cell, pilot):
+    """Fill one cue cell from a PilotBuilder (None turns the bulb off)."""
+    params = {} if pilot is None else pilot.pilot_params
+    fields = 0
+    for key, bit in FIELD_BITS.items():
+        cell[key] = params.get(key, 0)
+        if key in params:
+            fields |= bit
+    cell["fields"] = fields
+    cell["state"] = CUE_OFF if pilot is None else CUE_ON
+
+
+def cue_params(cell):
+    """setPilot params for one cue cell."""
+    if cell["state"] == CUE_OFF:
+        return {"state": False}
+    params = {"state": True}
+    for key, bit in FIELD_BITS.items():
+        if cell["fields"] & bit:
+            params[key] = int(cell[key])
+    return params
+
+
+def render_timeline(frames, num_columns, refresh_frames=0):
+    """
+    Build the (frames, bulbs) cue matrix from an iterable of per-frame [(CueSlot, pilot)] commands.
+    Bulbs without a command keep their previous state, so every cell holds the full state.
+    changed marks cells that differ from the previous frame, plus every refresh_frames-th
+    frame for bulbs that are set, to recover from lost packets during playback.
+    """
+    frames = list(frames)
+    cues = np.zeros((len(frames), num_columns), dtype=CUE_DTYPE)
+
+    for index, commands in enumerate(frames):
+        if index:
+            cues[index] = cues[index - 1]
+        for slot, pilot in commands:
+            write_cue(cues[index, slot.column], pilot)
+
+    state_fields = [name for name in CUE_DTYPE.names if name != "changed"]
+    if len(cues):
+        previous = np.zeros(num_columns, dtype=CUE_DTYPE)
+        for name in state_fields:
+            cues["changed"][0] |= cues[name][0] != previous[name]
+        for name in state_fields:
+            cues["changed"][1:] |= cues[name][1:] != cues[name][:-1]
+        if refresh_frames:
+            cues["changed"][::refresh_frames] |= cues["state"][::refresh_frames] != CUE_UNSET
+    return cues
+
+
+def cue_path(song_path, cues_dir=CUES_DIR):
+    name = os.path.splitext(os.path.basename(song_path))[0]
+    return os.path.join(cues_dir, name + ".cues.npy")
+
+
+def save_timeline(path, cues, frame_interval, columns):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.save(path, cues)
+    with open(path + ".json", "w") as f:
+        json.dump({"frame_interval": frame_interval, "columns": columns}, f)
+
+
+def load_timeline(path):
+    """Returns (cues, frame_interval, columns); cues is a read-only memory map."""
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    return np.load(path, mmap_mode="r"), meta["frame_interval"], meta["columns"]
+
+
+class TimelinePlayer:
+    """
+    Walks a cue matrix and emits packets for changed cells, nothing else.
+
+    All payloads and per-frame send lists are resolved in prepare(), before the show,
+    so the playback loop only sleeps, indexes lists and writes datagrams.
+    """
+
+    def __init__(self, transport, cues, frame_interval, columns, registry, lead=CUE_LEAD, telemetry=None):
+        self.transport = transport
+        self.telemetry = telemetry
+        self.cues = cues
+        self.frame_interval = frame_interval
+        self.lead = lead
+        self.anchor = None
+        self.clock = None
+        self.addrs = []
+        for number in columns:
+            bulb = registry.by_number(number)
+            self.addrs.append(None if bulb is None else getattr(bulb, "addr", (bulb.ip, PORT)))
+        self.frames = []
+        self.stats = {"frames": 0, "skipped_frames": 0, "packets": 0}
+
+    def anchor_at(self, anchor):
+        self.anchor = anchor
+
+    def lock_to(self, clock):
+        """Follow an AudioPlayback's position instead of a fixed anchor, like FrameScheduler.lock_to."""
+        self.clock = clock
+        self.anchor = clock.anchor()
+
+    def prepare(self):
+        payloads = self.transport.payloads
+        tails = {}
+        frames = []
+        for row in self.cues:
+            batch = []
+            for column in np.flatnonzero(row["changed"] & (row["state"] != CUE_UNSET)):
+                addr = self.addrs[column]
+                if addr is None:
+                    continue
+                cell = row[column]
+                key = cell.tobytes()[:-1]  # every field but the changed flag
+                tail = tails.get(key)
+                if tail is None:
+                    tail = payloads.tail(tuple(sorted(cue_params(cell).items())))
+                    tails[key] = tail
+                batch.append((addr, tail))
+            frames.append(batch)
+        self.frames = frames
+        return self
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if self.anchor is None:
+            self.anchor = loop.time()
+        pending = []  # changes of skipped frames, sent with the next frame that makes it
+
+        for index, batch in enumerate(self.frames):
+            if self.clock is not None:
+                self.anchor = self.clock.anchor()
+            t_frame = self.anchor + index * self.frame_interval
+            due = t_frame - self.lead
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.stats["frames"] += 1
+            if loop.time() > t_frame + self.frame_interval:
+                self.stats["skipped_frames"] += 1
+                if self.telemetry is not None:
+                    self.telemetry.count("skipped_frames")
+                pending.extend(batch)
+                continue
+            dispatch_start = time.perf_counter()
+            if pending:
+                latest = dict(pending)
+                latest.update(batch)
+                batch = list(latest.items())
+                pending = []
+            self.transport.send_frame(batch)
+            self.stats["packets"] += len(batch)
+            self.transport.expire()
+            if self.telemetry is not None:
+                self.telemetry.count("frames")
+                self.telemetry.count("packets", len(batch))
+                self.telemetry.frame(index, dispatch=time.perf_counter() - dispatch_start,
+                                     overshoot=loop.time() - due)
+
+        end = self.anchor + len(self.frames) * self.frame_interval
+        if end > loop.time():
+            await asyncio.sleep(end - loop.time())
+        self.transport.expire()
+        return self.stats
@@ -0,0 +1,55 @@
+import time
+
+
+class StartupTimer:
+    """
+    Wall time of each startup phase, from the entry point to the show being ready to play.
+
+    Disabled unless an entry point calls start(), so the marks placed in discovery and
+    the shows' setup cost one attribute check in scripts run on their own. Each phase is
+    the time since the previous mark. Shows call ready() at the end of their setup, so
+    nothing is printed once frames are going out.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.marks = []
+        self.reported = False
+
+    def start(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+        self.reported = False
+
+    def mark(self, phase):
+        if self.started is not None:
+            self.marks.append((phase, time.perf_counter()))
+
+    def mark_once(self, phase):
+        if self.started is not None and all(name != phase for name, _ in self.marks):
+            self.mark(phase)
+
+    def ready(self):
+        """Mark the end of a show's setup and print the report."""
+        self.mark_once("ready")
+        self.report()
+
+    def phases(self):
+        previous = self.started
+        phases = []
+        for name, at in self.marks:
+            phases.append((name, at - previous))
+            previous = at
+        return phases
+
+    def report(self):
+        if self.started is None or self.reported:
+            return
+        self.reported = True
+        phases = self.phases()
+        breakdown = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in phases)
+        total = sum(seconds for _, seconds in phases)
+        print(f"Startup: {breakdown} (total {total * 1000:.0f} ms)")
+
+
+STARTUP = StartupTimer()
@@ -0,0 +1,209 @@
+import asyncio
+import csv
+import json
+import math
+import os
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+
+TELEMETRY_DIR = "./telemetry"
+RING_SIZE = 8192  # per-frame records kept, the oldest are overwritten
+SERVE_METRICS = False  # expose a Prometheus text endpoint while a show runs
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)  # seconds
+
+FRAME_FIELDS = ("analysis", "dispatch", "ack", "overshoot")
+FRAME_COLUMNS = [("frame", "q"), ("time", "d")] + [(field, "d") for field in FRAME_FIELDS]  # name, array typecode
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+def summarize(values, buckets=LATENCY_BUCKETS):
+    """Histogram summary (count, mean, p50/p95/p99) of values collected elsewhere, e.g. by a benchmark."""
+    histogram = Histogram(buckets)
+    for value in values:
+        histogram.observe(value)
+    return histogram.summary()
+
+
+class Telemetry:
+    """
+    Counters, latency histograms and a ring buffer of per-frame timings for one entry point.
+
+    Recording is a few attribute updates and one slot write per column of the ring
+    (stdlib arrays, so shows that never touch numpy do not import it), with nothing
+    printed or written to disk until finish(), so it can stay on during a real show.
+    Per-frame fields are seconds: analysis (computing the frame), dispatch (issuing its
+    commands), ack (slowest acknowledgement) and overshoot (how late the loop woke up).
+    """
+
+    def __init__(self, name, ring_size=RING_SIZE):
+        self.name = name
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+        self.ring_size = ring_size
+        self.ring = {name: array(typecode, [-1 if name == "frame" else math.nan]) * ring_size
+                     for name, typecode in FRAME_COLUMNS}
+        self.recorded = 0
+        self.server = None
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def frame(self, frame, analysis=math.nan, dispatch=math.nan, ack=math.nan, overshoot=math.nan):
+        """Record one frame's timings; fields that do not apply stay NaN."""
+        slot = self.recorded % self.ring_size
+        ring = self.ring
+        ring["frame"][slot] = frame
+        ring["time"][slot] = time.monotonic()
+        ring["analysis"][slot] = analysis
+        ring["dispatch"][slot] = dispatch
+        ring["ack"][slot] = ack
+        ring["overshoot"][slot] = overshoot
+        self.recorded += 1
+        if overshoot == overshoot:  # not NaN
+            self.histograms["overshoot"].observe(max(overshoot, 0.0))
+
+    def frame_ack(self, frame, ack):
+        """Fold a late-arriving acknowledgement into its frame's record, if it is still recent."""
+        self.histograms["ack"].observe(ack)
+        frames, acks = self.ring["frame"], self.ring["ack"]
+        for index in range(self.recorded - 1, max(-1, self.recorded - 65), -1):
+            slot = index % self.ring_size
+            if frames[slot] == frame:
+                if not acks[slot] >= ack:  # also replaces NaN
+                    acks[slot] = ack
+                return
+
+    def frames(self):
+        """The recorded frames, oldest first, as a numpy structured array with one field per column."""
+        import numpy as np
+
+        count = min(self.recorded, self.ring_size)
+        split = self.recorded % self.ring_size if self.recorded > self.ring_size else 0
+        frames = np.empty(count, dtype=FRAME_COLUMNS)
+        for name, typecode in FRAME_COLUMNS:
+            column = np.frombuffer(self.ring[name], dtype=typecode)
+            frames[name] = np.concatenate([column[split:count], column[:split]])
+        return frames
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "started": self.started,
+            "counters": dict(self.counters),
+            "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()},
+        }
+
+    def _path(self, extension):
+        os.makedirs(TELEMETRY_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        return os.path.join(TELEMETRY_DIR, f"{self.name}-{stamp}.{extension}")
+
+    def export_json(self, path=None):
+        path = path or self._path("json")
+        frames = self.frames()
+        trace = self.summary()
+        trace["frames"] = {
+            field: [None if value != value else value for value in frames[field].tolist()]
+            for field, _ in FRAME_COLUMNS
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
+        return path
+
+    def export_csv(self, path=None):
+        path = path or self._path("csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([name for name, _ in FRAME_COLUMNS])
+            writer.writerows(self.frames().tolist())
+        return path
+
+    def prometheus_text(self):
+        prefix = "light_wiz_"
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}{name}_total counter")
+            lines.append(f'{prefix}{name}_total{{show="{self.name}"}} {value}')
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{prefix}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{show="{self.name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{show="{self.name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{show="{self.name}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{show="{self.name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    async def _handle_http(self, reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = self.prometheus_text().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, serve=SERVE_METRICS, host=METRICS_HOST, port=METRICS_PORT):
+        """Optionally serve the Prometheus text format on http://host:port/ while the show runs."""
+        if serve:
+            self.server = await asyncio.start_server(self._handle_http, host, port)
+            print(f"Metrics at http://{host}:{port}/metrics")
+        return self
+
+    def finish(self):
+        """Stop the endpoint and write the JSON and CSV traces. Returns their paths."""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        paths = self.export_json(), self.export_csv()
+        print(f"Telemetry written to {paths[0]} and {paths[1]}")
+        return paths
@@ -0,0 +1,163 @@
+import json
+import math
+import os
+import time
+
+from utils.bulb_state import OFF_STATE
+from utils.constants import ip_mapping
+
+TRAFFIC_FIELDS = [("sent", "<f8"), ("bulb", "<u2"), ("payload", "<u4"), ("rtt", "<f4")]  # numpy dtype spec
+INITIAL_RECORDS = 65536  # the record array doubles from here as a show goes on
+
+
+def traffic_path(path):
+    """Logs are <path>.npy with a <path>.npy.json index; the .npy may be left out."""
+    return path if path.endswith(".npy") else path + ".npy"
+
+
+def save_traffic(path, records, meta):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.save(path, records)
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f)
+
+
+def load_traffic(path):
+    """Returns (records, meta) of a log written by TrafficRecorder.save(); records is a read-only memory map."""
+    import numpy as np
+
+    path = traffic_path(path)
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    return np.load(path, mmap_mode="r"), meta
+
+
+def _ack_time(future):
+    if future.cancelled() or future.exception() is not None:
+        return math.nan
+    return future.result()
+
+
+class TrafficRecorder:
+    """
+    Log of every command sent to a bulb: when it left, which bulb, which payload and
+    how long the acknowledgement took (NaN when none came).
+
+    Disabled unless an entry point calls start(), so the hooks in UdpTransport.send and
+    find_light_bulbs cost one attribute check otherwise; numpy is only imported once
+    recording starts, to keep it out of every show's startup. A record is 18 bytes in a
+    numpy array; bulb IPs and payloads are interned and stored once in the JSON index, in the
+    same layout as the cue files (<path>.npy next to <path>.json).
+    """
+
+    def __init__(self):
+        self.path = None
+        self.aliases = {}  # local endpoint -> the bulb IP it stands in for, set by a replay
+
+    @property
+    def active(self):
+        return self.path is not None
+
+    def start(self, path):
+        import numpy as np
+
+        self.path = traffic_path(path)
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.records = np.zeros(INITIAL_RECORDS, dtype=TRAFFIC_FIELDS)
+        self.count = 0
+        self.bulbs = {}  # destination IP -> index
+        self.payloads = {}  # payload tail -> index
+        self.macs = {}
+
+    def alias(self, address, ip):
+        self.aliases[address] = ip
+
+    def record(self, ip, tail, sent_at, rtt):
+        """sent_at is a time.perf_counter() reading, rtt seconds or NaN."""
+        if self.count == len(self.records):
+            import numpy as np
+
+            grown = np.zeros(2 * len(self.records), dtype=TRAFFIC_FIELDS)
+            grown[:self.count] = self.records
+            self.records = grown
+        bulb = self.bulbs.setdefault(ip, len(self.bulbs))
+        payload = self.payloads.setdefault(tail, len(self.payloads))
+        self.records[self.count] = (sent_at - self.started, bulb, payload, rtt)
+        self.count += 1
+
+    def watch(self, ip, tail, sent_at, future):
+        """Record a UdpTransport send once its acknowledgement future resolves, times out or is cancelled."""
+        future.add_done_callback(lambda done: self.record(ip, tail, sent_at, _ack_time(done)))
+
+    def wrap(self, bulbs):
+        """RecordingBulb wrappers while recording, the bulbs themselves otherwise."""
+        if not self.active:
+            return bulbs
+        from utils.udp_transport import PayloadCache
+
+        payloads = PayloadCache()
+        for bulb in bulbs:
+            self.bulbs.setdefault(bulb.ip, len(self.bulbs))  # logged even if the show never addresses it
+            if getattr(bulb, "mac", None):
+                self.macs[bulb.ip] = bulb.mac
+        return [RecordingBulb(bulb, self, payloads) for bulb in bulbs]
+
+    def save(self):
+        """Write the log sorted by send time and stop recording. Returns its path."""
+        import numpy as np
+
+        records = self.records[:self.count]
+        records = records[np.argsort(records["sent"], kind="stable")]
+        ips = [self.aliases.get(address, address) for address in self.bulbs]
+        numbers = {ip: number for number, ip in ip_mapping.items()}
+        save_traffic(self.path, records, {
+            "started": self.wall_started,
+            "ips": ips,
+            "macs": [self.macs.get(ip) for ip in ips],
+            "numbers": [numbers.get(ip) for ip in ips],
+            "payloads": [tail.decode() for tail in self.payloads],
+        })
+        path, self.path = self.path, None
+        print(f"Traffic log written to {path}: {len(records)} commands to {len(ips)} bulbs")
+        return path
+
+
+class RecordingBulb:
+    """
+    Drop-in wrapper that records each turn_on/turn_off of a pywizlight bulb, from the
+    call to its return, with the same payload encoding as UdpTransport uses.
+    Any other attribute is passed through to the wrapped bulb.
+    """
+
+    def __init__(self, bulb, recorder, payloads):
+        self.bulb = bulb
+        self.recorder = recorder
+        self.payloads = payloads
+
+    def __getattr__(self, name):
+        return getattr(self.bulb, name)
+
+    def __repr__(self):
+        return f"<RecordingBulb {self.bulb.ip}>"
+
+    async def _timed(self, tail, send):
+        start = time.perf_counter()
+        try:
+            result = await send()
+        except BaseException:
+            self.recorder.record(self.bulb.ip, tail, start, math.nan)
+            raise
+        self.recorder.record(self.bulb.ip, tail, start, time.perf_counter() - start)
+        return result
+
+    async def turn_on(self, pilot):
+        return await self._timed(self.payloads.pilot_tail(pilot), lambda: self.bulb.turn_on(pilot))
+
+    async def turn_off(self):
+        return await self._timed(self.payloads.tail(OFF_STATE), self.bulb.turn_off)
+
+
+RECORDER = TrafficRecorder()
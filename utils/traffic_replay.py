@@ -0,0 +1,97 @@
+import asyncio
+import json
+import math
+
+import numpy as np
+
+from utils.bulb_simulator import DEFAULT_LATENCY, SIMULATOR_HOST_PREFIX, SimulatedBulb
+from utils.traffic_log import RECORDER, load_traffic
+from utils.udp_transport import PORT, UdpBulb, UdpTransport
+
+
+class ReplayBulb(SimulatedBulb):
+    """
+    SimulatedBulb that acknowledges setPilot with the round-trip times of a recording,
+    in the recorded order, and drops the commands that went unanswered in it.
+    Once the recording is used up it starts over. Other requests are answered after
+    the recording's median round-trip.
+    """
+
+    def __init__(self, ip, mac, rtts):
+        answered = [rtt for rtt in rtts if not math.isnan(rtt)]
+        super().__init__(ip, mac, latency=float(np.median(answered)) if answered else DEFAULT_LATENCY, jitter=0.0)
+        self.rtts = rtts
+        self.replayed = 0
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return
+        delay = self.latency
+        if request.get("method") in ("setPilot", "setState") and self.rtts:
+            delay = self.rtts[self.replayed % len(self.rtts)]
+            self.replayed += 1
+            if math.isnan(delay):
+                self.dropped += 1
+                return
+        asyncio.get_running_loop().call_later(delay, self._respond, request, addr)
+
+
+class ReplayRig:
+    """
+    The bulbs of a traffic log, served from loopback endpoints with their recorded timings.
+
+    bulbs() returns UdpBulbs that keep the recorded IPs and MACs, so ip_mapping, the
+    registry and the shows address them exactly as on the real rig, while the datagrams
+    go to bulb i's ReplayBulb on 127.0.1.<i + 1>. Runs of the same show against the same
+    log see the same acknowledgement times and losses, so their traffic logs and
+    telemetry traces can be compared from one version to the next.
+    """
+
+    def __init__(self, path, host_prefix=SIMULATOR_HOST_PREFIX, port=PORT):
+        self.path = path
+        self.host_prefix = host_prefix
+        self.port = port
+        self.ips = []  # recorded IP of each replayed bulb
+        self.replayed = []
+        self.endpoints = []
+        self.transport = None
+
+    async def start(self):
+        records, meta = load_traffic(self.path)
+        loop = asyncio.get_running_loop()
+        for index, (ip, mac) in enumerate(zip(meta["ips"], meta["macs"])):
+            local = f"{self.host_prefix}{index + 1}"
+            rtts = records["rtt"][records["bulb"] == index].astype(float).tolist()
+            bulb = ReplayBulb(local, mac or f"a8bb50{index:06x}", rtts)
+            transport, _ = await loop.create_datagram_endpoint(lambda b=bulb: b, local_addr=(local, self.port))
+            self.ips.append(ip)
+            self.replayed.append(bulb)
+            self.endpoints.append(transport)
+            RECORDER.alias(local, ip)
+        self.transport = await UdpTransport().open()
+        print(f"Replaying {len(records)} commands to {len(self.replayed)} bulbs from {self.path}")
+        return self
+
+    async def bulbs(self):
+        """UdpBulbs for the recorded bulbs; starts the endpoints on first use, in the show's event loop."""
+        if self.transport is None:
+            await self.start()
+        return [UdpBulb(self.transport, ip, mac=bulb.mac, addr=(bulb.ip, self.port))
+                for ip, bulb in zip(self.ips, self.replayed)]
+
+    def counters(self):
+        return {
+            "received": sum(bulb.received for bulb in self.replayed),
+            "dropped": sum(bulb.dropped for bulb in self.replayed),
+        }
+
+    def close(self):
+        for transport in self.endpoints:
+            transport.close()
+        self.endpoints = []
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+from utils.bulb_state import OFF_STATE, pilot_state
+from utils.traffic_log import RECORDER
+
+PORT = 38899  # WiZ bulbs listen for JSON commands on this UDP port
+ACK_TIMEOUT = 0.5  # seconds to wait for an acknowledgement, no retries
+PROBE_TAIL = b'"method":"getPilot","params":{}}'  # payload tail of UdpBulb.probe()
+
+
+class PayloadCache:
+    """
+    Pre-encoded setPilot payload tails, one per distinct state.
+    A datagram is b'{"id":<seq>,' + tail, so only the sequence number is encoded per packet.
+    """
+
+    def __init__(self):
+        self.tails = {}
+
+    def tail(self, state):
+        tail = self.tails.get(state)
+        if tail is None:
+            body = json.dumps({"method": "setPilot", "params": dict(state)}, separators=(",", ":"))
+            tail = body[1:].encode()
+            self.tails[state] = tail
+        return tail
+
+    def pilot_tail(self, pilot):
+        return self.tail(pilot_state(pilot))
+
+
+class _AckProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transport):
+        self.owner = transport
+
+    def datagram_received(self, data, addr):
+        self.owner._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        self.owner.errors += 1
+
+
+class UdpTransport:
+    """
+    One shared non-blocking UDP socket for every bulb.
+
+    send() writes a datagram immediately and returns a future for its acknowledgement;
+    send_frame() writes a whole frame back-to-back without yielding to the event loop.
+    Acknowledgements are matched by the echoed "id" when the bulb includes it,
+    otherwise to the oldest outstanding request for that address.
+    """
+
+    def __init__(self, ack_timeout=ACK_TIMEOUT):
+        self.ack_timeout = ack_timeout
+        self.payloads = PayloadCache()
+        self.transport = None
+        self.sequence = itertools.count(1)
+        self.pending = {}
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def open(self, local_addr=("0.0.0.0", 0)):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _AckProtocol(self), local_addr=local_addr
+        )
+        return self
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        for queue in self.pending.values():
+            for _, _, future in queue:
+                if not future.done():
+                    future.cancel()
+        self.pending.clear()
+
+    def send(self, addr, tail, record=True):
+        """
+        Send one pre-encoded payload tail to addr=(ip, port); returns the ack future.
+        The future resolves to the round-trip time in seconds. record=False keeps the
+        datagram out of the traffic log, for requests a replay should not answer.
+        """
+        seq = next(self.sequence)
+        future = asyncio.get_running_loop().create_future()
+        sent_at = time.perf_counter()
+        self.pending.setdefault(addr, deque()).append((seq, sent_at, future))
+        self.transport.sendto(b'{"id":%d,' % seq + tail, addr)
+        self.sent += 1
+        if record and RECORDER.active:
+            RECORDER.watch(addr[0], tail, sent_at, future)
+        return future
+
+    def send_frame(self, commands):
+        """
+        commands: list of (addr, tail). All datagrams leave in one pass; returns the ack futures.
+        """
+        return [self.send(addr, tail) for addr, tail in commands]
+
+    def _on_datagram(self, data, addr):
+        queue = self.pending.get(addr)
+        if not queue:
+            return
+        try:
+            response = json.loads(data)
+        except ValueError:
+            self.errors += 1
+            return
+
+        seq = response.get("id")
+        entry = None
+        if isinstance(seq, int):
+            for item in queue:
+                if item[0] == seq:
+                    entry = item
+                    queue.remove(item)
+                    break
+        if entry is None:
+            entry = queue.popleft()
+
+        _, sent_at, future = entry
+        if future.done():
+            return
+        if "error" in response:
+            self.errors += 1
+            future.set_exception(ConnectionError(f"Error received from {addr[0]}: {response['error']}"))
+        else:
+            self.acked += 1
+            future.set_result(time.perf_counter() - sent_at)
+
+    async def wait_ack(self, addr, future):
+        try:
+            return await asyncio.wait_for(future, self.ack_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            queue = self.pending.get(addr)
+            if queue:
+                for item in queue:
+                    if item[2] is future:
+                        queue.remove(item)
+                        break
+            raise
+
+    def expire(self):
+        """
+        Drop outstanding requests older than ack_timeout, for callers that fire and forget.
+        """
+        deadline = time.perf_counter() - self.ack_timeout
+        for queue in self.pending.values():
+            while queue and queue[0][1] < deadline:
+                _, _, future = queue.popleft()
+                if not future.done():
+                    future.cancel()
+                    self.timeouts += 1
+
+    def counters(self):
+        return {"sent": self.sent, "acked": self.acked, "timeouts": self.timeouts, "errors": self.errors}
+
+    def wrap(self, bulbs, port=PORT):
+        """
+        UdpBulb stand-ins for discovered wizlight objects, keeping ip and mac
+        (and the address of bulbs that already are UdpBulbs, e.g. replayed ones).
+        """
+        return [UdpBulb(self, bulb.ip, port, getattr(bulb, "mac", None), getattr(bulb, "addr", None))
+                for bulb in bulbs]
+
+
+class UdpBulb:
+    """
+    Minimal wizlight replacement on top of a shared UdpTransport, so the existing show
+    functions and wrappers (TrackedBulb, FrameScheduler) work unchanged.
+    turn_on/turn_off send immediately and wait for the acknowledgement without retries,
+    and return its round trip in seconds as measured by the transport.
+    """
+
+    def __init__(self, transport, ip, port=PORT, mac=None, addr=None):
+        self.transport = transport
+        self.ip = ip
+        self.mac = mac
+        self.addr = addr or (ip, port)  # a replay points the bulb's IP at a local endpoint
+
+    def __repr__(self):
+        return f"<UdpBulb {self.ip}>"
+
+    async def turn_on(self, pilot):
+        future = self.transport.send(self.addr, self.transport.payloads.pilot_tail(pilot))
+        return await self.transport.wait_ack(self.addr, future)
+
+    async def turn_off(self):
+        future = self.transport.send(self.addr, self.transport.payloads.tail(OFF_STATE))
+        return await self.transport.wait_ack(self.addr, future)
+
+    async def probe(self):
+        """Ask for the pilot at the bulb's own address; returns the round trip, raises if unanswered."""
+        future = self.transport.send(self.addr, PROBE_TAIL, record=False)
+        return await self.transport.wait_ack(self.addr, future)
+
+
+async def send_frame_commands(transport, commands):
+    """
+    Dispatch [(UdpBulb, PilotBuilder or None)] as one back-to-back burst and wait for all acks.
+    Returns the number of commands that were acknowledged in time.
+    """
+    payloads = transport.payloads
+    batch = [
+        (bulb.addr, payloads.tail(OFF_STATE) if pilot is None else payloads.pilot_tail(pilot))
+        for bulb, pilot in commands
+    ]
+    futures = transport.send_frame(batch)
+    results = await asyncio.gather(
+        *(transport.wait_ack(addr, future) for (addr, _), future in zip(batch, futures)),
+        return_exceptions=True,
+    )
+    return sum(1 for result in results if not isinstance(result, BaseException))